@@ -0,0 +1,215 @@
+"""Classification counts across sessions, rolled up once per session in SQLite.
+
+Each processed session is ingested once into counts per keyword, platform,
+day of created_at and subreddit (empty for twitter), so questions over many
+sessions are answered from a few thousand pre-aggregated rows instead of
+reloading every session's items. A session is ingested again only when its
+summary_stats.json changes, i.e. it was analyzed again. Alongside the
+classified counts, mentions counts every post toward each keyword it
+contains (see iter_mentions), classified or not.
+
+Run `python -m analysis.analytics` to ingest new sessions, or e.g.
+`python -m analysis.analytics sessions sigma` for the new-meaning share of
+'sigma' over the last runs.
+"""
+import argparse
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from config import ANALYTICS_PATH, OUTPUT_DIR
+from analysis.analyze import CATEGORIES, iter_classified_items, iter_mentions
+
+ITEM_COLUMNS = ["keyword", "keywords", "platform", "id", "created_at", "subreddit", "classification"]
+PERIODS = {"day": 10, "month": 7, "year": 4} # prefix length of the YYYY-MM-DD bucket
+
+def day_bucket(created_at) -> str:
+    """YYYY-MM-DD of a reddit timestamp or a twitter ISO datetime, '' if unknown"""
+    if isinstance(created_at, (int, float)):
+        return datetime.fromtimestamp(created_at, timezone.utc).strftime("%Y-%m-%d")
+    if isinstance(created_at, str) and len(created_at) >= 10:
+        return created_at[:10]
+    return ""
+
+class AnalyticsStore:
+    def __init__(self, path=ANALYTICS_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session TEXT PRIMARY KEY,"
+            " summary_mtime REAL NOT NULL,"
+            " items INTEGER NOT NULL,"
+            " ingested REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS counts ("
+            " keyword TEXT NOT NULL,"
+            " session TEXT NOT NULL,"
+            " platform TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " subreddit TEXT NOT NULL,"
+            + "".join(f" {category} INTEGER NOT NULL," for category in CATEGORIES) +
+            " total INTEGER NOT NULL,"
+            " PRIMARY KEY (keyword, session, platform, day, subreddit)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS counts_by_day ON counts (keyword, day)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS mentions ("
+            " keyword TEXT NOT NULL,"
+            " session TEXT NOT NULL,"
+            " platform TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " subreddit TEXT NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " PRIMARY KEY (keyword, session, platform, day, subreddit)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def ingested(self) -> dict:
+        """session name -> summary_stats.json mtime at ingestion"""
+        return dict(self.conn.execute("SELECT session, summary_mtime FROM sessions"))
+
+    def ingest_session(self, session_dir: Path) -> int:
+        """Replace the session's counts with ones from its processed items, return the item count"""
+        counts = Counter()
+        mentions = Counter()
+        for keyword, item in iter_mentions(iter_classified_items(session_dir, ITEM_COLUMNS)):
+            key = (keyword, item["platform"], day_bucket(item.get("created_at")), item.get("subreddit") or "")
+            mentions[key] += 1
+            if keyword == item["keyword"]:
+                counts[key, item["classification"]] += 1
+
+        rows = {}
+        for (key, category), count in counts.items():
+            row = rows.setdefault(key, dict.fromkeys(CATEGORIES, 0))
+            row[category if category in CATEGORIES else "error"] += count
+
+        mtime = (session_dir / "processed" / "summary_stats.json").stat().st_mtime
+        items = sum(counts.values())
+        with self.conn:
+            self.conn.execute("DELETE FROM counts WHERE session = ?", (session_dir.name,))
+            self.conn.executemany(
+                f"INSERT INTO counts (keyword, session, platform, day, subreddit, {', '.join(CATEGORIES)}, total)"
+                f" VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(CATEGORIES))}, ?)",
+                (
+                    (keyword, session_dir.name, platform, day, subreddit, *row.values(), sum(row.values()))
+                    for (keyword, platform, day, subreddit), row in rows.items()
+                ),
+            )
+            self.conn.execute("DELETE FROM mentions WHERE session = ?", (session_dir.name,))
+            self.conn.executemany(
+                "INSERT INTO mentions (keyword, session, platform, day, subreddit, total) VALUES (?, ?, ?, ?, ?, ?)",
+                ((keyword, session_dir.name, platform, day, subreddit, total)
+                 for (keyword, platform, day, subreddit), total in mentions.items()),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (session, summary_mtime, items, ingested) VALUES (?, ?, ?, ?)",
+                (session_dir.name, mtime, items, time.time()),
+            )
+        return items
+
+    def ingest(self, output_dir: Path = OUTPUT_DIR) -> list:
+        """Ingest every analyzed session that is new or was analyzed again, return their names"""
+        done = self.ingested()
+        ingested = []
+        for summary in sorted(output_dir.glob("session_*/processed/summary_stats.json")):
+            session_dir = summary.parent.parent
+            if done.get(session_dir.name) == summary.stat().st_mtime:
+                continue
+            self.ingest_session(session_dir)
+            ingested.append(session_dir.name)
+        return ingested
+
+    def _select(self, group, keyword, label, platform=None, subreddit=None, where="", params=()):
+        if label not in CATEGORIES:
+            raise ValueError(f"Unknown label: {label}")
+        filters = ["keyword = ?"]
+        values = [keyword]
+        for column, value in (("platform", platform), ("subreddit", subreddit)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                values.append(value)
+        return self.conn.execute(
+            f"SELECT {group} AS grp, SUM(total), SUM({label}) FROM counts"
+            f" WHERE {' AND '.join(filters)} {where} GROUP BY grp",
+            [*values, *params],
+        )
+
+    def share_by_session(self, keyword, label="new", last=20, platform=None, subreddit=None) -> list:
+        """[(session, total, count, share)] over the `last` sessions that have the keyword, oldest first"""
+        sessions = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT session FROM counts WHERE keyword = ? ORDER BY session DESC LIMIT ?", (keyword, last)
+        )]
+        if not sessions:
+            return []
+        rows = self._select(
+            "session", keyword, label, platform, subreddit,
+            f"AND session IN ({','.join('?' * len(sessions))})", sessions,
+        )
+        return sorted(_with_share(rows))
+
+    def share_by_period(self, keyword, label="new", period="month", platform=None, subreddit=None) -> list:
+        """[(period, total, count, share)] by when the items were posted, oldest first"""
+        rows = self._select(f"substr(day, 1, {PERIODS[period]})", keyword, label, platform, subreddit, "AND day != ''")
+        return sorted(_with_share(rows))
+
+    def share_by_subreddit(self, keyword, label="new", limit=10, min_total=1) -> list:
+        """[(subreddit, total, count, share)] for the subreddits with the most items"""
+        rows = [row for row in _with_share(self._select("subreddit", keyword, label, "reddit")) if row[1] >= min_total]
+        return sorted(rows, key=lambda row: -row[1])[:limit]
+
+    def mentions_by_session(self, keyword, last=20, platform=None) -> list:
+        """[(session, mentions, classified)] over the `last` sessions, oldest first
+
+        mentions counts every post containing the keyword, including those
+        scraped for another keyword; classified only the posts scraped for it.
+        """
+        filters = "keyword = ?" + (" AND platform = ?" if platform is not None else "")
+        values = [keyword] + ([platform] if platform is not None else [])
+        mentions = dict(self.conn.execute(
+            f"SELECT session, SUM(total) FROM mentions WHERE {filters} GROUP BY session ORDER BY session DESC LIMIT ?",
+            [*values, last],
+        ))
+        classified = dict(self.conn.execute(
+            f"SELECT session, SUM(total) FROM counts WHERE {filters} GROUP BY session", values
+        ))
+        return sorted((session, total, classified.get(session, 0)) for session, total in mentions.items())
+
+    def close(self):
+        self.conn.close()
+
+def _with_share(rows):
+    return [(group, total, count, round(count / total, 4) if total else 0) for group, total, count in rows]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest processed sessions and query classification shares")
+    parser.add_argument("query", nargs="?", choices=["sessions", "period", "subreddits", "mentions"])
+    parser.add_argument("keyword", nargs="?")
+    parser.add_argument("--label", default="new", choices=CATEGORIES)
+    parser.add_argument("--last", type=int, default=20, help="sessions for the 'sessions' and 'mentions' queries")
+    parser.add_argument("--period", default="month", choices=list(PERIODS))
+    parser.add_argument("--platform", choices=["twitter", "reddit"])
+    args = parser.parse_args()
+
+    store = AnalyticsStore()
+    ingested = store.ingest()
+    print(f"Ingested {len(ingested)} new sessions")
+    if args.query == "mentions":
+        for session, mentions, classified in store.mentions_by_session(args.keyword, args.last, args.platform):
+            print(f"{session:24s} {mentions:7d} mentions {classified:7d} classified")
+    elif args.query:
+        if args.query == "sessions":
+            rows = store.share_by_session(args.keyword, args.label, args.last, args.platform)
+        elif args.query == "period":
+            rows = store.share_by_period(args.keyword, args.label, args.period, args.platform)
+        else:
+            rows = store.share_by_subreddit(args.keyword, args.label)
+        for group, total, count, share in rows:
+            print(f"{group or '(unknown)':24s} {count:7d}/{total:<7d} {share:6.1%}")
+    store.close()
@@ -1,89 +1,252 @@
 import json
 from pathlib import Path
-from collections import defaultdict
-from openai import OpenAI
-from config import OPENAI_API_KEY
+from collections import Counter, defaultdict
+from config import CLASSIFICATION_CACHE_MAX_ENTRIES, CLASSIFICATION_CACHE_MAX_AGE_DAYS, STORAGE_FORMAT, SQLITE_LOOKUP_CHUNK
+from analysis.classification_cache import ClassificationCache
+from analysis.session_labels import SessionLabels
+from storage import RecordWriter, count_by, iter_records
+from metrics import timed
+from analysis.client import get_client
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+ITEM_KEYS_FILE = "item_keys.jsonl" # uuid -> classification cache key, written by the batch builder
+CLUSTERS_FILE = "clusters.jsonl" # uuid -> near-duplicate cluster id, see analysis/near_duplicates.py
+LOCAL_LABELS_FILE = "local_labels.jsonl" # uuid -> label from analysis/preclassify.py
+STREAMED_FILE = "streamed.jsonl" # uuid -> label and its source from analysis/stream.py
 
-def analyze_batch(session_dir: Path, batch_id: str):
-    """Analyze batch results with proper UUID mapping"""
+CATEGORIES = ("old", "new", "unknown", "error")
+MENTION_COLUMNS = ["keyword", "keywords", "platform", "id"]
+RAW_SUFFIXES = (".json", ".parquet")
+
+def iter_raw_files(session_dir: Path):
+    """Yield (keyword, platform, path) for every raw file of the session"""
+    for raw_file in sorted((session_dir / "raw").iterdir()):
+        if raw_file.suffix in RAW_SUFFIXES and raw_file.stem.endswith(("_reddit", "_twitter")):
+            platform = "reddit" if "reddit" in raw_file.name else "twitter"
+            keyword = raw_file.stem.split("_")[0]
+            yield keyword, platform, raw_file
+
+def iter_session_items(session_dir: Path):
+    """Yield (keyword, platform, item) for every raw item of the session"""
+    for keyword, platform, raw_file in iter_raw_files(session_dir):
+        for item in iter_records(raw_file):
+            yield keyword, platform, item
+
+def classified_files(session_dir: Path) -> list:
+    """Per raw file results of a processed session, JSONL or Parquet, else the older JSON arrays"""
     processed_dir = session_dir / "processed"
-    processed_dir.mkdir(exist_ok=True)
-    
-    # download
-    batch = client.batches.retrieve(batch_id)
-    results_content = client.files.content(batch.output_file_id).text
-    results = [json.loads(line) for line in results_content.splitlines()]
-    
-    # Build classification map
-    classifications = {}
-    for result in results:
-        custom_id = result["custom_id"]
-        if result["response"]["status_code"] == 200:
-            content = result["response"]["body"]["choices"][0]["message"]["content"].lower().strip()
-            classifications[custom_id] = content if content in {"old", "new"} else "unknown"
-        else:
-            classifications[custom_id] = "error"
-    
-    # Process all raw files
+    files = [
+        file for file in sorted(processed_dir.glob("*_classified.*"))
+        if file.suffix in (".jsonl", ".parquet") and not file.name.startswith("all_classified.")
+    ]
+    return files or [
+        file for file in sorted(processed_dir.glob("*_classified.json")) if file.name != "all_classified.json"
+    ]
+
+def iter_classified_items(session_dir: Path, columns=None):
+    """Yield the classified items of a processed session"""
+    for file in classified_files(session_dir):
+        yield from iter_records(file, columns)
+
+def iter_jsonl(file: Path):
+    if file.exists():
+        with open(file) as f:
+            yield from map(json.loads, f)
+
+def load_clusters(session_dir: Path) -> dict:
+    return {entry["uuid"]: entry["cluster"] for entry in iter_jsonl(session_dir / "batches" / CLUSTERS_FILE)}
+
+def load_local_labels(session_dir: Path) -> dict:
+    return {entry["uuid"]: entry["label"] for entry in iter_jsonl(session_dir / "batches" / LOCAL_LABELS_FILE)}
+
+def load_streamed_labels(session_dir: Path) -> dict:
+    """uuid -> (label, source) for items the streaming classifier answered, errors left out to be sent again"""
+    return {
+        entry["uuid"]: (entry["classification"], entry["label_source"])
+        for entry in iter_jsonl(session_dir / "batches" / STREAMED_FILE) if entry["classification"] != "error"
+    }
+
+def iter_batch_results(batch_ids, client=None):
+    """Yield (custom_id, label, tokens) from every batch's output, streamed line by line"""
+    if not batch_ids:
+        return # nothing sent, so no client is needed
+    client = client if client is not None else get_client()
+    for batch_id in batch_ids:
+        batch = client.batches.retrieve(batch_id)
+        with client.files.with_streaming_response.content(batch.output_file_id) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                if result["response"]["status_code"] == 200:
+                    body = result["response"]["body"]
+                    content = body["choices"][0]["message"]["content"].lower().strip()
+                    label = content if content in {"old", "new"} else "unknown"
+                    yield result["custom_id"], label, body.get("usage", {}).get("total_tokens", 0)
+                else:
+                    yield result["custom_id"], "error", 0
+
+@timed("analyze.load_labels")
+def load_session_labels(session_dir: Path, batch_ids, client=None) -> SessionLabels:
+    labels = SessionLabels(session_dir)
+    batches_dir = session_dir / "batches"
+    labels.set_many(("key",), ((e["uuid"], e["key"]) for e in iter_jsonl(batches_dir / ITEM_KEYS_FILE)))
+    labels.set_many(("cluster",), ((e["uuid"], e["cluster"]) for e in iter_jsonl(batches_dir / CLUSTERS_FILE)))
+    labels.set_many(("local_label",), ((e["uuid"], e["label"]) for e in iter_jsonl(batches_dir / LOCAL_LABELS_FILE)))
+    labels.set_many(("stream_label", "stream_source"), (
+        (uuid, label, source) for uuid, (label, source) in load_streamed_labels(session_dir).items()
+    ))
+    labels.set_many(("batch_label", "tokens"), iter_batch_results(batch_ids, client))
+    return labels
+
+def chunked(iterable, size):
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_mentions(items):
+    """(keyword, item) for every keyword a post counts toward: the one it was scraped for and every keyword it contains
+
+    A post collected under several keywords counts once per keyword. Only
+    posts with more than one keyword are remembered, so memory stays small.
+    """
+    counted = {} # (platform, id) -> keywords already counted
+    for item in items:
+        keywords = {item["keyword"], *(item.get("keywords") or ())}
+        if len(keywords) > 1:
+            done = counted.setdefault((item["platform"], item.get("id")), set())
+            keywords -= done
+            done |= keywords
+        for keyword in keywords:
+            yield keyword, item
+
+def summarize(counts, mentions=None) -> dict:
+    """keyword -> platform -> totals and percentages, from (keyword, platform, classification) counts
+
+    `mentions` counts (keyword, platform) posts from iter_mentions. Those
+    are not classified for the keywords they were not scraped for, so they
+    only add a "mentions" total next to the classified one.
+    """
     summary_stats = defaultdict(lambda: defaultdict(lambda: {
         "total": 0, "old": 0, "new": 0, "unknown": 0, "error": 0
     }))
-    
-    all_classified = []
-    
-    for raw_file in (session_dir / "raw").glob("*.json"):
-        if not ("_reddit.json" in raw_file.name or "_twitter.json" in raw_file.name):
-            continue
-            
-        platform = "reddit" if "reddit" in raw_file.name else "twitter"
-        keyword = raw_file.stem.split("_")[0]
-        
-        with open(raw_file) as f:
-            items = json.load(f)
-        
-        classified_items = []
-        for item in items:
-            # Get classification using UUID
-            classification = classifications.get(item["uuid"], "error")
-            classified_item = {
-                **item,
-                "platform": platform,
-                "classification": classification,
-                "keyword": keyword
-            }
-            classified_items.append(classified_item)
-            
-            # Update stats
-            stats = summary_stats[keyword][platform]
-            stats["total"] += 1
-            stats[classification] += 1
-        
-        # Save platform-specific results
-        output_file = processed_dir / f"{keyword}_{platform}_classified.json"
-        with open(output_file, "w") as f:
-            json.dump(classified_items, f, indent=2)
-        
-        all_classified.extend(classified_items)
-    
+    for (keyword, platform, classification), count in sorted(counts.items()):
+        stats = summary_stats[keyword][platform]
+        stats["total"] += count
+        stats[classification] += count
+    for (keyword, platform), count in sorted((mentions or {}).items()):
+        summary_stats[keyword][platform]["mentions"] = count
+
     # Calculate percentages
     for keyword, platforms in summary_stats.items():
         for platform, stats in platforms.items():
-            for cat in ["old", "new", "unknown", "error"]:
+            for cat in CATEGORIES:
                 if stats["total"] > 0:
                     stats[f"{cat}_pct"] = round(stats[cat] / stats["total"] * 100, 1)
-    
-    # Save combined results and summary
-    combined_file = processed_dir / "all_classified.json"
-    with open(combined_file, "w") as f:
-        json.dump(all_classified, f, indent=2)
-    
+    return summary_stats
+
+@timed("analyze.batch")
+def analyze_batch(session_dir: Path, batch_ids, client=None, cache: ClassificationCache = None,
+                  fmt: str = STORAGE_FORMAT):
+    """Analyze batch results with proper UUID mapping, merging every shard's batch
+
+    Items the streaming classifier answered keep its label and source. Items
+    that were not sent (cache hits and duplicate texts) take their label
+    from the classification cache, which the new results are added to first.
+    Items labelled by the local pre-classifier keep that label, and
+    near-duplicates take the label of their cluster's representative.
+
+    Everything is streamed: batch outputs line by line into an on-disk table,
+    raw items file by file in chunks, results out as JSONL or Parquet row
+    groups, so memory does not grow with the session.
+    """
+    processed_dir = session_dir / "processed"
+    processed_dir.mkdir(exist_ok=True)
+    if isinstance(batch_ids, str):
+        batch_ids = [batch_ids]
+    cache = cache if cache is not None else ClassificationCache()
+    labels = load_session_labels(session_dir, batch_ids, client)
+    cache.put_many(labels.new_cache_entries())
+
+    def resolve(row):
+        if row is None:
+            return None, None
+        if row["batch_label"]:
+            return row["batch_label"], "batch"
+        if row["stream_label"]:
+            return row["stream_label"], row["stream_source"]
+        cached = cache.get(row["key"]) if row["key"] else None
+        if cached:
+            return cached[0], "cache"
+        if row["local_label"]:
+            return row["local_label"], "local"
+        return None, None
+
+    for stale in [*classified_files(session_dir), processed_dir / "all_classified.jsonl"]:
+        stale.unlink(missing_ok=True)
+
+    # Process all raw files, counting labels as they go by in JSON; Parquet is grouped afterwards
+    counts = Counter()
+    written = []
+    combined = RecordWriter(processed_dir / "all_classified.jsonl", lines=True) if fmt == "json" else None
+    try:
+        for keyword, platform, raw_file in iter_raw_files(session_dir):
+            output_file = processed_dir / f"{keyword}_{platform}_classified.jsonl"
+            with RecordWriter(output_file, fmt, lines=True) as output:
+                for chunk in chunked(iter_records(raw_file), SQLITE_LOOKUP_CHUNK):
+                    rows = labels.get_many(item["uuid"] for item in chunk)
+                    representatives = labels.get_many({
+                        row["cluster"] for row in rows.values() if row["cluster"] and row["cluster"] not in rows
+                    })
+                    for item in chunk:
+                        # Get classification using UUID, falling back to the cache and then the cluster representative
+                        row = rows.get(item["uuid"])
+                        cluster = row["cluster"] if row and row["cluster"] else item["uuid"]
+                        classification, source = resolve(row)
+                        if classification is None and cluster != item["uuid"]:
+                            classification, _ = resolve(rows.get(cluster) or representatives.get(cluster))
+                            source = "cluster" if classification else None
+                        classified_item = {
+                            **item,
+                            "platform": platform,
+                            "classification": classification or "error",
+                            "keyword": keyword,
+                            "label_source": source,
+                            "cluster_id": cluster,
+                        }
+                        output.write(classified_item)
+                        if combined is not None:
+                            combined.write(classified_item)
+                            counts[keyword, platform, classified_item["classification"]] += 1
+            written.append(output.path)
+    finally:
+        if combined is not None:
+            combined.close()
+        labels.close()
+
+    if combined is None:
+        counts = count_by(written, ("keyword", "platform", "classification"))
+    mentions = Counter(
+        (keyword, item["platform"]) for keyword, item in iter_mentions(iter_classified_items(session_dir, MENTION_COLUMNS))
+    )
     summary_file = processed_dir / "summary_stats.json"
     with open(summary_file, "w") as f:
-        json.dump(summary_stats, f, indent=2)
+        json.dump(summarize(counts, mentions), f, indent=2)
+
+    cache.evict(CLASSIFICATION_CACHE_MAX_ENTRIES, CLASSIFICATION_CACHE_MAX_AGE_DAYS)
 
 if __name__ == "__main__":
-    from config import OUTPUT_DIR
-    session_path = OUTPUT_DIR / "session_20250508-203258"
-    analyze_batch(session_path, "batch_681cf8f565b08190abf644fe284d6ee4")
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Analyze finished batches of a session")
+    parser.add_argument("session", type=Path)
+    parser.add_argument("batch_ids", nargs="*", help="defaults to the batches recorded in the session's pipeline state")
+    args = parser.parse_args()
+
+    # through classify's last step, so the session is marked analyzed and added to the analytics store
+    from analysis.classify import finish_session, load_pipeline_state
+    batch_ids = args.batch_ids or [shard["batch_id"] for shard in load_pipeline_state(args.session)["shards"]]
+    finish_session(args.session, batch_ids)
\ No newline at end of file
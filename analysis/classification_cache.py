@@ -0,0 +1,77 @@
+"""Labels the Batch API already returned, keyed by what was asked.
+
+The key hashes the keyword, the whitespace-normalised text, the prompt
+rendered with that keyword's definitions, and the model, so a change to any
+of them asks again. Stored in SQLite next to the sessions.
+"""
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from config import CLASSIFICATION_CACHE_PATH, CLASSIFICATION_MODEL, PROMPT_TEMPLATE
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def cache_key(keyword: str, text: str, defs: dict, model: str = CLASSIFICATION_MODEL) -> str:
+    prompt = PROMPT_TEMPLATE.format(keyword=keyword, text="", old=defs[keyword]["old"], new=defs[keyword]["new"])
+    h = hashlib.sha256()
+    for part in (keyword, normalize_text(text), prompt, model):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ClassificationCache:
+    def __init__(self, path=CLASSIFICATION_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            " key TEXT PRIMARY KEY,"
+            " label TEXT NOT NULL,"
+            " tokens INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " used REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        """(label, tokens) or None"""
+        row = self.conn.execute("SELECT label, tokens FROM labels WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def touch(self, keys):
+        with self.conn:
+            self.conn.executemany("UPDATE labels SET used = ? WHERE key = ?", ((time.time(), key) for key in keys))
+
+    def put_many(self, entries):
+        """Store (key, label, tokens) tuples"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO labels (key, label, tokens, created, used) VALUES (?, ?, ?, ?, ?)",
+                ((key, label, tokens, now, now) for key, label, tokens in entries),
+            )
+
+    def evict(self, max_entries=None, max_age_days=None):
+        """Drop entries unused for `max_age_days`, then the least recently used beyond `max_entries`"""
+        removed = 0
+        with self.conn:
+            if max_age_days is not None:
+                removed += self.conn.execute(
+                    "DELETE FROM labels WHERE used < ?", (time.time() - max_age_days * 86400,)
+                ).rowcount
+            if max_entries is not None:
+                removed += self.conn.execute(
+                    "DELETE FROM labels WHERE key IN ("
+                    " SELECT key FROM labels ORDER BY used DESC LIMIT -1 OFFSET ?)", (max_entries,)
+                ).rowcount
+        return removed
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -1,104 +1,341 @@
+import argparse
 import json
+import os
 from pathlib import Path
-from typing import Dict
-from openai import OpenAI
-from config import OPENAI_API_KEY, PROMPT_TEMPLATE
-from analysis.analyze import analyze_batch
+from typing import Dict, List
+from config import (
+    PROMPT_TEMPLATE, BATCH_MAX_REQUESTS, BATCH_MAX_BYTES, CLASSIFICATION_MODEL, NEAR_DUPLICATES,
+    PRECLASSIFY, OUTPUT_DIR, BATCH_POLL_MIN, BATCH_POLL_START, BATCH_POLL_MAX, PROFILE,
+)
+from analysis.analyze import (
+    analyze_batch, iter_session_items, iter_raw_files, classified_files, load_clusters, load_local_labels,
+    load_streamed_labels, ITEM_KEYS_FILE, CLUSTERS_FILE, LOCAL_LABELS_FILE,
+)
+from analysis.near_duplicates import collapse_near_duplicates
+from analysis.preclassify import preclassify_session
+from analysis.classification_cache import ClassificationCache, cache_key
+from analysis.analytics import AnalyticsStore
+from analysis.client import get_client
+from metrics import METRICS, timed, write_metrics, profiled
 import time
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def create_batch_file(session_dir: Path, defs: Dict) -> str:
-    """Create JSONL batch input file using existing UUIDs"""
-    jsonl_content = ""
-    
-    for raw_file in (session_dir / "raw").glob("*.json"):
-        if "_reddit.json" in raw_file.name or "_twitter.json" in raw_file.name:
-            keyword = raw_file.stem.split("_")[0]
-            with open(raw_file, encoding="utf8") as f:
-                items = json.load(f)
-            
-            for item in items:
-                jsonl_content += json.dumps({
-                    "custom_id": item["uuid"],
-                    "method": "POST",
-                    "url": "/v1/chat/completions",
-                    "body": {
-                        "model": "gpt-4o-mini",
-                        "messages": [{
-                            "role": "user",
-                            "content": PROMPT_TEMPLATE.format(
-                                keyword=keyword,
-                                text=item["text"],
-                                old=defs[keyword]["old"],
-                                new=defs[keyword]["new"]
-                            )
-                        }],
-                        "temperature": 0.1,
-                        "max_tokens": 1
-                    }
-                }) + "\n"
-    
-    # Upload as proper JSONL
-    batch_file = client.files.create(
-        file=jsonl_content.encode("utf-8"),
-        purpose="batch"
-    )
-    return batch_file.id
-
-def process_session(session_dir: Path, defs: Dict):
-    """Process session using Batch API"""
+PIPELINE_FILE = "pipeline.json"
+BATCH_FAILED_STATUSES = ('failed', 'cancelled', 'expired')
+
+def batch_request(custom_id: str, keyword: str, text: str, defs: Dict) -> Dict:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": CLASSIFICATION_MODEL,
+            "messages": [{
+                "role": "user",
+                "content": PROMPT_TEMPLATE.format(
+                    keyword=keyword,
+                    text=text,
+                    old=defs[keyword]["old"],
+                    new=defs[keyword]["new"]
+                )
+            }],
+            "temperature": 0.1,
+            "max_tokens": 1
+        }
+    }
+
+def iter_batch_requests(session_dir: Path, defs: Dict, cache: ClassificationCache = None, stats: Dict = None,
+                        key_log=None):
+    """Yield one request per distinct (keyword, text) that is not cached, keyed by its first item's UUID
+
+    Every item's cache key is written to `key_log` so analyze_batch can fill
+    in duplicates and cache hits. Items the streaming classifier or the local
+    pre-classifier labelled are not sent, and near-duplicates found by
+    collapse_near_duplicates are left to their cluster's representative.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(items=0, requests=0, streamed=0, cache_hits=0, local=0, duplicates=0, near_duplicates=0, tokens_saved=0)
+    clusters = load_clusters(session_dir)
+    local_labels = load_local_labels(session_dir)
+    streamed = load_streamed_labels(session_dir)
+    requested = set()
+    hits = []
+    for keyword, platform, item in iter_session_items(session_dir):
+        key = cache_key(keyword, item["text"], defs)
+        stats["items"] += 1
+        if key_log is not None:
+            key_log.write(json.dumps({"uuid": item["uuid"], "key": key}) + "\n")
+
+        if item["uuid"] in streamed:
+            stats["streamed"] += 1
+            continue
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            stats["cache_hits"] += 1
+            stats["tokens_saved"] += cached[1]
+            hits.append(key)
+            continue
+        if item["uuid"] in local_labels:
+            stats["local"] += 1
+            continue
+        if key in requested:
+            stats["duplicates"] += 1
+            continue
+        if clusters.get(item["uuid"], item["uuid"]) != item["uuid"]:
+            stats["near_duplicates"] += 1
+            continue
+
+        requested.add(key)
+        stats["requests"] += 1
+        yield batch_request(item["uuid"], keyword, item["text"], defs)
+
+    if cache is not None:
+        cache.touch(hits)
+    stats["hit_rate"] = round(stats["cache_hits"] / stats["items"], 3) if stats["items"] else 0
+
+def write_batch_shards(session_dir: Path, defs: Dict, max_requests: int = BATCH_MAX_REQUESTS,
+                       max_bytes: int = BATCH_MAX_BYTES, cache: ClassificationCache = None) -> List[Path]:
+    """Stream batch requests to JSONL shards on disk, starting a new shard at either limit"""
+    shard_dir = session_dir / "batches"
+    shard_dir.mkdir(exist_ok=True)
+    for old_shard in shard_dir.glob("shard_*.jsonl"):
+        old_shard.unlink()
+
+    shards = []
+    stats = {}
+    out = None
+    count = size = 0
+    try:
+        with open(shard_dir / ITEM_KEYS_FILE, "w") as key_log:
+            for request in iter_batch_requests(session_dir, defs, cache, stats, key_log):
+                line = (json.dumps(request) + "\n").encode("utf-8")
+                if out is None or count >= max_requests or size + len(line) > max_bytes:
+                    if out is not None:
+                        out.close()
+                    shards.append(shard_dir / f"shard_{len(shards):03d}.jsonl")
+                    out = open(shards[-1], "wb")
+                    count = size = 0
+                out.write(line)
+                count += 1
+                size += len(line)
+    finally:
+        if out is not None:
+            out.close()
+
+    with open(shard_dir / "cache_stats.json", "w") as f:
+        json.dump(stats, f, indent=2)
+    print(f"{stats['items']} items, {stats['requests']} requests: {stats['streamed']} streamed, {stats['cache_hits']} cache hits "
+          f"({stats['hit_rate']:.1%}), {stats['local']} labelled locally, {stats['duplicates']} duplicate texts, {stats['near_duplicates']} near-duplicates, "
+          f"~{stats['tokens_saved']} tokens saved")
+    return shards
+
+@timed("classify.upload")
+def upload_shard(shard: Path, client=None) -> str:
+    client = client if client is not None else get_client()
+    with open(shard, "rb") as f:
+        return client.files.create(file=f, purpose="batch").id
+
+@timed("classify.create_batch_file")
+def create_batch_file(session_dir: Path, defs: Dict, client=None, max_requests: int = BATCH_MAX_REQUESTS,
+                      max_bytes: int = BATCH_MAX_BYTES, cache: ClassificationCache = None) -> List[str]:
+    """Create JSONL batch input shards for the cache misses and upload each one"""
+    return [
+        upload_shard(shard, client)
+        for shard in write_batch_shards(session_dir, defs, max_requests, max_bytes, cache)
+    ]
+
+def load_pipeline_state(session_dir: Path) -> Dict:
+    file = session_dir / "batches" / PIPELINE_FILE
+    if not file.exists():
+        return {"prepared": False, "shards": [], "analyzed": False}
+    with open(file) as f:
+        return json.load(f)
+
+def save_pipeline_state(session_dir: Path, state: Dict):
+    """Written after every step that talks to the API, so a restart never repeats one"""
+    file = session_dir / "batches" / PIPELINE_FILE
+    tmp = file.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, file)
+
+@timed("classify.prepare")
+def prepare_session(session_dir: Path, defs: Dict, max_requests: int, max_bytes: int,
+                    cache: ClassificationCache) -> List[Path]:
+    """Collapse near-duplicates, pre-classify locally and write the batch shards"""
+    (session_dir / "batches").mkdir(exist_ok=True)
+    if NEAR_DUPLICATES:
+        counts = collapse_near_duplicates(session_dir)
+        print(f"Near-duplicates: {counts['items']} items in {counts['clusters']} clusters")
+    else:
+        (session_dir / "batches" / CLUSTERS_FILE).unlink(missing_ok=True)
+
+    if PRECLASSIFY:
+        counts = preclassify_session(session_dir)
+        print(f"Pre-classified locally: {counts['local']}/{counts['items']} items")
+    else:
+        (session_dir / "batches" / LOCAL_LABELS_FILE).unlink(missing_ok=True)
+
+    # cached texts are not sent again
+    return write_batch_shards(session_dir, defs, max_requests, max_bytes, cache)
+
+def process_session(session_dir: Path, defs: Dict, client=None, max_requests: int = BATCH_MAX_REQUESTS,
+                    max_bytes: int = BATCH_MAX_BYTES, cache: ClassificationCache = None,
+                    analytics: AnalyticsStore = None) -> bool:
+    """Process session using Batch API, one batch per shard
+
+    Progress is kept in batches/pipeline.json, so calling this again on the
+    same session picks up where it stopped instead of submitting again. The
+    results are added to the cross-session analytics store at the end, and
+    the run's stage timings to the session's metrics.json.
+    """
     processed_dir = session_dir / "processed"
     processed_dir.mkdir(exist_ok=True)
-    
-    # Create and upload batch
-    batch_file_id = create_batch_file(session_dir, defs)
-    
-    # Start batch job
-    batch = client.batches.create(
-        input_file_id=batch_file_id,
-        endpoint="/v1/chat/completions",
-        completion_window="24h"
-    )
-    
-    print(f"Batch ID: {batch.id} - Status: {batch.status}")
-    print(f"Waiting for batch completion...")
-
-    if wait_for_batch_completion(batch.id):
-        analyze_batch(session_dir, batch.id)
-        print(f"Batch {batch.id} processed successfully!")
-        print(f"Results saved in: {processed_dir}")
-
-
-    
-def wait_for_batch_completion(batch_id: str) -> bool:
-    wait_time = 60 * 5
-    while True:
-        batch = client.batches.retrieve(batch_id)
-        print(f"\nBatch Status Check: {batch.status} (Updated at {time.strftime('%Y-%m-%d %H:%M:%S')})")
-        if batch.status == 'completed':
-            print("\nBatch completed! Analyzing results...")
-            return True
-        
-        elif batch.status in ['failed', 'cancelled', 'canceling', 'expired', ]:
-            print(f"\nBatch terminated with status: {batch.status}")
-            return False
-        
-        elif batch.status in ['validating', 'in_progress', 'finalizing']:
-            print(f"Status of batch: {batch.status} Next check in {wait_time//60} minutes...")
-            time.sleep(wait_time)
-
-        else:
-            print(f"Unexpected status: {batch.status}. Waiting...")
-            time.sleep(wait_time)
+    cache = cache if cache is not None else ClassificationCache()
+    state = load_pipeline_state(session_dir)
+    if state["analyzed"]:
+        print(f"Session {session_dir.name} is already classified")
+        return True
+
+    if not state["prepared"]:
+        shards = prepare_session(session_dir, defs, max_requests, max_bytes, cache)
+        state["shards"] = [{"path": shard.name, "file_id": None, "batch_id": None, "status": None} for shard in shards]
+        state["prepared"] = True
+        save_pipeline_state(session_dir, state)
+
+    # Upload and start one batch job per shard, failed ones are started again
+    if state["shards"]:
+        client = client if client is not None else get_client()
+    for shard in state["shards"]:
+        if shard["file_id"] is None:
+            shard["file_id"] = upload_shard(session_dir / "batches" / shard["path"], client)
+            save_pipeline_state(session_dir, state)
+        if shard["batch_id"] is None or shard["status"] in BATCH_FAILED_STATUSES:
+            batch = client.batches.create(
+                input_file_id=shard["file_id"],
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            shard["batch_id"], shard["status"] = batch.id, batch.status
+            save_pipeline_state(session_dir, state)
+            print(f"Batch ID: {batch.id} - Status: {batch.status}")
+
+    batch_ids = [shard["batch_id"] for shard in state["shards"]]
+    print(f"Waiting for {len(batch_ids)} batches to complete...")
+    statuses = wait_for_batches(batch_ids, client)
+    for shard in state["shards"]:
+        shard["status"] = statuses[shard["batch_id"]]
+    save_pipeline_state(session_dir, state)
+
+    if all(status == "completed" for status in statuses.values()):
+        finish_session(session_dir, batch_ids, client, cache, analytics, state)
+        write_metrics(session_dir)
+        return True
+    print("Some batches did not complete, run resume to start them again")
+    write_metrics(session_dir)
+    return False
+
+def finish_session(session_dir: Path, batch_ids, client=None, cache: ClassificationCache = None,
+                   analytics: AnalyticsStore = None, state: Dict = None):
+    """Write the processed files from finished batches, add them to the analytics store and mark the session analyzed"""
+    analyze_batch(session_dir, batch_ids, client, cache)
+    store = analytics if analytics is not None else AnalyticsStore()
+    try:
+        store.ingest_session(session_dir)
+    finally:
+        if analytics is None: # a store passed in stays open for the caller
+            store.close()
+    state = state if state is not None else load_pipeline_state(session_dir)
+    state["analyzed"] = True
+    (session_dir / "batches").mkdir(exist_ok=True)
+    save_pipeline_state(session_dir, state)
+    print(f"Batches {', '.join(batch_ids) or '(none)'} processed successfully!")
+    print(f"Results saved in: {session_dir / 'processed'}")
+
+def needs_classification(session_dir: Path) -> bool:
+    """Classification was started and not analyzed, or the session was scraped and never classified"""
+    if (session_dir / "batches" / PIPELINE_FILE).exists():
+        return not load_pipeline_state(session_dir)["analyzed"]
+    # scraped with --no-classify, or stopped before process_session wrote its state
+    return (session_dir / "raw").is_dir() and any(iter_raw_files(session_dir)) and not classified_files(session_dir)
+
+def resume_sessions(output_dir: Path = OUTPUT_DIR, client=None, cache: ClassificationCache = None,
+                    analytics: AnalyticsStore = None):
+    """Continue every session whose classification was started but not analyzed, or never started"""
+    for session_dir in sorted(output_dir.glob("session_*")):
+        if not needs_classification(session_dir):
+            continue
+        with open(session_dir / "session_meta.json") as f:
+            defs = json.load(f)["keywords"]
+        print(f"Resuming {session_dir.name}")
+        METRICS.reset() # each session's metrics.json gets only its own stages
+        process_session(session_dir, defs, client, cache=cache, analytics=analytics)
+
+def classify_sessions(session_dirs: List[Path], profile: bool = PROFILE):
+    """process_session for each session, with the definitions saved in its session_meta.json"""
+    for session_dir in session_dirs:
+        METRICS.reset()
+        with open(session_dir / "session_meta.json") as f:
+            defs = json.load(f)["keywords"]
+        with profiled(session_dir, profile):
+            process_session(session_dir, defs)
+
+def next_poll_interval(batch, previous) -> float:
+    """Seconds until the next check, from the progress since the previous check
+
+    `previous` is (timestamp, completed) from the last check or None. The
+    wait is half the estimated time left, so checks get denser as a batch
+    nears the end.
+    """
+    if batch.status == "finalizing":
+        return BATCH_POLL_MIN
+    counts = getattr(batch, "request_counts", None)
+    if batch.status != "in_progress" or counts is None or previous is None:
+        return BATCH_POLL_START
+    then, completed_then = previous
+    done = counts.completed + counts.failed
+    rate = (done - completed_then) / max(time.time() - then, 1e-6)
+    if rate <= 0:
+        return BATCH_POLL_START
+    eta = (counts.total - done) / rate
+    return min(BATCH_POLL_MAX, max(BATCH_POLL_MIN, eta / 2))
+
+@timed("classify.batch_wait")
+def wait_for_batches(batch_ids: List[str], client=None, sleep=time.sleep) -> Dict[str, str]:
+    """Poll until every batch has finished, return batch id -> final status"""
+    if batch_ids:
+        client = client if client is not None else get_client()
+    statuses = {}
+    progress = {}
+    pending = list(batch_ids)
+    while pending:
+        waits = []
+        for batch_id in list(pending):
+            batch = client.batches.retrieve(batch_id)
+            counts = getattr(batch, "request_counts", None)
+            done = f" {counts.completed + counts.failed}/{counts.total}" if counts else ""
+            print(f"Batch {batch_id}: {batch.status}{done} (checked at {time.strftime('%Y-%m-%d %H:%M:%S')})")
+            if batch.status == 'completed' or batch.status in BATCH_FAILED_STATUSES:
+                statuses[batch_id] = batch.status
+                pending.remove(batch_id)
+                continue
+            waits.append(next_poll_interval(batch, progress.get(batch_id)))
+            if counts is not None:
+                progress[batch_id] = (time.time(), counts.completed + counts.failed)
+        if pending:
+            wait = min(waits)
+            print(f"Next check in {wait:.0f}s")
+            sleep(wait)
+    return statuses
+
+def wait_for_batch_completion(batch_id: str, client=None) -> bool:
+    return wait_for_batches([batch_id], client)[batch_id] == "completed"
 
 if __name__ == "__main__":
-    session_path = Path("tmp/output/session_20250427-201409")
-    defs = {
-        "slay": {"old": "To kill violently", "new": "To have a strong favorable effect"},
-        "flex": {"old": "To bend something", "new": "An act of bragging"},
-        "lit": {"old": "Past tense of light", "new": "Exciting/awesome"},
-        "sigma": {"old": "Greek letter", "new": "Coolly independent person"},
-        "simp": {"old": "A foolish person", "new": "Someone who is overly attentive to someone else"},
-    }
-    process_session(session_path, defs)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Classify scraped sessions with the Batch API")
+    parser.add_argument("sessions", nargs="*", type=Path, help="session directories to classify or continue")
+    parser.add_argument("--resume", action="store_true", help="continue every unfinished session under the output directory")
+    args = parser.parse_args()
+
+    if args.resume:
+        resume_sessions()
+    classify_sessions(args.sessions)
@@ -0,0 +1,16 @@
+"""The OpenAI client, built on first use.
+
+Importing analysis/ neither loads the SDK nor needs an API key, so commands
+that only read a session start quickly; functions that talk to the API take
+a `client` and fall back to get_client().
+"""
+from config import OPENAI_API_KEY
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
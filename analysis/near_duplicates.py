@@ -0,0 +1,118 @@
+"""Collapse near-identical posts within a keyword so only one per cluster is classified.
+
+Texts are normalised (case, URLs, mentions, emoji and punctuation removed),
+then MinHash signatures over word 3-grams are bucketed with LSH. Items that
+share a bucket in any band are joined with union-find. Each shingle is
+hashed once and the permutations are XOR masks over that 64-bit hash, so the
+inner loop is C-level min(map(...)). Only band keys are kept, so time and
+memory grow linearly with the number of texts.
+
+The cluster id is the uuid of the cluster's first item, which is also the
+representative sent for classification.
+"""
+import hashlib
+import json
+import random
+import re
+from pathlib import Path
+from config import MINHASH_BANDS, MINHASH_ROWS
+from analysis.analyze import iter_session_items, CLUSTERS_FILE
+
+NOISE_RE = re.compile(r'https?://\S+|www\.\S+|@\w+|[^\w\s]|_')
+_rng = random.Random(1)
+MASKS = [_rng.getrandbits(64) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+def normalize(text: str) -> str:
+    return " ".join(NOISE_RE.sub(" ", text.lower()).split())
+
+def shingles(text: str) -> set:
+    words = text.split()
+    if len(words) < 3:
+        return {text}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def signature(text: str) -> list:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingles(text)
+    ]
+    return [min(map(mask.__xor__, hashes)) for mask in MASKS]
+
+def band_keys(sig: list) -> list:
+    return [hash((band, *sig[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])) for band in range(MINHASH_BANDS)]
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = []
+
+    def add(self):
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            # the earlier item stays the root, so it becomes the representative
+            self.parent[max(i, j)] = min(i, j)
+
+def find_clusters(session_dir: Path) -> dict:
+    """uuid -> cluster id for every raw item"""
+    uuids = []
+    sets = _UnionFind()
+    exact = {} # (keyword, normalised text) -> first index
+    buckets = {} # (keyword, band key) -> first index
+    for keyword, platform, item in iter_session_items(session_dir):
+        i = sets.add()
+        uuids.append(item["uuid"])
+        text = normalize(item["text"])
+        if (keyword, text) in exact:
+            sets.union(i, exact[(keyword, text)])
+            continue
+        exact[(keyword, text)] = i
+        for key in band_keys(signature(text)):
+            if (keyword, key) in buckets:
+                sets.union(i, buckets[(keyword, key)])
+            else:
+                buckets[(keyword, key)] = i
+    return {uuid: uuids[sets.find(i)] for i, uuid in enumerate(uuids)}
+
+class NearDuplicateIndex:
+    """Near-duplicate lookup for texts that arrive one at a time, as in analysis/stream.py
+
+    There is no union-find: a text joins the first earlier text it shares a
+    band with, and clusters are never merged afterwards.
+    """
+    def __init__(self):
+        self.exact = {} # (keyword, normalised text) -> value
+        self.buckets = {} # (keyword, band key) -> value
+
+    def lookup(self, keyword: str, text: str, value):
+        """The value of an earlier near-duplicate of `text`, or None after adding `text` under `value`"""
+        text = normalize(text)
+        if (keyword, text) in self.exact:
+            return self.exact[(keyword, text)]
+        keys = band_keys(signature(text))
+        for key in keys:
+            if (keyword, key) in self.buckets:
+                return self.buckets[(keyword, key)]
+        self.exact[(keyword, text)] = value
+        for key in keys:
+            self.buckets[(keyword, key)] = value
+        return None
+
+def collapse_near_duplicates(session_dir: Path) -> dict:
+    """Write batches/clusters.jsonl and return counts"""
+    clusters = find_clusters(session_dir)
+    out_dir = session_dir / "batches"
+    out_dir.mkdir(exist_ok=True)
+    with open(out_dir / CLUSTERS_FILE, "w") as f:
+        for uuid, cluster in clusters.items():
+            f.write(json.dumps({"uuid": uuid, "cluster": cluster}) + "\n")
+    representatives = sum(1 for uuid, cluster in clusters.items() if uuid == cluster)
+    return {"items": len(clusters), "clusters": representatives, "collapsed": len(clusters) - representatives}
@@ -0,0 +1,151 @@
+"""Local pre-classification so only uncertain texts go to the Batch API.
+
+A multinomial Naive Bayes model per keyword is trained on word unigrams and
+bigrams of earlier sessions' processed/*_classified.jsonl, using only labels
+that came from the LLM. A held-out share of those items measures how often
+the confident local answers agree with the LLM, and a keyword is only
+labelled locally when that agreement reaches PRECLASSIFY_MIN_AGREEMENT.
+
+Run `python -m analysis.preclassify` to retrain and print the metrics.
+"""
+import hashlib
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from config import (
+    OUTPUT_DIR, PRECLASSIFIER_PATH, PRECLASSIFY_CONFIDENCE, PRECLASSIFY_MIN_AGREEMENT,
+    PRECLASSIFY_MIN_EXAMPLES, PRECLASSIFY_HOLDOUT,
+)
+from analysis.analyze import iter_session_items, iter_classified_items, LOCAL_LABELS_FILE
+
+LABELS = ("old", "new")
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+URL_RE = re.compile(r'https?://\S+')
+TRAINING_COLUMNS = ["keyword", "text", "classification", "label_source", "uuid"]
+
+def features(text: str) -> list:
+    words = TOKEN_RE.findall(URL_RE.sub(" ", text.lower()))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def is_holdout(uuid: str) -> bool:
+    return hashlib.md5(uuid.encode()).digest()[0] < 256 * PRECLASSIFY_HOLDOUT
+
+def iter_training_items(output_dir: Path = OUTPUT_DIR):
+    """(keyword, text, label, uuid) for LLM-labelled items of every processed session"""
+    for session_dir in sorted(output_dir.glob("session_*")):
+        for item in iter_classified_items(session_dir, TRAINING_COLUMNS):
+            if item.get("classification") in (*LABELS, "unknown") and item.get("label_source") in (None, "batch", "cache"):
+                yield item["keyword"], item["text"], item["classification"], item["uuid"]
+
+class NaiveBayes:
+    def __init__(self, counts=None, docs=None):
+        self.counts = {label: Counter((counts or {}).get(label, {})) for label in LABELS}
+        self.docs = Counter(docs or {})
+        self._totals = None
+
+    def fit_one(self, text, label):
+        self.counts[label].update(features(text))
+        self.docs[label] += 1
+        self._totals = None
+
+    def predict(self, text):
+        """(label, probability) of the more likely label"""
+        if self._totals is None:
+            self._totals = {label: sum(self.counts[label].values()) for label in LABELS}
+            self._vocab = len(set(self.counts["old"]) | set(self.counts["new"])) or 1
+        n_docs = sum(self.docs.values())
+        scores = {}
+        for label in LABELS:
+            score = math.log((self.docs[label] + 1) / (n_docs + len(LABELS)))
+            denominator = self._totals[label] + self._vocab
+            for feature in features(text):
+                score += math.log((self.counts[label][feature] + 1) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        other = min(scores, key=scores.get)
+        return best, 1 / (1 + math.exp(scores[other] - scores[best]))
+
+    def to_dict(self):
+        return {"counts": {label: dict(self.counts[label]) for label in LABELS}, "docs": dict(self.docs)}
+
+def train(output_dir: Path = OUTPUT_DIR, confidence: float = PRECLASSIFY_CONFIDENCE) -> dict:
+    """Fit a model per keyword on old/new labels and measure it on the held-out items
+
+    Held-out items the LLM called 'unknown' count as disagreements when the
+    model is confident about them.
+    """
+    models = defaultdict(NaiveBayes)
+    holdout = defaultdict(list)
+    for keyword, text, label, uuid in iter_training_items(output_dir):
+        if is_holdout(uuid):
+            holdout[keyword].append((text, label))
+        elif label in LABELS:
+            models[keyword].fit_one(text, label)
+
+    trained = {}
+    for keyword, model in models.items():
+        held = holdout[keyword]
+        confident = agreed = 0
+        for text, label in held:
+            predicted, probability = model.predict(text)
+            if probability >= confidence:
+                confident += 1
+                agreed += predicted == label
+        metrics = {
+            "train": sum(model.docs.values()),
+            "holdout": len(held),
+            "coverage": round(confident / len(held), 3) if held else 0,
+            "agreement": round(agreed / confident, 3) if confident else 0,
+        }
+        enabled = (
+            metrics["train"] >= PRECLASSIFY_MIN_EXAMPLES and
+            confident > 0 and
+            metrics["agreement"] >= PRECLASSIFY_MIN_AGREEMENT
+        )
+        trained[keyword] = {**model.to_dict(), "metrics": metrics, "enabled": enabled}
+    return trained
+
+def save_model(trained: dict, path: Path = PRECLASSIFIER_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"confidence": PRECLASSIFY_CONFIDENCE, "keywords": trained}, f)
+
+def load_model(path: Path = PRECLASSIFIER_PATH) -> dict:
+    """keyword -> NaiveBayes for the keywords that passed the agreement check"""
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        keyword: NaiveBayes(entry["counts"], entry["docs"])
+        for keyword, entry in data["keywords"].items()
+        if entry["enabled"]
+    }
+
+def preclassify_session(session_dir: Path, models: dict = None, confidence: float = PRECLASSIFY_CONFIDENCE) -> dict:
+    """Label the confident items locally, write batches/local_labels.jsonl and return counts"""
+    models = load_model() if models is None else models
+    out_dir = session_dir / "batches"
+    out_dir.mkdir(exist_ok=True)
+    counts = {"items": 0, "local": 0}
+    with open(out_dir / LOCAL_LABELS_FILE, "w") as f:
+        for keyword, platform, item in iter_session_items(session_dir):
+            counts["items"] += 1
+            if keyword not in models:
+                continue
+            label, probability = models[keyword].predict(item["text"])
+            if probability >= confidence:
+                counts["local"] += 1
+                f.write(json.dumps({"uuid": item["uuid"], "label": label, "confidence": round(probability, 4)}) + "\n")
+    return counts
+
+if __name__ == "__main__":
+    trained = train()
+    save_model(trained)
+    for keyword, entry in trained.items():
+        m = entry["metrics"]
+        state = "enabled" if entry["enabled"] else "disabled"
+        print(f"{keyword:12s} train {m['train']:6d}  holdout {m['holdout']:5d}  "
+              f"coverage {m['coverage']:.1%}  agreement {m['agreement']:.1%}  {state}")
@@ -0,0 +1,70 @@
+"""Per-uuid facts about one session's items, in a SQLite file next to its batches.
+
+analyze_batch joins the raw items against the cache keys, near-duplicate
+clusters, local labels, streamed labels and batch results. Keeping those in an on-disk table
+instead of dicts holds memory flat however large the session grows.
+"""
+import sqlite3
+from pathlib import Path
+from config import SQLITE_LOOKUP_CHUNK
+
+LABELS_DB = "labels.sqlite3"
+COLUMNS = ("key", "cluster", "local_label", "stream_label", "stream_source", "batch_label", "tokens")
+CACHE_KB = 32 * 1024
+
+class SessionLabels:
+    def __init__(self, session_dir: Path):
+        self.path = session_dir / "batches" / LABELS_DB
+        self.path.unlink(missing_ok=True) # rebuilt from the session files on every run
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+        self.conn.execute(
+            "CREATE TABLE items ("
+            " uuid TEXT PRIMARY KEY,"
+            " key TEXT,"
+            " cluster TEXT,"
+            " local_label TEXT,"
+            " stream_label TEXT,"
+            " stream_source TEXT,"
+            " batch_label TEXT,"
+            " tokens INTEGER"
+            ") WITHOUT ROWID"
+        )
+
+    def set_many(self, columns, rows):
+        """Set `columns` for each (uuid, *values) row, keeping the item's other columns"""
+        if not set(columns) <= set(COLUMNS):
+            raise ValueError(f"Unknown columns: {columns}")
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO items (uuid, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})"
+                f" ON CONFLICT(uuid) DO UPDATE SET {updates}",
+                rows,
+            )
+
+    def get_many(self, uuids) -> dict:
+        """uuid -> {key, cluster, local_label, stream_label, stream_source, batch_label, tokens} for the uuids that have any"""
+        uuids = list(uuids)
+        found = {}
+        for i in range(0, len(uuids), SQLITE_LOOKUP_CHUNK):
+            chunk = uuids[i:i + SQLITE_LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT uuid, {', '.join(COLUMNS)} FROM items WHERE uuid IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for uuid, *values in rows:
+                found[uuid] = dict(zip(COLUMNS, values))
+        return found
+
+    def new_cache_entries(self):
+        """(key, label, tokens) for batch results of items that have a cache key"""
+        return self.conn.execute(
+            "SELECT key, batch_label, tokens FROM items WHERE batch_label IN ('old', 'new', 'unknown') AND key IS NOT NULL"
+        )
+
+    def close(self, remove=True):
+        self.conn.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
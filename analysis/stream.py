@@ -0,0 +1,278 @@
+"""Classify items while the scrapers are still collecting them.
+
+Scrapers hand their accepted items to StreamingClassifier.put, which blocks
+while the bounded queue is full, so a classifier that falls behind slows the
+scrapers down instead of piling items up in memory. A batcher thread sends
+the items as rolling micro-batches, once STREAM_BATCH_SIZE are waiting or
+the oldest has waited STREAM_BATCH_SECONDS, with at most
+STREAM_MAX_IN_FLIGHT batches out at a time. A collector thread polls those
+batches and, as each one finishes, appends its labels to
+batches/streamed.jsonl and to the classification cache.
+
+Texts already in the cache or labelled by the local pre-classifier are
+answered without a request. With NEAR_DUPLICATES on, a text that nearly
+duplicates one already sent takes that text's label instead of being sent.
+Streamed clusters are never merged afterwards the way
+collapse_near_duplicates merges them, so the stream may send a few texts
+the full pass would have collapsed, but never two of one cluster it has
+seen. process_session afterwards skips every item in streamed.jsonl, sends
+only what the stream did not answer (items of failed or unfinished
+micro-batches, or everything after the stream stopped on an error) and
+writes the usual processed files, keeping each streamed item's label source.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+from config import (
+    STREAM_BATCH_SIZE, STREAM_BATCH_SECONDS, STREAM_QUEUE_SIZE, STREAM_MAX_IN_FLIGHT, STREAM_POLL_SECONDS,
+    CLASSIFICATION_CACHE_PATH, PRECLASSIFY, PRECLASSIFY_CONFIDENCE, NEAR_DUPLICATES,
+)
+from analysis.analyze import iter_batch_results, STREAMED_FILE
+from analysis.classify import batch_request, upload_shard, BATCH_FAILED_STATUSES
+from analysis.client import get_client
+from analysis.classification_cache import ClassificationCache, cache_key
+from analysis.near_duplicates import NearDuplicateIndex
+from analysis.preclassify import load_model
+
+_STOP = object()
+
+class StreamingClassifier:
+    def __init__(self, session_dir: Path, defs: Dict, client=None, cache_path=CLASSIFICATION_CACHE_PATH,
+                 models: dict = None, batch_size: int = STREAM_BATCH_SIZE, batch_seconds: float = STREAM_BATCH_SECONDS,
+                 queue_size: int = STREAM_QUEUE_SIZE, max_in_flight: int = STREAM_MAX_IN_FLIGHT,
+                 poll_seconds: float = STREAM_POLL_SECONDS, near_duplicates: bool = NEAR_DUPLICATES, logger=None):
+        self.session_dir = session_dir
+        self.defs = defs
+        self.client = client if client is not None else get_client()
+        self.cache_path = cache_path
+        self.models = models if models is not None else (load_model() if PRECLASSIFY else {})
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.poll_seconds = poll_seconds
+        self.logger = logger or logging.getLogger("scraper")
+
+        self.items = queue.Queue(maxsize=queue_size)
+        self.submitted = queue.Queue()
+        self.in_flight = threading.Semaphore(max_in_flight)
+        self.batcher_done = threading.Event()
+        self.aborted = threading.Event()
+        self.lock = threading.Lock()
+        self.waiting = {} # cache key -> [(uuid, keyword, platform, source)] for texts sent but not answered yet
+        self.near = NearDuplicateIndex() if near_duplicates else None
+        self.errors = []
+        self.stats = {"items": 0, "cache": 0, "local": 0, "duplicates": 0, "near_duplicates": 0, "requests": 0,
+                      "batches": 0, "classified": 0}
+        self.started_at = None
+        self.first_result_at = None
+
+        (session_dir / "batches").mkdir(parents=True, exist_ok=True)
+        self.output = open(session_dir / "batches" / STREAMED_FILE, "a", encoding="utf-8")
+        self.threads = [
+            threading.Thread(target=self._guard, args=(self._batch,), name="stream-batcher", daemon=True),
+            threading.Thread(target=self._guard, args=(self._collect,), name="stream-collector", daemon=True),
+        ]
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def put(self, keyword: str, platform: str, items: list):
+        """Queue a scraper's accepted items, waiting while the queue is full"""
+        while not self.aborted.is_set():
+            try:
+                self.items.put((keyword, platform, list(items)), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """Send what is left, wait for every batch to come back and stop the threads
+
+        A failure does not raise: the stats list it under "errors" and
+        process_session sends whatever the stream did not answer.
+        """
+        # once aborted nothing drains the queue, and the threads stop on their own
+        while not self.aborted.is_set():
+            try:
+                self.items.put((None, None, _STOP), timeout=1)
+                break
+            except queue.Full:
+                continue
+        for thread in self.threads:
+            thread.join()
+        self.output.close()
+        self.stats["errors"] = [str(e) for e in self.errors]
+        if self.errors:
+            self.logger.warning(f"Streaming classification stopped early ({len(self.errors)} errors), "
+                                f"process_session sends the items it did not answer")
+        return self.stats
+
+    def abort(self):
+        """Stop without waiting for batches still out; process_session sends their texts again"""
+        self.aborted.set()
+        for thread in self.threads:
+            thread.join()
+        self.output.close()
+
+    def _guard(self, target):
+        try:
+            target()
+        except Exception as e:
+            self.logger.error(f"Streaming classification failed: {str(e)}")
+            self.errors.append(e)
+            self.aborted.set()
+        finally:
+            if target == self._batch:
+                self.batcher_done.set()
+
+    def _emit(self, entries, label):
+        with self.lock:
+            for uuid, keyword, platform, source in entries:
+                self.output.write(json.dumps({
+                    "uuid": uuid, "keyword": keyword, "platform": platform,
+                    "classification": label, "label_source": source,
+                }) + "\n")
+            self.output.flush()
+            self.stats["classified"] += len(entries)
+            if entries and self.first_result_at is None:
+                self.first_result_at = time.perf_counter()
+
+    def _batch(self):
+        cache = ClassificationCache(self.cache_path)
+        pending = []
+        oldest = None
+        try:
+            while not self.aborted.is_set():
+                timeout = 1.0
+                if pending:
+                    timeout = min(timeout, max(0.0, oldest + self.batch_seconds - time.monotonic()))
+                try:
+                    keyword, platform, items = self.items.get(timeout=timeout)
+                except queue.Empty:
+                    if pending and time.monotonic() - oldest >= self.batch_seconds:
+                        self._submit(pending)
+                        pending = []
+                    continue
+                if items is _STOP:
+                    if pending:
+                        self._submit(pending)
+                    return
+
+                for item in items:
+                    self.stats["items"] += 1
+                    uuid = item["uuid"]
+                    key = cache_key(keyword, item["text"], self.defs)
+                    cached = cache.get(key)
+                    if cached is not None:
+                        self.stats["cache"] += 1
+                        self._emit([(uuid, keyword, platform, "cache")], cached[0])
+                        continue
+                    if keyword in self.models:
+                        label, probability = self.models[keyword].predict(item["text"])
+                        if probability >= PRECLASSIFY_CONFIDENCE:
+                            self.stats["local"] += 1
+                            self._emit([(uuid, keyword, platform, "local")], label)
+                            continue
+                    with self.lock:
+                        if key in self.waiting:
+                            self.stats["duplicates"] += 1
+                            self.waiting[key].append((uuid, keyword, platform, "batch"))
+                            continue
+                    if self._near_duplicate(key, keyword, platform, item, cache):
+                        continue
+                    with self.lock:
+                        self.waiting[key] = [(uuid, keyword, platform, "batch")]
+                    if not pending:
+                        oldest = time.monotonic()
+                    pending.append((key, keyword, item))
+
+                if len(pending) >= self.batch_size:
+                    self._submit(pending)
+                    pending = []
+        finally:
+            cache.close()
+
+    def _near_duplicate(self, key, keyword, platform, item, cache) -> bool:
+        """Leave the item to an earlier near-duplicate that was sent, if it is still waiting or was answered"""
+        if self.near is None:
+            return False
+        representative = self.near.lookup(keyword, item["text"], key)
+        if representative is None or representative == key:
+            return False
+        entry = (item["uuid"], keyword, platform, "cluster")
+        with self.lock:
+            if representative in self.waiting:
+                self.waiting[representative].append(entry)
+                self.stats["near_duplicates"] += 1
+                return True
+        # answered ones are read back from the cache, _merge puts them there before they stop waiting
+        cached = cache.get(representative)
+        if cached is None: # its batch failed, so this one is sent instead
+            return False
+        self.stats["near_duplicates"] += 1
+        self._emit([entry], cached[0])
+        return True
+
+    def _submit(self, pending):
+        # blocks while too many batches are out, which backs the queue and the scrapers up
+        while not self.in_flight.acquire(timeout=1):
+            if self.aborted.is_set():
+                return
+        shard = self.session_dir / "batches" / f"stream_{self.stats['batches']:04d}.jsonl"
+        with open(shard, "w", encoding="utf-8") as f:
+            for key, keyword, item in pending:
+                f.write(json.dumps(batch_request(item["uuid"], keyword, item["text"], self.defs)) + "\n")
+        batch = self.client.batches.create(
+            input_file_id=upload_shard(shard, self.client),
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(pending)
+        self.logger.info(f"Streamed micro-batch {batch.id} with {len(pending)} requests")
+        self.submitted.put((batch.id, {item["uuid"]: key for key, _, item in pending}))
+
+    def _collect(self):
+        cache = ClassificationCache(self.cache_path)
+        out = {}
+        try:
+            while not self.aborted.is_set():
+                while True:
+                    try:
+                        batch_id, keys = self.submitted.get_nowait()
+                    except queue.Empty:
+                        break
+                    out[batch_id] = keys
+                if not out and self.batcher_done.is_set() and self.submitted.empty():
+                    return
+
+                for batch_id in list(out):
+                    status = self.client.batches.retrieve(batch_id).status
+                    if status == "completed":
+                        self._merge(batch_id, out.pop(batch_id), cache)
+                    elif status in BATCH_FAILED_STATUSES:
+                        self.logger.error(f"Streamed batch {batch_id} {status}, process_session will send its texts again")
+                        with self.lock:
+                            for key in out.pop(batch_id).values():
+                                self.waiting.pop(key, None)
+                    else:
+                        continue
+                    self.in_flight.release()
+                self.aborted.wait(self.poll_seconds if out else min(self.poll_seconds, 0.1))
+        finally:
+            cache.close()
+
+    def _merge(self, batch_id, keys, cache):
+        results = [(keys[custom_id], label, tokens) for custom_id, label, tokens in iter_batch_results([batch_id], self.client)]
+        # cached before the keys stop waiting, so a repeat of the text is a cache hit rather than a new request
+        cache.put_many(entry for entry in results if entry[1] != "error")
+        for key, label, _ in results:
+            with self.lock:
+                waiting = self.waiting.pop(key, [])
+            self._emit(waiting, label)
@@ -0,0 +1,78 @@
+"""Cross-session queries: materialized per-session rollups vs reloading every
+session's classified items.
+
+Builds synthetic processed sessions, ingests them, ingests again (nothing new
+should be read), then times the "share of the new meaning of a keyword over
+the last 20 runs" query both ways and checks they agree.
+
+Run from the repo root: python -m benchmarks.bench_analytics
+"""
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+
+from config import KEYWORDS
+from analysis.analytics import AnalyticsStore
+from analysis.analyze import iter_classified_items
+from benchmarks.session import make_item
+from benchmarks.stub_openai import LABELS
+
+SESSIONS = 30
+ITEMS_PER_FILE = 2_000
+
+def make_processed_session(output_dir: Path, index: int) -> Path:
+    rng = random.Random(index)
+    session_dir = output_dir / f"session_202505{index // 24 + 1:02d}-{index % 24:02d}0000"
+    processed = session_dir / "processed"
+    processed.mkdir(parents=True)
+    for keyword in KEYWORDS:
+        for platform in ("twitter", "reddit"):
+            with open(processed / f"{keyword}_{platform}_classified.jsonl", "w") as f:
+                for i in range(ITEMS_PER_FILE):
+                    item = make_item(rng, keyword, platform, i)
+                    label = rng.choices(LABELS, weights=[1, 1 + index / 10, 0.2])[0]
+                    f.write(json.dumps({**item, "platform": platform, "classification": label, "keyword": keyword}) + "\n")
+    (processed / "summary_stats.json").write_text("{}")
+    return session_dir
+
+def reload_share(output_dir: Path, keyword: str, last: int = 20):
+    """The way without the store: read every item of the last sessions again"""
+    sessions = sorted(output_dir.glob("session_*"))[-last:]
+    shares = []
+    for session_dir in sessions:
+        counts = Counter(item["classification"] for item in iter_classified_items(session_dir) if item["keyword"] == keyword)
+        total = sum(counts.values())
+        shares.append((session_dir.name, total, counts["new"], round(counts["new"] / total, 4)))
+    return shares
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        for index in range(SESSIONS):
+            make_processed_session(output_dir, index)
+        store = AnalyticsStore(output_dir / "analytics.sqlite3")
+        first, ingested = timed(store.ingest, output_dir)
+        again, ingested_again = timed(store.ingest, output_dir)
+        assert len(ingested) == SESSIONS and not ingested_again
+        keyword = next(iter(KEYWORDS))
+        reload, expected = timed(reload_share, output_dir, keyword)
+        query, shares = timed(store.share_by_session, keyword)
+        assert shares == expected
+        items = SESSIONS * len(KEYWORDS) * 2 * ITEMS_PER_FILE
+        print(f"{SESSIONS} sessions, {items} items: ingest {first:.2f}s, ingest again {again * 1000:.1f} ms (nothing new)")
+        print(f"'{keyword}' new-meaning share over the last 20 runs: reload items {reload:.2f}s, "
+              f"rollups {query * 1000:.2f} ms, {shares[0][3]:.1%} -> {shares[-1][3]:.1%}")
+        _, months = timed(store.share_by_period, keyword, "new", "day")
+        query, subreddits = timed(store.share_by_subreddit, keyword)
+        print(f"by day: {len(months)} days; by subreddit: {query * 1000:.2f} ms, "
+              + ", ".join(f"{name} {share:.1%}" for name, _, _, share in subreddits))
+        store.close()
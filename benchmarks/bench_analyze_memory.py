@@ -0,0 +1,88 @@
+"""Peak memory of analyze_batch as the session grows, up to a million items.
+
+Each size builds a synthetic session, writes its batch shards and a stub
+batch output on disk, then analyzes it in a fresh process and reports the
+growth of the peak RSS over the interpreter after imports. Streaming keeps
+that growth flat; loading the whole session made it several times the
+session's size.
+
+Run from the repo root: python -m benchmarks.bench_analyze_memory [sizes...]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+from config import KEYWORDS
+from analysis.analyze import analyze_batch
+from analysis.classify import write_batch_shards
+from analysis.classification_cache import ClassificationCache
+from benchmarks.session import make_session
+from benchmarks.stub_openai import stub_label, DiskClient
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+def write_output(shard: Path, output: Path):
+    with open(shard) as requests, open(output, "w") as f:
+        for line in requests:
+            custom_id = json.loads(line)["custom_id"]
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": stub_label(custom_id)}}],
+                    "usage": {"total_tokens": 100},
+                }},
+            }) + "\n")
+
+def build(session_dir: Path, size: int) -> dict:
+    make_session(session_dir, KEYWORDS, size // (2 * len(KEYWORDS)))
+    outputs = {}
+    for i, shard in enumerate(write_batch_shards(session_dir, KEYWORDS)):
+        outputs[f"batch-{i}"] = str(shard.with_name(f"output_{i:03d}.jsonl"))
+        write_output(shard, Path(outputs[f"batch-{i}"]))
+    return outputs
+
+def peak_rss_mb() -> float:
+    """VmHWM rather than ru_maxrss, which a child process inherits from its parent on Linux"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+def analyze(session_dir: Path, outputs: dict):
+    """Child process: analyze and print the peak RSS growth and the time taken"""
+    baseline = peak_rss_mb()
+    cache = ClassificationCache(session_dir / "cache.sqlite3")
+    start = time.perf_counter()
+    analyze_batch(session_dir, list(outputs), DiskClient(outputs), cache)
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_rss_mb() - baseline}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES)
+    parser.add_argument("--analyze", nargs=2, metavar=("SESSION", "OUTPUTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.analyze:
+        session_dir, outputs = args.analyze
+        analyze(Path(session_dir), json.loads(outputs))
+        sys.exit()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            session_dir = Path(tmp) / "session"
+            outputs = build(session_dir, size)
+            raw_mb = sum(f.stat().st_size for f in (session_dir / "raw").iterdir()) / 2**20
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_analyze_memory", "--analyze", str(session_dir), json.dumps(outputs)],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(child.stdout.splitlines()[-1])
+            with open(session_dir / "processed" / "summary_stats.json") as f:
+                total = sum(stats["total"] for platforms in json.load(f).values() for stats in platforms.values())
+            print(f"{total:9d} items  raw {raw_mb:7.1f} MB  analyze {result['seconds']:6.1f}s  "
+                  f"peak memory growth {result['peak_mb']:6.1f} MB")
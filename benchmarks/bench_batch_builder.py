@@ -0,0 +1,61 @@
+"""Batch file construction: string concatenation vs streamed shards, plus a sharded
+end-to-end run against the local files/batches stub.
+
+CPython can often grow a string in place, so the concatenating builder is
+rarely quadratic in wall time; what streaming removes is holding the whole
+payload, and a single upload over the Batch API limits.
+
+Run from the repo root: python -m benchmarks.bench_batch_builder
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+
+from config import KEYWORDS
+from analysis.analyze import iter_classified_items
+from analysis.classify import iter_batch_requests, write_batch_shards, process_session
+from analysis.analytics import AnalyticsStore
+from analysis.classification_cache import ClassificationCache
+from benchmarks.session import make_session
+from benchmarks.stub_openai import StubOpenAI, stub_label
+
+SIZES = [1_000, 5_000, 20_000]
+
+def concatenated(session_dir, defs):
+    """The previous builder: one growing string"""
+    jsonl_content = ""
+    for request in iter_batch_requests(session_dir, defs):
+        jsonl_content += json.dumps(request) + "\n"
+    return jsonl_content
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def check_sharded_run(session_dir, max_requests, cache):
+    client = StubOpenAI()
+    analytics = AnalyticsStore(session_dir / "analytics.sqlite3")
+    process_session(session_dir, KEYWORDS, client, max_requests=max_requests, cache=cache, analytics=analytics)
+    shards = sorted((session_dir / "batches").glob("shard_*.jsonl"))
+    classified = list(iter_classified_items(session_dir))
+    assert all(item["classification"] == stub_label(item["uuid"]) for item in classified)
+    print(f"{len(shards)} shards, {len(client.batches.batches)} batches, "
+          f"{len(classified)} items merged back with the right labels")
+
+if __name__ == "__main__":
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            session_dir = make_session(Path(tmp), KEYWORDS, size // (2 * len(KEYWORDS)))
+            old = timed(concatenated, session_dir, KEYWORDS)
+            new = timed(write_batch_shards, session_dir, KEYWORDS)
+            print(f"{size:7d} requests  concatenate {old:6.2f}s  stream to shards {new:6.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_dir = make_session(Path(tmp) / "session", KEYWORDS, 500)
+        cache = ClassificationCache(Path(tmp) / "cache.sqlite3")
+        check_sharded_run(session_dir, 1_000, cache)
+        # the same texts in a new session: everything comes from the cache, nothing is sent
+        check_sharded_run(make_session(Path(tmp) / "again", KEYWORDS, 500), 1_000, cache)
@@ -0,0 +1,72 @@
+"""Per-scroll extraction cost, full re-parse vs incremental, on a growing saved timeline.
+
+Every scroll also adds an ad-like cell with no status link, which must not
+stay in the pending queue the scroll controller watches for new content.
+Growth compares the median of scrolls 2-6 with the median of the last five,
+the first scroll being a warm-up.
+
+Run from the repo root: python -m benchmarks.bench_incremental_extraction
+"""
+import json
+import logging
+import statistics
+import time
+from patchright.sync_api import sync_playwright
+from scrapers.twitter import collect_full, collect_incremental, install_article_observer
+from benchmarks.timeline import make_cells, timeline_html
+
+SCROLLS = 40
+CELLS_PER_SCROLL = 20
+KEYWORD = "slay"
+AD_CELL = '<div data-testid="cellInnerDiv"><article><div data-testid="placementTracking">Promoted</div></article></div>'
+PENDING_JS = "() => (window.__pendingArticles || []).length"
+
+APPEND_CELLS_JS = """
+(cells) => {
+    const timeline = document.querySelector('div[aria-label="Timeline: Search timeline"] > div');
+    timeline.insertAdjacentHTML('beforeend', cells.join(''));
+}
+"""
+
+def run():
+    logger = logging.getLogger("bench")
+    rows = []
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.set_content(timeline_html([]))
+        install_article_observer(page)
+
+        full_seen, incremental_seen = set(), set()
+        for scroll in range(SCROLLS):
+            page.evaluate(APPEND_CELLS_JS, make_cells(CELLS_PER_SCROLL, scroll * CELLS_PER_SCROLL) + [AD_CELL])
+
+            start = time.perf_counter()
+            full = collect_full(page, KEYWORD, full_seen, logger)
+            full_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            incremental = collect_incremental(page, KEYWORD, incremental_seen, logger)
+            incremental_ms = (time.perf_counter() - start) * 1000
+            assert page.evaluate(PENDING_JS) == 0, "unlinked articles left in the pending queue"
+
+            rows.append({
+                "scroll": scroll + 1,
+                "articles_on_page": (scroll + 1) * CELLS_PER_SCROLL,
+                "full_ms": round(full_ms, 2),
+                "full_collected": len(full),
+                "incremental_ms": round(incremental_ms, 2),
+                "incremental_collected": len(incremental),
+            })
+            print(f"scroll {scroll + 1:3d}  articles {(scroll + 1) * CELLS_PER_SCROLL:5d}  "
+                  f"full {full_ms:8.2f}ms  incremental {incremental_ms:8.2f}ms")
+        browser.close()
+    return rows
+
+if __name__ == "__main__":
+    rows = run()
+    def growth(column):
+        early = statistics.median(row[column] for row in rows[1:6])
+        late = statistics.median(row[column] for row in rows[-5:])
+        return round(late / early, 2)
+    print(json.dumps({"full_growth": growth("full_ms"), "incremental_growth": growth("incremental_ms")}))
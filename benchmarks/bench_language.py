@@ -0,0 +1,50 @@
+"""Throughput and agreement of the language filter on a recorded corpus.
+
+Agreement is measured against the original check (langdetect on every text),
+with langdetect seeded so the reference itself is stable.
+
+Run from the repo root: python -m benchmarks.bench_language
+"""
+import json
+import time
+from pathlib import Path
+import language
+
+CORPUS = Path(__file__).parent / "fixtures" / "texts.jsonl"
+COPIES = 30 # distinct variants of every corpus text, so the cache cannot answer them
+
+def load_corpus():
+    with open(CORPUS, encoding="utf8") as f:
+        return [json.loads(line)["text"] for line in f]
+
+def variants(texts):
+    # a trailing counter keeps every text distinct without changing its language
+    return [f"{text} {i}" for i in range(COPIES) for text in texts]
+
+def rate(count, seconds):
+    return f"{count / seconds:10.0f} texts/sec"
+
+if __name__ == "__main__":
+    corpus = load_corpus()
+    texts = variants(corpus)
+    language.detect_english(corpus[0]) # load the langdetect profiles outside the timings
+
+    start = time.perf_counter()
+    reference = [language.detect_english(text) for text in texts]
+    print(f"langdetect on every text   {rate(len(texts), time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    single = [language.is_english(text) for text in texts]
+    print(f"is_english, cold cache     {rate(len(texts), time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    [language.is_english(text) for text in texts]
+    print(f"is_english, warm cache     {rate(len(texts), time.perf_counter() - start)}")
+
+    settled = sum(1 for text in texts if language.prefilter(text) is not None)
+    agree = sum(1 for a, b in zip(single, reference) if a == b)
+    print(f"settled by prefilter: {settled / len(texts):.0%}")
+    print(f"agreement with langdetect: {agree}/{len(texts)} ({agree / len(texts):.1%})")
+    for text, got, want in zip(corpus, single, reference):
+        if got != want:
+            print(f"  differs: {text!r} -> {got}, langdetect {want}")
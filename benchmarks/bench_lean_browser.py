@@ -0,0 +1,64 @@
+"""Bytes transferred and scroll-to-parse time with and without the lean
+browser mode, against the local search-page stand-in serving an image per
+tweet plus a web font and an analytics script per page.
+
+Scroll-to-parse time is from the wheel event until the new articles are
+parsed into records. Runs in a temporary working directory so the browser
+profiles stay out of twitter_session/.
+
+Run from the repo root: python -m benchmarks.bench_lean_browser
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+WORKDIR = tempfile.mkdtemp()
+os.chdir(WORKDIR) # before config is imported, so its relative output paths land here
+
+from patchright.sync_api import sync_playwright
+from scrapers.browser import launch_browser, watch_resources
+from scrapers.twitter import install_article_observer, drain_new_articles
+from benchmarks.search_server import serve
+
+SCROLLS = 30
+EXTRAS = """
+<style>
+@font-face { font-family: Chirp; src: url(/fonts/chirp-regular.woff2); }
+@font-face { font-family: ChirpBold; src: url(/fonts/chirp-bold.woff2); }
+body { font-family: Chirp; } b { font-family: ChirpBold; }
+</style>
+<script src="/analytics/collect.js"></script>
+"""
+PENDING_JS = "() => (window.__pendingArticles || []).length > 0"
+
+def run(url, lean):
+    with sync_playwright() as p:
+        browser = launch_browser(p, Path(WORKDIR) / f"profile-{lean}", headless=True)
+        resources = watch_resources(browser, lean, blocked_url_parts=("/analytics/",))
+        page = browser.new_page()
+        page.goto(url + "/search?q=slay&f=live", wait_until="load")
+        install_article_observer(page)
+        drain_new_articles(page)
+        timings, parsed = [], 0
+        for _ in range(SCROLLS):
+            start = time.perf_counter()
+            page.mouse.wheel(0, 10000)
+            page.wait_for_function(PENDING_JS, timeout=10_000)
+            parsed += len(drain_new_articles(page))
+            timings.append(time.perf_counter() - start)
+        page.wait_for_load_state("networkidle")
+        browser.close()
+    return resources, timings, parsed
+
+if __name__ == "__main__":
+    server, url = serve(latency=0.05, extras=EXTRAS, media=True)
+    for lean in (False, True):
+        resources, timings, parsed = run(url, lean)
+        print(f"lean={lean!s:5}  {parsed} tweets  scroll-to-parse median {statistics.median(timings) * 1000:.0f} ms"
+              f"  p90 {statistics.quantiles(timings, n=10)[-1] * 1000:.0f} ms")
+        print(f"    {resources.summary()}")
+    server.shutdown()
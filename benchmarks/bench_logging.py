@@ -0,0 +1,95 @@
+"""Logging cost in the collect loop: the old setup (a file and console handler
+added on every setup_logger call, a DEBUG line per item) against the queued
+session logger with per-item events summed by item_events.
+
+Runs collect_records over synthetic records, six keywords in a row like a
+session with six scrape jobs, and reports seconds per 100k items and the
+lines written, next to the same loop with logging off. Console output goes
+to /dev/null so the terminal does not skew the numbers.
+
+Run from the repo root: python -m benchmarks.bench_logging
+"""
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+WORKDIR = tempfile.mkdtemp()
+os.chdir(WORKDIR) # before config is imported, so its relative output paths land here
+
+import scrapers.twitter as twitter
+from logger import setup_logger, stop_logging
+
+KEYWORDS = 6
+ITEMS = 20_000 # per keyword, a third of them duplicates and a third rejected
+
+def legacy_setup_logger(name, session_dir):
+    """setup_logger as it was: new handlers on every call, written synchronously"""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    fh = logging.FileHandler(session_dir / "session.log")
+    fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    ch = logging.StreamHandler()
+    ch.setFormatter(logging.Formatter('%(message)s'))
+    ch.setLevel(logging.INFO)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+    return logger
+
+def legacy_collect_records(records, keyword, seen_ids, logger, index=None):
+    new_results = []
+    for record in records:
+        tweet_id = record["id"]
+        if tweet_id in seen_ids:
+            logger.debug(f"Skipping duplicate tweet: {tweet_id}")
+            continue
+        if not twitter.should_keep_record(record, keyword):
+            logger.debug(f"Rejected tweet {tweet_id} - validation failed")
+            continue
+        seen_ids.add(tweet_id)
+        new_results.append(twitter.tweet_from_record(record))
+        logger.debug(f"Collected tweet: {tweet_id}")
+    return new_results
+
+def silent_logger(name, session_dir):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+def make_records(keyword, n):
+    records = []
+    for i in range(n):
+        text = f"that outfit is such a {keyword} moment honestly" if i % 3 else "ok"
+        records.append({
+            "id": str(i // 2 if i % 3 == 1 else i), "url": f"https://x.com/u/status/{i}", "created_at": None,
+            "text": text, "span_text": text, "username": "u",
+        })
+    return records
+
+def run(name, setup, collect):
+    session_dir = Path(tempfile.mkdtemp(dir=WORKDIR))
+    records = make_records("slay", ITEMS)
+    twitter.is_english = lambda text: True # keep langdetect out of the measurement
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        for k in range(KEYWORDS):
+            logger = setup(f"bench-{name}", session_dir)
+            logger.info(f"Starting keyword {k}")
+            collect(records, "slay", set(), logger)
+        seconds = time.perf_counter() - start
+        stop_logging()
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
+    log = session_dir / "session.log"
+    lines = sum(1 for _ in open(log, encoding="utf-8")) if log.exists() else 0
+    print(f"{name:7}  {seconds / (KEYWORDS * ITEMS) * 1e5:6.2f}s per 100k items  {lines:7d} log lines")
+
+if __name__ == "__main__":
+    run("none", silent_logger, twitter.collect_records)
+    run("legacy", legacy_setup_logger, legacy_collect_records)
+    run("queued", setup_logger, twitter.collect_records)
@@ -0,0 +1,70 @@
+"""Near-duplicate clustering: recall on injected variants and time at growing sizes.
+
+Each synthetic session gets a share of copies that differ from an original only
+by URLs, mentions, emoji, case or punctuation, which should all land in the
+original's cluster, plus copies with one word changed, which only do when
+the text is long enough to stay above the similarity threshold. Distinct
+texts should stay apart.
+
+Run from the repo root: python -m benchmarks.bench_near_duplicates
+"""
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+
+from analysis.near_duplicates import find_clusters
+from benchmarks.session import make_session, WORDS
+
+SIZES = [12_000, 60_000, 120_000]
+VARIANT_SHARE = 0.2
+KEYWORDS = ["slay", "lit", "sigma"]
+
+VARIANTS = ["urls/mentions", "case/emoji", "one word changed"]
+
+def variant(rng, text, kind):
+    if kind == 0:
+        return f"@user{rng.randrange(999)} {text} https://t.co/{rng.randrange(10**6)}"
+    if kind == 1:
+        return text.upper() + rng.choice([" 🔥🔥", "!!!", " 😂", "..."])
+    words = text.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+def add_variants(session_dir, rng):
+    """Append variants to every raw file, return {variant uuid: (original uuid, kind)}"""
+    expected = {}
+    for raw_file in sorted((session_dir / "raw").glob("*.json")):
+        items = json.loads(raw_file.read_text())
+        originals = rng.sample(items, int(len(items) * VARIANT_SHARE))
+        for n, original in enumerate(originals):
+            kind = n % len(VARIANTS)
+            copy = {**original, "uuid": f"{original['uuid']}-v{n}", "text": variant(rng, original["text"], kind)}
+            expected[copy["uuid"]] = (original["uuid"], kind)
+            items.append(copy)
+        raw_file.write_text(json.dumps(items))
+    return expected
+
+if __name__ == "__main__":
+    for size in SIZES:
+        rng = random.Random(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            per_file = int(size / (1 + VARIANT_SHARE)) // (2 * len(KEYWORDS))
+            session_dir = make_session(Path(tmp), KEYWORDS, per_file, seed=size)
+            expected = add_variants(session_dir, rng)
+
+            start = time.perf_counter()
+            clusters = find_clusters(session_dir)
+            seconds = time.perf_counter() - start
+
+            caught = []
+            for kind, name in enumerate(VARIANTS):
+                copies = [(c, o) for c, (o, k) in expected.items() if k == kind]
+                found = sum(1 for copy, original in copies if clusters[copy] == clusters[original])
+                caught.append(f"{name} {found / len(copies):.0%}")
+            originals = [uuid for uuid in clusters if uuid not in expected]
+            merged = len(originals) - len({clusters[uuid] for uuid in originals})
+            print(f"{len(clusters):7d} texts  {seconds:6.2f}s  {len(clusters) / seconds:6.0f} texts/sec  "
+                  f"caught: {', '.join(caught)}  distinct texts merged: {merged}")
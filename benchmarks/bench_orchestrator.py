@@ -0,0 +1,55 @@
+"""Wall time of sequential vs concurrent keyword x platform scraping with fake scrapers.
+
+The fakes sleep for a per-platform duration and one of them fails, to show that a
+failing job does not take the others down.
+
+Run from the repo root: python -m benchmarks.bench_orchestrator
+"""
+import logging
+import tempfile
+import time
+from pathlib import Path
+from orchestrator import run_job, run_jobs
+
+KEYWORDS = ["slay", "lit", "sigma", "karen", "troll", "influencer"]
+AMOUNT = 10
+SECONDS = {"twitter": 0.4, "reddit": 0.3}
+
+def fake_scraper(platform):
+    def scrape(keyword, amount):
+        time.sleep(SECONDS[platform])
+        if (platform, keyword) == ("reddit", "karen"):
+            raise RuntimeError("simulated API failure")
+        return [{"uuid": f"{platform}-{keyword}-{i}", "id": str(i), "text": keyword} for i in range(amount)]
+    return scrape
+
+def timed_sequential(raw_dir):
+    """The old scrape.py loop: one job after another"""
+    logger = logging.getLogger("bench")
+    start = time.perf_counter()
+    for keyword in KEYWORDS:
+        for platform in SECONDS:
+            run_job(fake_scraper(platform), keyword, platform, AMOUNT, raw_dir, logger)
+    return time.perf_counter() - start
+
+def timed(concurrency, raw_dir):
+    scrapers = {platform: fake_scraper(platform) for platform in SECONDS}
+    start = time.perf_counter()
+    jobs = run_jobs(KEYWORDS, AMOUNT, raw_dir, scrapers, concurrency=concurrency, logger=logging.getLogger("bench"))
+    return time.perf_counter() - start, jobs
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = Path(tmp)
+        sequential = timed_sequential(raw_dir)
+        side_by_side, _ = timed({"twitter": 1, "reddit": 1}, raw_dir)
+        concurrent, jobs = timed({"twitter": 1, "reddit": 3}, raw_dir)
+
+        failed = [job for job in jobs if job["status"] == "failed"]
+        saved = sorted(p.name for p in raw_dir.glob("*.json"))
+        assert len(failed) == 1 and len(saved) == len(KEYWORDS) * len(SECONDS) - 1
+
+        print(f"sequential            {sequential:6.2f}s")
+        print(f"platforms in parallel {side_by_side:6.2f}s  speedup {sequential / side_by_side:4.1f}x")
+        print(f"reddit x3             {concurrent:6.2f}s  speedup {sequential / concurrent:4.1f}x")
+        print(f"{len(saved)} files saved, {len(failed)} isolated failure")
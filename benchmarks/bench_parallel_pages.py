@@ -0,0 +1,72 @@
+"""Twitter throughput with 1, 2 and 4 search pages in one browser, against the
+local search-page stand-in in benchmarks/search_server.py, then a 4-page run
+in which one keyword's page is closed under the scraper mid-scroll, like a
+crashed tab: only that page's job may end, every other keyword still has to
+reach the target.
+
+Runs in a temporary working directory so its checkpoints, seen-id index and
+browser profile stay out of output/ and twitter_session/.
+
+Run from the repo root: python -m benchmarks.bench_parallel_pages
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+WORKDIR = tempfile.mkdtemp()
+os.chdir(WORKDIR) # before config is imported, so its relative output paths land here
+
+import scrapers.twitter as twitter
+from scrapers.twitter import scrape_tweets_many
+from benchmarks.search_server import serve
+
+KEYWORDS = ["slay", "sigma", "rizz", "based"]
+TARGET = 60
+PAGES = [1, 2, 4]
+CRASH_AFTER = 3 # collections before the crashing keyword's page goes away
+
+def crash_one_page(keyword):
+    """Make TimelineJob close `keyword`'s page after CRASH_AFTER collections"""
+    collect_new = twitter.TimelineJob.collect_new
+    calls = {}
+    def crashing(job):
+        if job.collection.keyword == keyword:
+            calls[job.tab] = calls.get(job.tab, 0) + 1
+            if calls[job.tab] > CRASH_AFTER:
+                job.page.close()
+        collect_new(job)
+    twitter.TimelineJob.collect_new = crashing
+    return lambda: setattr(twitter.TimelineJob, "collect_new", collect_new)
+
+def run(url, keywords, pages, name):
+    start = time.perf_counter()
+    results = scrape_tweets_many(
+        keywords, TARGET, pages=pages, skip_known=False,
+        search_url=url + "/search?q={keyword}&f={tab}", user_data_dir=Path(WORKDIR) / f"profile{name}", headless=True,
+    )
+    return results, time.perf_counter() - start
+
+if __name__ == "__main__":
+    server, url = serve(latency=0.3)
+    baseline = None
+    for pages in PAGES:
+        results, seconds = run(url, [f"{keyword}{pages}" for keyword in KEYWORDS], pages, pages)
+        tweets = sum(len(tweets) for tweets in results.values())
+        rate = tweets / seconds
+        baseline = baseline or rate
+        print(f"{pages} pages  {tweets:4d} tweets in {seconds:5.1f}s  {rate:5.1f} tweets/s  speedup {rate / baseline:.1f}x")
+
+    keywords = [f"{keyword}crash" for keyword in KEYWORDS]
+    restore = crash_one_page(keywords[0])
+    try:
+        results, seconds = run(url, keywords, max(PAGES), "crash")
+    finally:
+        restore()
+    counts = {keyword: len(tweets) for keyword, tweets in results.items()}
+    print(f"crashed tab  {counts} in {seconds:5.1f}s")
+    server.shutdown()
+    assert counts[keywords[0]] < TARGET, "the crashed page kept collecting"
+    assert all(counts[keyword] >= TARGET for keyword in keywords[1:]), "a crashed tab ended other keywords' jobs"
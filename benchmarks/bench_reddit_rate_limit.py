@@ -0,0 +1,104 @@
+"""Simulated time spent waiting on Reddit's rate limit: fixed sleep vs the shared bucket.
+
+Runs entirely on a fake clock against a stub Reddit client that enforces a
+request budget per window the way Reddit does, reports it through
+auth.limits and answers 429 when it is exceeded. Fails unless the bucket
+spends every window's full budget before waiting for the reset.
+
+Run from the repo root: python -m benchmarks.bench_reddit_rate_limit
+"""
+import logging
+from prawcore.exceptions import TooManyRequests
+from config import REDDIT_RESERVE
+from scrapers.rate_limit import RateLimiter
+from scrapers.reddit import search_submissions
+
+SEARCHES = 120
+WINDOW = 600
+BUDGET = 600
+REQUEST_SECONDS = 0.3
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+class FakeResponse:
+    status_code = 429
+    text = "Too Many Requests"
+
+    def __init__(self, retry_after):
+        self.headers = {"retry-after": str(retry_after)}
+
+class StubReddit:
+    """Enough of praw.Reddit for search_submissions"""
+    def __init__(self, clock, budget=BUDGET):
+        self.clock = clock
+        self.budget = budget
+        self.window_start = clock()
+        self.used = 0
+        self.rejected = 0
+        self.windows = [] # requests served in each finished window
+        self.auth = self
+
+    @property
+    def limits(self):
+        return {
+            "remaining": self.budget - self.used,
+            "reset_timestamp": self.window_start + WINDOW,
+            "used": self.used,
+        }
+
+    def subreddit(self, name):
+        return self
+
+    def search(self, query, time_filter, limit, sort):
+        now = self.clock()
+        if now >= self.window_start + WINDOW:
+            self.windows.append(self.used)
+            self.window_start, self.used = now, 0
+        if self.used >= self.budget:
+            self.rejected += 1
+            raise TooManyRequests(FakeResponse(self.window_start + WINDOW - now))
+        self.used += 1
+        self.clock.now += REQUEST_SECONDS
+        return []
+
+def simulate(budget):
+    logger = logging.getLogger("bench")
+    clock = FakeClock()
+    reddit = StubReddit(clock, budget)
+
+    # old loop: request, then a fixed 1s sleep; a 429 there raised out of reddit_search
+    for _ in range(SEARCHES):
+        try:
+            reddit.search("q", "all", 100, "new")
+        except TooManyRequests:
+            pass
+        clock.sleep(1)
+    fixed = clock.now - reddit.window_start, reddit.rejected
+
+    clock = FakeClock()
+    reddit = StubReddit(clock, budget)
+    limiter = RateLimiter(100 / 60, 10, reserve=REDDIT_RESERVE, clock=clock, sleep=clock.sleep)
+    start = clock.now
+    for _ in range(SEARCHES):
+        search_submissions(reddit, limiter, "q", "new", "all", logger)
+    bucket = clock.now - start, reddit.rejected
+    return fixed, bucket, reddit.windows
+
+if __name__ == "__main__":
+    for budget in (BUDGET, 60):
+        (fixed_time, fixed_rejected), (bucket_time, bucket_rejected), windows = simulate(budget)
+        print(f"budget {budget:4d}/{WINDOW}s  "
+              f"fixed sleep {fixed_time:7.1f}s ({fixed_rejected} x 429)  "
+              f"token bucket {bucket_time:7.1f}s ({bucket_rejected} x 429)  windows used {windows}")
+        assert all(used == budget for used in windows), f"windows left budget unused: {windows}"
+        assert bucket_rejected == 0
@@ -0,0 +1,103 @@
+"""Crash and resume of the batch pipeline, and how many status checks the
+adaptive polling makes compared with a fixed interval.
+
+The run is interrupted while the batches are still in progress; resuming must
+reuse the uploaded files and started batches instead of submitting again. A
+second session that was scraped but never classified must be picked up by
+resume_sessions too.
+
+Run from the repo root: python -m benchmarks.bench_resume
+"""
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+
+from config import KEYWORDS
+from analysis import classify
+from analysis.analytics import AnalyticsStore
+from analysis.classification_cache import ClassificationCache
+from analysis.analyze import iter_classified_items
+from analysis.classify import process_session, resume_sessions, wait_for_batches, load_pipeline_state
+from benchmarks.session import make_session
+from benchmarks.stub_openai import StubOpenAI, stub_label
+
+class Crash(Exception):
+    pass
+
+def crash_while_waiting(batch_ids, client):
+    raise Crash()
+
+class FakeClock:
+    """Stands in for time.time/time.sleep so polling runs instantly"""
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class SteadyBatches:
+    """One batch whose requests finish at a constant rate"""
+    def __init__(self, clock, total, duration):
+        self.clock, self.total, self.duration = clock, total, duration
+
+    def retrieve(self, batch_id):
+        completed = min(self.total, int(self.total * self.clock.now / self.duration))
+        status = "completed" if completed == self.total else "in_progress"
+        counts = SimpleNamespace(total=self.total, completed=completed, failed=0)
+        return SimpleNamespace(id=batch_id, status=status, request_counts=counts)
+
+def polls_for(duration, interval):
+    return int(duration // interval) + 1
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        session_dir = make_session(Path(tmp) / "session_1", KEYWORDS, 500)
+        client = StubOpenAI(polls_to_finish=3)
+        cache = ClassificationCache(Path(tmp) / "cache.sqlite3")
+        analytics = AnalyticsStore(Path(tmp) / "analytics.sqlite3")
+
+        wait = classify.wait_for_batches
+        classify.wait_for_batches = crash_while_waiting
+        try:
+            process_session(session_dir, KEYWORDS, client, max_requests=1_000, cache=cache, analytics=analytics)
+        except Crash:
+            print("crashed while waiting for the batches")
+        finally:
+            classify.wait_for_batches = wait
+        submitted = (len(client.files.store), len(client.batches.batches))
+
+        assert process_session(session_dir, KEYWORDS, client, max_requests=1_000, cache=cache, analytics=analytics)
+        assert (len(client.files.store), len(client.batches.batches)) == submitted
+        classified = list(iter_classified_items(session_dir))
+        assert all(item["classification"] == stub_label(item["uuid"]) for item in classified)
+        assert load_pipeline_state(session_dir)["analyzed"]
+        assert analytics.ingested().keys() == {session_dir.name}
+        print(f"resumed: {len(client.batches.batches)} batches, none submitted twice, "
+              f"{len(classified)} items with the right labels")
+
+        unclassified = make_session(Path(tmp) / "session_2", KEYWORDS, 100, seed=1)
+        with open(unclassified / "session_meta.json", "w") as f:
+            json.dump({"keywords": KEYWORDS}, f)
+        resume_sessions(Path(tmp), client, cache, analytics)
+        assert load_pipeline_state(unclassified)["analyzed"]
+        assert analytics.ingested().keys() == {session_dir.name, unclassified.name}
+        print(f"never classified session resumed: {len(list(iter_classified_items(unclassified)))} items")
+
+    # A batch of 10k requests processed at a steady rate over an hour
+    clock = FakeClock()
+    client = SimpleNamespace(batches=SteadyBatches(clock, total=10_000, duration=3600))
+    real_time = classify.time.time
+    classify.time.time = clock.time
+    try:
+        wait_for_batches(["batch-0"], client, sleep=clock.sleep)
+    finally:
+        classify.time.time = real_time
+    print(f"adaptive polling: {len(clock.slept) + 1} checks, done seen at {clock.now / 60:.1f} min; "
+          f"fixed 5 min interval: {polls_for(3600, 300)} checks, seen up to 5 min late")
@@ -0,0 +1,47 @@
+"""Fixed random scrolling against the adaptive scroll controller, against the
+local search-page stand-in: a steady timeline, a search that runs out of
+results well short of the target, and a timeline that stalls until the page
+is reloaded. The adaptive controller must get through the stall to the
+target instead of taking it for the end of the results.
+
+Runs in a temporary working directory so its checkpoints, seen-id index and
+browser profiles stay out of output/ and twitter_session/.
+
+Run from the repo root: python -m benchmarks.bench_scroll
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+WORKDIR = tempfile.mkdtemp()
+os.chdir(WORKDIR) # before config is imported, so its relative output paths land here
+
+from scrapers.twitter import scrape_tweets
+from benchmarks.search_server import serve
+
+SCENARIOS = [ # name, total, stall, target
+    ("steady", None, None, 80),
+    ("runs out", 40, None, 200),
+    ("stalls", None, 30, 60),
+]
+
+if __name__ == "__main__":
+    for name, total, stall, target in SCENARIOS:
+        server, url = serve(latency=0.3, total=total, stall=stall)
+        for adaptive in (False, True):
+            keyword = f"slay{name.replace(' ', '')}{int(adaptive)}"
+            start = time.perf_counter()
+            tweets = scrape_tweets(
+                keyword, target, skip_known=False, search_url=url + "/search?q={keyword}&f={tab}",
+                user_data_dir=Path(WORKDIR) / f"profile-{keyword}", headless=True, adaptive=adaptive,
+            )
+            seconds = time.perf_counter() - start
+            print(f"{name:9} adaptive={adaptive!s:5}  {len(tweets):4d} tweets in {seconds:6.1f}s  "
+                  f"{len(tweets) / seconds:5.2f} tweets/s")
+            if stall is not None and adaptive:
+                assert len(tweets) >= target, "a stall the reload clears was taken for the end of the results"
+        server.shutdown()
+    print(f"Per-scroll stats are in the twitter logs under {WORKDIR}")
@@ -0,0 +1,86 @@
+"""Seen-id index lookups as it grows to tens of millions of ids.
+
+Fills one index with reddit-like base-36 ids for 6 keywords, stopping at each
+size in --sizes to time what a search does: one known() call for a page of
+100 ids, half of them in the index, then an add() of the accepted ones. Also
+reports the file size and the process's peak memory, which should stay near
+the page cache cap however large the index gets.
+
+Run from the repo root: python -m benchmarks.bench_seen_index [--sizes 1000000 10000000 30000000]
+"""
+import argparse
+import random
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+from seen_index import SeenIndex
+
+KEYWORDS = 6
+PAGE = 100
+LOOKUPS = 200
+FILL_CHUNK = 100_000
+
+def base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while n:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+    return out or "0"
+
+def item_id(i: int) -> str:
+    # distinct for every i below the prime and spread like real ids, which do not arrive in key order
+    return base36(1_000_000_000 + i * 7919 % 2_000_000_011)
+
+def fill(index: SeenIndex, start: int, end: int):
+    """Add ids start..end, id i under keyword i % KEYWORDS"""
+    for chunk in range(start, end, FILL_CHUNK):
+        for k in range(KEYWORDS):
+            first = chunk + (k - chunk) % KEYWORDS
+            index.add("reddit", f"keyword{k}", map(item_id, range(first, min(end, chunk + FILL_CHUNK), KEYWORDS)))
+
+def time_searches(index: SeenIndex, size: int, next_id: int, rng: random.Random) -> tuple:
+    """Median ms of one page's known() and of adding its unknown half"""
+    lookups, adds = [], []
+    for n in range(LOOKUPS):
+        keyword = n % KEYWORDS
+        known = [item_id(rng.randrange(size // KEYWORDS) * KEYWORDS + keyword) for _ in range(PAGE // 2)]
+        new = [item_id(next_id + n * PAGE + i) for i in range(PAGE // 2)]
+        start = time.perf_counter()
+        found = index.known("reddit", f"keyword{keyword}", known + new)
+        lookups.append((time.perf_counter() - start) * 1000)
+        assert found == set(known)
+        start = time.perf_counter()
+        index.add("reddit", f"keyword{keyword}", new)
+        adds.append((time.perf_counter() - start) * 1000)
+    return statistics.median(lookups), statistics.median(adds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seen-id index lookups at growing sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000, 30_000_000])
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "seen.sqlite3"
+        index = SeenIndex(path)
+        filled = 0
+        for round_, size in enumerate(sorted(args.sizes)):
+            start = time.perf_counter()
+            fill(index, filled, size)
+            fill_seconds = time.perf_counter() - start
+            filled = size
+            # ids past every size are the unknown ones, so fills never collide with them
+            lookup_ms, add_ms = time_searches(index, size, 2 * max(args.sizes) + round_ * LOOKUPS * PAGE, rng)
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            size_mb = sum(f.stat().st_size for f in Path(tmp).iterdir()) / 1e6
+            print(f"{size:>11,} ids  filled in {fill_seconds:6.1f}s  known() {lookup_ms:6.2f} ms / {PAGE} ids  "
+                  f"add() {add_ms:6.2f} ms  file {size_mb:7.0f} MB  peak RSS {peak_mb:5.0f} MB")
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Startup time of the command line and the modules behind it.
+
+Runs each cli.py command that needs no network in a fresh interpreter and
+reports the median wall time over --repeat runs, then times bare imports of
+the main modules the same way. Every run happens in an empty temporary
+working directory, which must still be empty afterwards: importing or
+inspecting must not create a session directory or anything else.
+
+Run from the repo root: python -m benchmarks.bench_startup [--repeat 7]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "cli --help": [str(ROOT / "cli.py"), "--help"],
+    "cli status": [str(ROOT / "cli.py"), "status"],
+    "cli analyze --help": [str(ROOT / "cli.py"), "analyze", "--help"],
+    "cli resume": [str(ROOT / "cli.py"), "resume"],
+}
+MODULES = ["config", "utils", "scrape", "scrapers.reddit", "scrapers.twitter", "analysis.classify", "analysis.analyze", "analysis.analytics"]
+
+def time_run(argv: list, repeat: int) -> float:
+    """Median milliseconds of `python argv`, in an empty directory that has to stay empty"""
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cwd:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *argv], cwd=cwd, env=env, check=True, capture_output=True)
+            times.append((time.perf_counter() - start) * 1000)
+            left = os.listdir(cwd)
+            if left:
+                raise RuntimeError(f"{' '.join(argv)} created {left}")
+    return statistics.median(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Command line and import startup times")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    interpreter = time_run(["-c", "pass"], args.repeat)
+    print(f"{'python -c pass':30} {interpreter:8.0f} ms")
+    for name, command in COMMANDS.items():
+        print(f"{name:30} {time_run(command, args.repeat):8.0f} ms")
+    for module in MODULES:
+        print(f"{'import ' + module:30} {time_run(['-c', f'import {module}'], args.repeat):8.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""JSON arrays vs Parquet for session records: size on disk, write and load
+times, and summary statistics by per-item dict updates vs an Arrow group-by.
+
+Also analyzes one synthetic session in both formats through the stub client
+and checks the summaries match.
+
+Run from the repo root: python -m benchmarks.bench_storage (needs pyarrow)
+"""
+import json
+import random
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+from config import KEYWORDS
+from storage import write_records, iter_records, count_by
+from analysis.analyze import analyze_batch
+from analysis.classify import create_batch_file
+from analysis.classification_cache import ClassificationCache
+from benchmarks.session import make_item, make_session
+from benchmarks.stub_openai import StubOpenAI, LABELS
+
+SIZES = [10_000, 100_000, 500_000]
+GROUP_COLUMNS = ("keyword", "platform", "classification")
+
+def classified_items(size, seed=0):
+    rng = random.Random(seed)
+    keywords = list(KEYWORDS)
+    for i in range(size):
+        keyword = keywords[i % len(keywords)]
+        item = make_item(rng, keyword, "reddit", i)
+        yield {**item, "platform": "reddit", "classification": rng.choice(LABELS), "keyword": keyword,
+               "label_source": "batch", "cluster_id": item["uuid"]}
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def dict_summary(path):
+    """The previous way: load everything, update nested dicts per item"""
+    with open(path) as f:
+        items = json.load(f)
+    stats = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    for item in items:
+        stats[item["keyword"]][item["platform"]][item["classification"]] += 1
+    return stats
+
+def write_json(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f, indent=2, ensure_ascii=False)
+
+def compare_formats(size, tmp):
+    items = list(classified_items(size))
+    json_write, _ = timed(write_json, tmp / "items.json", items)
+    parquet_write, parquet_path = timed(write_records, tmp / "items.json", items, "parquet")
+    json_path = tmp / "items.json"
+    del items
+
+    json_load, _ = timed(lambda: json.load(open(json_path)))
+    parquet_load, _ = timed(lambda: list(iter_records(parquet_path)))
+    parquet_columns, _ = timed(lambda: list(iter_records(parquet_path, list(GROUP_COLUMNS))))
+    dict_stats, _ = timed(dict_summary, json_path)
+    group_stats, counts = timed(count_by, [parquet_path], GROUP_COLUMNS)
+    assert sum(counts.values()) == size
+    mb = lambda path: path.stat().st_size / 2**20
+    print(f"{size:7d} items  size json {mb(json_path):6.1f} MB  parquet {mb(parquet_path):5.1f} MB  "
+          f"write {json_write:5.2f}s / {parquet_write:5.2f}s  load {json_load:5.2f}s / {parquet_load:5.2f}s "
+          f"({parquet_columns:4.2f}s for 3 columns)  summary dicts {dict_stats:5.2f}s / group-by {group_stats:5.3f}s")
+
+def analyzed_summary(session_dir, fmt):
+    client = StubOpenAI()
+    cache = ClassificationCache(session_dir / f"cache_{fmt}.sqlite3")
+    batch_ids = [
+        client.batches.create(file_id, "/v1/chat/completions", "24h").id
+        for file_id in create_batch_file(session_dir, KEYWORDS, client, cache=cache)
+    ]
+    analyze_batch(session_dir, batch_ids, client, cache, fmt=fmt)
+    with open(session_dir / "processed" / "summary_stats.json") as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            compare_formats(size, Path(tmp))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_dir = make_session(Path(tmp), KEYWORDS, 500)
+        as_json = analyzed_summary(session_dir, "json")
+        for raw_file in sorted((session_dir / "raw").glob("*.json")):
+            write_records(raw_file, iter_records(raw_file), "parquet")
+            raw_file.unlink()
+        as_parquet = analyzed_summary(session_dir, "parquet")
+        assert as_json == as_parquet
+        print(f"analyze_batch: raw and classified Parquet give the same summary as JSON "
+              f"({sum(s['total'] for p in as_json.values() for s in p.values())} items)")
@@ -0,0 +1,129 @@
+"""Time to the first classified item: scrape everything then classify, vs
+classifying micro-batches while the scrapers run.
+
+Fake scrapers hand over items at a steady pace and the stub client's batches
+finish a couple of polls after they are created, so the timings are the
+pipeline's own. Time is scaled down: a second here stands for minutes of
+real scraping. Every fourth item repeats an earlier text with a link
+appended, so both paths have near-duplicates to collapse.
+
+Run from the repo root: python -m benchmarks.bench_streaming
+"""
+import json
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+
+from config import KEYWORDS
+from orchestrator import run_jobs
+from analysis.analytics import AnalyticsStore
+from analysis.analyze import iter_classified_items, STREAMED_FILE
+from analysis.classification_cache import ClassificationCache
+from analysis.classify import process_session, wait_for_batches
+from analysis.stream import StreamingClassifier
+from analysis import classify
+from benchmarks.session import make_item
+from benchmarks.stub_openai import StubOpenAI, stub_label
+
+ITEMS_PER_JOB = 200
+CHUNK = 20 # items per scraper hand-off
+CHUNK_SECONDS = 0.1 # so a job takes a second and twitter's six jobs run one after another
+POLL_SECONDS = 0.2
+
+def fake_scraper(platform):
+    def scrape(keyword, amount, on_items=None):
+        rng = random.Random(f"{keyword}-{platform}")
+        results = []
+        for start in range(0, ITEMS_PER_JOB, CHUNK):
+            time.sleep(CHUNK_SECONDS)
+            chunk = [make_item(rng, keyword, platform, i) for i in range(start, start + CHUNK)]
+            for i in range(3, CHUNK, 4):
+                chunk[i]["text"] = f"{chunk[i - 3]['text']} https://t.co/{i}"
+            results.extend(chunk)
+            if on_items:
+                on_items(chunk)
+        return results
+    return scrape
+
+SCRAPERS = {"twitter": fake_scraper("twitter"), "reddit": fake_scraper("reddit")}
+
+def fast_wait(batch_ids, client):
+    return wait_for_batches(batch_ids, client, sleep=lambda seconds: time.sleep(POLL_SECONDS))
+
+def sequential(tmp: Path):
+    session_dir = tmp / "sequential"
+    (session_dir / "raw").mkdir(parents=True)
+    start = time.perf_counter()
+    run_jobs(KEYWORDS, ITEMS_PER_JOB, session_dir / "raw", SCRAPERS)
+    scraped = time.perf_counter() - start
+    classify.wait_for_batches = fast_wait
+    process_session(session_dir, KEYWORDS, StubOpenAI(polls_to_finish=2),
+                    cache=ClassificationCache(tmp / "cache_sequential.sqlite3"),
+                    analytics=AnalyticsStore(tmp / "analytics.sqlite3"))
+    return scraped, time.perf_counter() - start
+
+def streaming(tmp: Path):
+    session_dir = tmp / "streaming"
+    (session_dir / "raw").mkdir(parents=True)
+    cache_path = tmp / "cache_streaming.sqlite3"
+    client = StubOpenAI(polls_to_finish=2)
+    stream = StreamingClassifier(
+        session_dir, KEYWORDS, client, cache_path, models={}, batch_size=200, batch_seconds=0.5,
+        queue_size=8, max_in_flight=4, poll_seconds=POLL_SECONDS,
+    ).start()
+    start = time.perf_counter()
+    run_jobs(KEYWORDS, ITEMS_PER_JOB, session_dir / "raw", SCRAPERS, on_items=stream.put)
+    scraped = time.perf_counter() - start
+    stats = stream.close()
+    done = time.perf_counter() - start
+
+    # near-duplicates are collapsed as they arrive, not sent
+    assert stats["near_duplicates"] == len(KEYWORDS) * 2 * ITEMS_PER_JOB // 4
+    assert stats["requests"] == len(KEYWORDS) * 2 * ITEMS_PER_JOB - stats["near_duplicates"]
+
+    # afterwards every item is in streamed.jsonl, so process_session sends nothing and keeps the stream's labels
+    batches = len(client.batches.batches)
+    process_session(session_dir, KEYWORDS, client, cache=ClassificationCache(cache_path),
+                    analytics=AnalyticsStore(tmp / "analytics.sqlite3"))
+    assert len(client.batches.batches) == batches
+    classified = list(iter_classified_items(session_dir))
+    assert len(classified) == len(KEYWORDS) * 2 * ITEMS_PER_JOB
+    with open(session_dir / "batches" / STREAMED_FILE) as f:
+        streamed = {entry["uuid"]: entry for entry in map(json.loads, f)}
+    assert len(streamed) == len(classified)
+    for item in classified:
+        entry = streamed[item["uuid"]]
+        assert (item["classification"], item["label_source"]) == (entry["classification"], entry["label_source"])
+        if entry["label_source"] == "batch":
+            assert entry["classification"] == stub_label(entry["uuid"])
+    return scraped, stream.first_result_at - stream.started_at, done, stats
+
+def stuck_close(tmp: Path):
+    """close() on a full queue after the classifier failed returns its error instead of hanging"""
+    client = StubOpenAI()
+    client.batches.retrieve = lambda batch_id: (_ for _ in ()).throw(RuntimeError("collector failed"))
+    stream = StreamingClassifier(tmp / "stuck", KEYWORDS, client, tmp / "cache_stuck.sqlite3", models={},
+                                 batch_size=1, queue_size=2, max_in_flight=1, poll_seconds=0.01).start()
+    stream.put("slay", "reddit", [make_item(random.Random(0), "slay", "reddit", 0)])
+    stream.aborted.wait(5) # the collector fails on its first poll and the batcher stops draining
+    stream.batcher_done.wait(5)
+    while not stream.items.full():
+        stream.items.put_nowait(("slay", "reddit", []))
+    start = time.perf_counter()
+    stats = stream.close()
+    assert stats["errors"] == ["collector failed"]
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    logging.getLogger("scraper").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        scraped, first = sequential(Path(tmp))
+        print(f"scrape then classify: scraping {scraped:.1f}s, first classified item at {first:.1f}s")
+        scraped, first, done, stats = streaming(Path(tmp))
+        print(f"streaming:            scraping {scraped:.1f}s, first classified item at {first:.1f}s, "
+              f"all classified at {done:.1f}s ({stats['requests']} requests in {stats['batches']} micro-batches, "
+              f"{stats['near_duplicates']} near-duplicates not sent)")
+        print(f"close() after a failure with a full queue returned in {stuck_close(Path(tmp)):.1f}s")
@@ -0,0 +1,63 @@
+"""Equivalence and throughput of the tweet parser backends on the saved timeline.
+
+Every backend must produce, for every article in the fixture, the same fields
+the original BeautifulSoup helpers in scrapers/twitter.py do. Throughput is
+reported in articles/sec for a whole-page parse.
+
+Run from the repo root: python -m benchmarks.bench_tweet_parsers
+"""
+import time
+from bs4 import BeautifulSoup
+from scrapers.twitter import extract_tweet_data, get_tweet_id_and_url
+from scrapers.tweet_parser import PARSERS
+from benchmarks.timeline import load_snapshot, make_cells, timeline_html
+
+PAGE_SIZES = [100, 1000, 5000]
+REPEATS = 3
+
+def reference_records(html):
+    """Fields as produced by the original per-function BeautifulSoup lookups"""
+    records = []
+    for article in BeautifulSoup(html, 'html.parser').find_all('article'):
+        tweet_id, url = get_tweet_id_and_url(article)
+        text_div = article.find("div", {"data-testid": "tweetText"})
+        data = extract_tweet_data(article)
+        records.append({
+            "id": tweet_id,
+            "url": url,
+            "text": data["text"],
+            "span_text": ' '.join(span.text for span in text_div.find_all("span")) if text_div else None,
+            "created_at": data["created_at"],
+            "username": data["username"],
+        })
+    return records
+
+def check_equivalence(html):
+    expected = reference_records(html)
+    for name, parse in PARSERS.items():
+        records = parse(html)
+        assert len(records) == len(expected), f"{name}: {len(records)} articles, expected {len(expected)}"
+        for got, want in zip(records, expected):
+            # extract_tweet_data returns "" where the records keep None for "no text div"
+            got = {**got, "text": got["text"] or ""}
+            assert got == want, f"{name} differs on {want['id']}:\n{got}\n{want}"
+        print(f"{name}: {len(records)} articles match the BeautifulSoup reference")
+
+def throughput(parse, html, articles):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        parse(html)
+        best = min(best, time.perf_counter() - start)
+    return articles / best
+
+if __name__ == "__main__":
+    check_equivalence(load_snapshot())
+    check_equivalence(timeline_html(make_cells(500)))
+
+    for size in PAGE_SIZES:
+        html = timeline_html(make_cells(size))
+        line = [f"{size:6d} articles"]
+        for name, parse in PARSERS.items():
+            line.append(f"{name} {throughput(parse, html, size):10.0f} articles/sec")
+        print("  ".join(line))
@@ -0,0 +1,115 @@
+"""Local stand-in for the X search page, for scraper benchmarks without the network.
+
+/search?q=<keyword>&f=<tab> serves the saved timeline with CELLS_PER_LOAD
+cells and a script that, on every wheel event, fetches the next cells from
+/more after `latency` seconds, like the real timeline loading as it is
+scrolled. The snapshot's keyword is swapped for the query so the scraper's
+keyword filter keeps the tweets, and every (keyword, tab) gets its own ids.
+Pages can also request /media/<n>.jpg, /fonts/<n>.woff2 and an analytics
+script, and with `media` every cell carries a /media image, to weigh what a
+browser downloads alongside the tweets. With `total`, /more stops returning
+cells after that many, like a search that has run out of results. With
+`stall`, /more returns nothing past that many cells until the page is loaded
+again, like X's "Something went wrong, Retry" that a reload clears.
+
+Run from the repo root to browse it: python -m benchmarks.search_server
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from benchmarks.timeline import make_cells, timeline_html
+
+CELLS_PER_LOAD = 10
+SNAPSHOT_KEYWORD_RE = re.compile(r"slay", re.IGNORECASE)
+
+LOAD_MORE_JS = """
+<script>
+(() => {
+    const params = new URLSearchParams(location.search);
+    let next = %(initial)d;
+    let loading = false;
+    window.addEventListener('wheel', async () => {
+        if (loading) return;
+        loading = true;
+        const response = await fetch(`/more?${params}&start=${next}`);
+        const cells = await response.json();
+        document.querySelector('div[aria-label="Timeline: Search timeline"] > div')
+            .insertAdjacentHTML('beforeend', cells.join(''));
+        next += cells.length;
+        loading = false;
+    });
+})();
+</script>
+"""
+
+def stream_cells(keyword: str, tab: str, start: int, count: int, media: bool = False) -> list:
+    offset = zlib.crc32(f"{keyword}/{tab}".encode()) % 10**9 * 1000
+    cells = [SNAPSHOT_KEYWORD_RE.sub(keyword, cell) for cell in make_cells(count, offset + start)]
+    if media:
+        cells = [cell.replace("</article>", f'<img src="/media/{offset + start + n}.jpg"></article>', 1)
+                 for n, cell in enumerate(cells)]
+    return cells
+
+class SearchHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+    extras = "" # extra markup per page, e.g. images and fonts for the lean mode benchmark
+    extra_bytes = 50_000
+    media = False # an image per cell
+    total = None # cells before the results run out
+    stall = None # cells before loading stalls until a reload
+    loads = None # (keyword, tab) -> /search requests, for `stall`
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        keyword, tab = query.get("q", "slay"), query.get("f", "live")
+        if url.path == "/search":
+            self.loads[keyword, tab] = self.loads.get((keyword, tab), 0) + 1
+            page = timeline_html(stream_cells(keyword, tab, 0, CELLS_PER_LOAD, self.media))
+            page = page.replace("</body>", self.extras + LOAD_MORE_JS % {"initial": CELLS_PER_LOAD} + "</body>")
+            self.send(page.encode("utf-8"), "text/html; charset=utf-8")
+        elif url.path == "/more":
+            time.sleep(self.latency)
+            start = int(query["start"])
+            count = CELLS_PER_LOAD if self.total is None else max(0, min(CELLS_PER_LOAD, self.total - start))
+            if self.stall is not None and start >= self.stall and self.loads.get((keyword, tab), 0) < 2:
+                count = 0
+            cells = stream_cells(keyword, tab, start, count, self.media)
+            self.send(json.dumps(cells).encode("utf-8"), "application/json")
+        elif url.path.startswith("/media/"):
+            self.send(b"\xff\xd8" + b"\0" * self.extra_bytes, "image/jpeg")
+        elif url.path.startswith("/fonts/"):
+            self.send(b"wOF2" + b"\0" * self.extra_bytes, "font/woff2")
+        elif url.path.startswith("/analytics"):
+            self.send(b"/*" + b" " * self.extra_bytes + b"*/", "application/javascript")
+        else:
+            self.send_error(404)
+
+def serve(latency: float = SearchHandler.latency, extras: str = "", media: bool = False, total: int = None,
+          stall: int = None, port: int = 0):
+    """Start the server on a background thread, return (server, base url)"""
+    handler = type("Handler", (SearchHandler,), {
+        "latency": latency, "extras": extras, "media": media, "total": total, "stall": stall, "loads": {},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    server, url = serve(port=8765)
+    print(f"Serving {url}/search?q=slay&f=live")
+    threading.Event().wait()
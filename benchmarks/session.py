@@ -0,0 +1,39 @@
+"""Synthetic session directories shaped like the scrapers' output."""
+import json
+import random
+import uuid
+from pathlib import Path
+
+WORDS = """the a to and of in is it you that for on with this was be are have not but so at my
+just like all your they what when new old time people really think know good day""".split()
+
+def make_text(rng, keyword):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 40))]
+    words.insert(rng.randrange(len(words)), keyword)
+    return " ".join(words)
+
+def make_item(rng, keyword, platform, i):
+    item = {
+        "uuid": str(uuid.UUID(int=rng.getrandbits(128))),
+        "id": f"{platform[0]}{i}",
+        "text": make_text(rng, keyword),
+        "url": f"https://example.com/{platform}/{i}",
+        "created_at": 1746720000 + i * 60 if platform == "reddit" else f"2025-05-08T18:{i % 60:02d}:07.000Z",
+        "username": f"user{rng.randrange(10000)}",
+        "keywords": [keyword],
+    }
+    if platform == "reddit":
+        item["subreddit"] = rng.choice(["AskReddit", "teenagers", "memes", "history"])
+    return item
+
+def make_session(session_dir: Path, keywords, items_per_file, seed=0):
+    """Write raw/<keyword>_<platform>.json files with `items_per_file` items each"""
+    rng = random.Random(seed)
+    raw = session_dir / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    for keyword in keywords:
+        for platform in ("twitter", "reddit"):
+            items = [make_item(rng, keyword, platform, i) for i in range(items_per_file)]
+            with open(raw / f"{keyword}_{platform}.json", "w", encoding="utf-8") as f:
+                json.dump(items, f, indent=2, ensure_ascii=False)
+    return session_dir
@@ -0,0 +1,111 @@
+"""Local stand-in for the OpenAI files and batches endpoints used by analysis/.
+
+Batches complete as soon as they are created, or after `polls_to_finish`
+retrieves with their request counts moving forward each time. Each request
+is answered with
+a label derived from its custom_id, so results are deterministic and can be
+checked without the network. DiskClient serves batch outputs that are
+already written to disk, for sessions too big to keep in memory.
+"""
+import hashlib
+import io
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+LABELS = ["old", "new", "unknown"]
+
+def stub_label(custom_id):
+    return LABELS[hashlib.md5(custom_id.encode()).digest()[0] % len(LABELS)]
+
+class StubFiles:
+    def __init__(self):
+        self.store = {}
+
+    def create(self, file, purpose):
+        data = file if isinstance(file, bytes) else file.read()
+        file_id = f"file-{len(self.store)}"
+        self.store[file_id] = data
+        return SimpleNamespace(id=file_id, bytes=len(data), purpose=purpose)
+
+    def content(self, file_id):
+        data = self.store[file_id]
+        return SimpleNamespace(text=data.decode("utf-8"), content=data, iter_bytes=lambda: iter([data]))
+
+    @property
+    def with_streaming_response(self):
+        return SimpleNamespace(content=self.streamed_content)
+
+    @contextmanager
+    def streamed_content(self, file_id):
+        lines = (line.rstrip(b"\n").decode("utf-8") for line in io.BytesIO(self.store[file_id]))
+        yield SimpleNamespace(iter_lines=lambda: lines)
+
+class StubBatches:
+    def __init__(self, files, polls_to_finish=0):
+        self.files = files
+        self.polls_to_finish = polls_to_finish
+        self.batches = {}
+        self.polls = {}
+
+    def create(self, input_file_id, endpoint, completion_window):
+        lines = []
+        requests = self.files.store[input_file_id].decode("utf-8").splitlines()
+        for line in requests:
+            request = json.loads(line)
+            prompt_tokens = len(request["body"]["messages"][0]["content"]) // 4
+            lines.append(json.dumps({
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "choices": [{"message": {"content": stub_label(request["custom_id"])}}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 1, "total_tokens": prompt_tokens + 1},
+                    },
+                },
+            }))
+        output = self.files.create(("\n".join(lines) + "\n").encode("utf-8"), "batch_output")
+        batch_id = f"batch-{len(self.batches)}"
+        done = not self.polls_to_finish
+        self.batches[batch_id] = SimpleNamespace(
+            id=batch_id,
+            status="completed" if done else "in_progress",
+            input_file_id=input_file_id,
+            output_file_id=output.id if done else None,
+            request_counts=SimpleNamespace(total=len(requests), completed=len(requests) if done else 0, failed=0),
+        )
+        self.polls[batch_id] = (0, output.id)
+        return self.batches[batch_id]
+
+    def retrieve(self, batch_id):
+        batch = self.batches[batch_id]
+        polls, output_file_id = self.polls[batch_id]
+        if batch.status == "in_progress":
+            polls += 1
+            self.polls[batch_id] = (polls, output_file_id)
+            counts = batch.request_counts
+            counts.completed = counts.total * min(polls, self.polls_to_finish) // self.polls_to_finish
+            if polls >= self.polls_to_finish:
+                batch.status, batch.output_file_id = "completed", output_file_id
+        return batch
+
+class StubOpenAI:
+    def __init__(self, polls_to_finish=0):
+        self.files = StubFiles()
+        self.batches = StubBatches(self.files, polls_to_finish)
+
+class DiskFiles:
+    """Batch outputs served line by line from files on disk"""
+    @property
+    def with_streaming_response(self):
+        return SimpleNamespace(content=self.streamed_content)
+
+    @contextmanager
+    def streamed_content(self, path):
+        with open(path, encoding="utf-8") as f:
+            yield SimpleNamespace(iter_lines=lambda: (line.rstrip("\n") for line in f))
+
+class DiskClient:
+    def __init__(self, outputs):
+        self.files = DiskFiles()
+        self.batches = SimpleNamespace(retrieve=lambda batch_id: SimpleNamespace(output_file_id=outputs[batch_id]))
@@ -0,0 +1,344 @@
+"""Offline benchmark suite: throughput and peak memory of every pipeline stage
+at several data sizes, compared against stored baselines.
+
+Stages and their fixtures:
+  tweet_extract     saved X timeline HTML through BeautifulSoup,
+                    should_keep_tweet and extract_tweet_data
+  tweet_parse       the same HTML through the configured parser and collect_records
+  reddit_search     reddit_search over a stream of fake praw submissions
+                    built from fixtures/submissions.jsonl
+  create_batch_file synthetic raw session directories, stub uploads
+  analyze_batch     batch output recorded in fixtures/batch_output.jsonl,
+                    replayed for every request of a synthetic session
+
+Each case runs in a forked child after its fixtures are built, so the
+reported peak is the stage's own RSS growth. Throughput and peak are the
+medians of --repeat runs. A case is flagged when its throughput falls, or
+its peak memory rises, by more than --threshold against
+benchmarks/baselines.json; the exit status is 1 if any is. --save records
+the current numbers as the new baselines.
+
+Baselines are recorded on one machine and compared on another, or on the
+same one under a different load, so every run also times a fixed
+calibration workload. Baseline throughputs are scaled by this run's
+calibration score over the one saved with them before comparing, which
+takes the machine's speed out of the comparison.
+
+Runs in a temporary working directory so checkpoints, indexes and caches
+stay out of output/.
+
+Run from the repo root: python -m benchmarks.suite [--stages ...] [--sizes small medium] [--save]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+BENCH_DIR = Path(__file__).resolve().parent
+WORKDIR = Path(tempfile.mkdtemp())
+os.chdir(WORKDIR) # before config is imported, so its relative output paths land here
+
+from bs4 import BeautifulSoup
+from config import KEYWORDS
+import scrapers.twitter as twitter
+from scrapers.reddit import reddit_search
+from analysis.analyze import analyze_batch
+from analysis.classify import create_batch_file, write_batch_shards
+from analysis.classification_cache import ClassificationCache
+from benchmarks.session import make_session
+from benchmarks.stub_openai import StubOpenAI, DiskClient
+from benchmarks.timeline import make_cells, timeline_html
+from language import detect_english
+
+FIXTURES = BENCH_DIR / "fixtures"
+BASELINES = BENCH_DIR / "baselines.json"
+THRESHOLD = 0.25
+REPEAT = 5
+CALIBRATION_ROUNDS = 20_000
+MEMORY_SLACK_MB = 5 # growth below this is noise whatever the ratio
+SIZES = {
+    "tweet_extract": {"small": 200, "medium": 1_000, "large": 4_000},
+    "tweet_parse": {"small": 200, "medium": 1_000, "large": 4_000},
+    "reddit_search": {"small": 1_000, "medium": 4_000, "large": 10_000},
+    "create_batch_file": {"small": 2_000, "medium": 20_000, "large": 100_000},
+    "analyze_batch": {"small": 2_000, "medium": 20_000, "large": 100_000},
+}
+
+detect_english("load the language profiles once, before any case forks")
+
+def read_jsonl(path: Path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+# twitter
+
+def setup_tweets(case_dir: Path, size: int):
+    return timeline_html(make_cells(size))
+
+def run_tweet_extract(html) -> int:
+    soup = BeautifulSoup(html, "html.parser")
+    articles = soup.find_all("article")
+    for article in articles:
+        if twitter.should_keep_tweet(article, "slay"):
+            twitter.extract_tweet_data(article)
+    return len(articles)
+
+def run_tweet_parse(html) -> int:
+    records = twitter.get_parser(twitter.TWEET_PARSER)(html)
+    twitter.collect_records(records, "slay", set(), logging.getLogger("bench"))
+    return len(records)
+
+# reddit
+
+class FakeSubmission(SimpleNamespace):
+    pass
+
+class FakeReddit:
+    """Serves `total` submissions, 100 per search, cycled from the fixture with fresh ids"""
+    def __init__(self, fixture: list, total: int):
+        self.fixture = fixture
+        self.total = total
+        self.served = 0
+        self.auth = SimpleNamespace(limits={"remaining": 600, "reset_timestamp": time.time() + 600, "used": 0})
+
+    def subreddit(self, name):
+        return self
+
+    def search(self, query, time_filter, limit, sort):
+        count = min(limit, self.total - self.served)
+        batch = []
+        for i in range(self.served, self.served + count):
+            row = self.fixture[i % len(self.fixture)]
+            batch.append(FakeSubmission(
+                id=f"{row['id']}{i}", title=row["title"], selftext=row["selftext"], url=row["url"],
+                created_utc=row["created_utc"],
+                author=SimpleNamespace(name=row["author"]) if row["author"] else None,
+                subreddit=SimpleNamespace(display_name=row["subreddit"]),
+            ))
+        self.served += count
+        return batch
+
+class FreeLimiter:
+    def acquire(self):
+        return 0.0
+
+    def release(self):
+        pass
+
+    def update(self, remaining, reset_timestamp):
+        pass
+
+    def backoff(self, retry_after=None):
+        return 0.0
+
+def setup_reddit(case_dir: Path, size: int):
+    return FakeReddit(read_jsonl(FIXTURES / "submissions.jsonl"), size)
+
+def run_reddit_search(reddit) -> int:
+    reddit_search(f"slay{os.getpid()}", limit=reddit.total, reddit=reddit, limiter=FreeLimiter(), skip_known=False)
+    return reddit.served
+
+# classification
+
+def synthetic_session(case_dir: Path, size: int):
+    """A raw session of about `size` items, and its exact item count"""
+    per_file = size // (2 * len(KEYWORDS))
+    return make_session(case_dir / "session", KEYWORDS, per_file), per_file * 2 * len(KEYWORDS)
+
+def setup_batch_file(case_dir: Path, size: int):
+    return synthetic_session(case_dir, size)
+
+def run_create_batch_file(state) -> int:
+    session, size = state
+    cache = ClassificationCache(session / "cache.sqlite3")
+    create_batch_file(session, KEYWORDS, client=StubOpenAI(), cache=cache)
+    cache.close()
+    return size
+
+def write_recorded_output(shard: Path, output: Path, recorded: list):
+    """The recorded output lines in turn, each answering one request of the shard"""
+    with open(shard, encoding="utf-8") as requests, open(output, "w", encoding="utf-8") as f:
+        for i, line in enumerate(requests):
+            result = dict(recorded[i % len(recorded)])
+            result["custom_id"] = json.loads(line)["custom_id"]
+            f.write(json.dumps(result) + "\n")
+
+def setup_analyze(case_dir: Path, size: int):
+    session, size = synthetic_session(case_dir, size)
+    recorded = read_jsonl(FIXTURES / "batch_output.jsonl")
+    outputs = {}
+    for i, shard in enumerate(write_batch_shards(session, KEYWORDS)):
+        outputs[f"batch-{i}"] = str(shard.with_name(f"output_{i:03d}.jsonl"))
+        write_recorded_output(shard, Path(outputs[f"batch-{i}"]), recorded)
+    return session, outputs, size
+
+def run_analyze_batch(state) -> int:
+    session, outputs, size = state
+    cache = ClassificationCache(session / "cache.sqlite3")
+    analyze_batch(session, list(outputs), DiskClient(outputs), cache)
+    cache.close()
+    return size
+
+def setup_calibration(case_dir: Path, size: int):
+    return size
+
+def run_calibration(rounds) -> int:
+    """A fixed mix of what the stages spend their time on: JSON, hashing, regexes and dicts"""
+    counts = {}
+    for i in range(rounds):
+        line = json.dumps({"uuid": f"{i:08d}", "text": f"item {i} was so slay, no cap fr fr", "keywords": ["slay"]})
+        item = json.loads(line)
+        counts[hashlib.blake2b(item["text"].encode(), digest_size=16).hexdigest()] = len(re.findall(r"\w+", line))
+    return len(counts)
+
+STAGES = {
+    "tweet_extract": (setup_tweets, run_tweet_extract),
+    "tweet_parse": (setup_tweets, run_tweet_parse),
+    "reddit_search": (setup_reddit, run_reddit_search),
+    "create_batch_file": (setup_batch_file, run_create_batch_file),
+    "analyze_batch": (setup_analyze, run_analyze_batch),
+}
+
+def _child(run, state, conn):
+    # the stages print and log progress, which would bury the table
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        baseline = rss_mb()
+        start = time.perf_counter()
+        items = run(state)
+        seconds = time.perf_counter() - start
+        conn.send({"items": items, "seconds": seconds, "peak_mb": max(0.0, peak_rss_mb() - baseline)})
+    except Exception as e:
+        conn.send({"error": repr(e)})
+    finally:
+        conn.close()
+
+def run_case(stage: str, size_name: str, repeat: int) -> dict:
+    setup, run = STAGES[stage]
+    return measure(setup, run, SIZES[stage][size_name], repeat, f"{stage}/{size_name}")
+
+def calibrate(repeat: int) -> float:
+    """Items per second of the calibration workload on this machine, right now"""
+    return measure(setup_calibration, run_calibration, CALIBRATION_ROUNDS, repeat, "calibration")["items_per_second"]
+
+def measure(setup, run, size: int, repeat: int, case: str) -> dict:
+    runs = []
+    for attempt in range(repeat):
+        # fresh fixtures every run: several stages write into their session or resume from checkpoints
+        case_dir = Path(tempfile.mkdtemp(dir=WORKDIR))
+        with contextlib.redirect_stdout(io.StringIO()):
+            state = setup(case_dir, size)
+        receive, send = multiprocessing.Pipe(duplex=False)
+        child = multiprocessing.get_context("fork").Process(target=_child, args=(run, state, send))
+        child.start()
+        send.close()
+        result = receive.recv()
+        child.join()
+        if "error" in result:
+            raise RuntimeError(f"{case} failed: {result['error']}")
+        runs.append(result)
+    seconds = statistics.median(run["seconds"] for run in runs)
+    return {
+        "items": runs[0]["items"],
+        "items_per_second": round(runs[0]["items"] / seconds, 1),
+        "seconds": round(seconds, 3),
+        "peak_mb": round(statistics.median(run["peak_mb"] for run in runs), 1),
+    }
+
+def regressions(result: dict, baseline: dict, threshold: float, speed: float = 1.0) -> list:
+    """What got worse than `baseline` by more than `threshold`, its throughput scaled by the machine's relative `speed`"""
+    found = []
+    expected = baseline["items_per_second"] * speed
+    if result["items_per_second"] < expected * (1 - threshold):
+        found.append(f"throughput {result['items_per_second'] / expected - 1:+.0%}")
+    if result["peak_mb"] > max(baseline["peak_mb"] * (1 + threshold), baseline["peak_mb"] + MEMORY_SLACK_MB):
+        found.append(f"peak memory {result['peak_mb'] - baseline['peak_mb']:+.1f} MB")
+    return found
+
+def load_baselines() -> tuple:
+    """(calibration score, case -> result) of the stored baselines"""
+    if not BASELINES.exists():
+        return None, {}
+    with open(BASELINES, encoding="utf-8") as f:
+        stored = json.load(f)
+    return stored.get("calibration"), stored["results"]
+
+def save_baselines(results: dict, calibration: float):
+    """Store `results`, rescaling the kept ones when they were measured at another calibration score"""
+    stored_calibration, stored = load_baselines()
+    if stored_calibration:
+        scale = calibration / stored_calibration
+        stored = {case: {**result, "items_per_second": round(result["items_per_second"] * scale, 1)}
+                  for case, result in stored.items()}
+    merged = {**stored, **results}
+    with open(BASELINES, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "calibration": calibration,
+                   "results": dict(sorted(merged.items()))}, f, indent=2)
+        f.write("\n")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks with baseline comparison")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--sizes", nargs="+", choices=["small", "medium", "large"], default=["small", "medium", "large"])
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per case, the median counts")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative change flagged as a regression")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baselines")
+    args = parser.parse_args(argv)
+
+    baseline_calibration, baselines = load_baselines()
+    calibration = calibrate(args.repeat)
+    speed = calibration / baseline_calibration if baseline_calibration else 1.0
+    print(f"calibration {calibration:.1f} items/s, {speed:.2f}x the baselines' machine")
+    results = {}
+    flagged = 0
+    print(f"{'case':30} {'items':>8} {'items/s':>11} {'peak MB':>8}  vs baseline")
+    for stage in args.stages:
+        for size_name in args.sizes:
+            case = f"{stage}/{size_name}"
+            result = results[case] = run_case(stage, size_name, args.repeat)
+            baseline = baselines.get(case)
+            if baseline is None or not baseline_calibration:
+                verdict = "no baseline"
+            else:
+                found = regressions(result, baseline, args.threshold, speed)
+                flagged += bool(found)
+                change = result["items_per_second"] / (baseline["items_per_second"] * speed) - 1
+                verdict = f"REGRESSION: {', '.join(found)}" if found else f"ok ({change:+.0%} throughput)"
+            print(f"{case:30} {result['items']:8d} {result['items_per_second']:11.1f} {result['peak_mb']:8.1f}  {verdict}")
+
+    if args.save:
+        save_baselines(results, calibration)
+        print(f"Saved {len(results)} baselines to {BASELINES}")
+    if flagged:
+        print(f"{flagged} regressions beyond the threshold")
+    return 1 if flagged and not args.save else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
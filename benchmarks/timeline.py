@@ -0,0 +1,31 @@
+import re
+from pathlib import Path
+
+SNAPSHOT = Path(__file__).parent / "fixtures" / "timeline.html"
+
+CELL_RE = re.compile(r'<div data-testid="cellInnerDiv".*?</article></div>', re.DOTALL)
+STATUS_RE = re.compile(r'/status/\d+')
+TIMELINE_OPEN = '<div style="position: relative; min-height: 11520px;">'
+
+def load_snapshot() -> str:
+    """Saved X search timeline used as the source of article markup"""
+    return SNAPSHOT.read_text(encoding="utf8")
+
+def snapshot_cells() -> list:
+    """Timeline cells (one <article> each) from the saved snapshot"""
+    return CELL_RE.findall(load_snapshot())
+
+def make_cells(count: int, start: int = 0) -> list:
+    """`count` cells cycled from the snapshot, each with its own status id"""
+    cells = snapshot_cells()
+    return [
+        STATUS_RE.sub(f"/status/{1900000000000000000 + start + i}", cells[(start + i) % len(cells)])
+        for i in range(count)
+    ]
+
+def timeline_html(cells: list) -> str:
+    """Snapshot page with its timeline replaced by `cells`"""
+    html = load_snapshot()
+    head, rest = html.split(TIMELINE_OPEN, 1)
+    tail = rest[rest.index("</div></div></section>"):]
+    return head + TIMELINE_OPEN + "\n".join(cells) + "\n" + tail
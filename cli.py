@@ -0,0 +1,102 @@
+"""Command line entry point for scraping, classifying and analyzing sessions.
+
+Each command imports what it needs when it runs. Nothing creates a session
+directory or an OpenAI client before a command needs one, so the commands
+that only read sessions start in a fraction of a scrape's startup time.
+
+    python cli.py scrape [--platform reddit] [--keyword slay lit] [--amount 200] [--no-classify]
+    python cli.py classify output/session_20250508-181207
+    python cli.py analyze output/session_20250508-181207 [batch ids]
+    python cli.py resume
+    python cli.py status [sessions] [--check]
+"""
+import argparse
+import sys
+from pathlib import Path
+from config import AMOUNT, KEYWORDS, OUTPUT_DIR, PROFILE
+
+def cmd_scrape(args):
+    from scrape import main, PLATFORMS
+    from utils import start_session
+    from metrics import profiled
+    keywords = {keyword: KEYWORDS[keyword] for keyword in args.keyword} if args.keyword else KEYWORDS
+    session_dir = start_session(keywords, args.amount)
+    with profiled(session_dir, args.profile):
+        main(session_dir, keywords, args.amount, args.platform or PLATFORMS, classify=not args.no_classify)
+
+def cmd_classify(args):
+    from analysis.classify import classify_sessions
+    classify_sessions(args.sessions, args.profile)
+
+def cmd_analyze(args):
+    from analysis.classify import finish_session, load_pipeline_state
+    batch_ids = args.batch_ids or [shard["batch_id"] for shard in load_pipeline_state(args.session)["shards"]]
+    finish_session(args.session, batch_ids)
+
+def cmd_resume(args):
+    from analysis.classify import resume_sessions
+    resume_sessions(args.output_dir)
+
+def cmd_status(args):
+    from analysis.classify import load_pipeline_state
+    sessions = args.sessions or sorted(args.output_dir.glob("session_*"))
+    client = None
+    for session_dir in sessions:
+        state = load_pipeline_state(session_dir)
+        if state["analyzed"]:
+            stage = "analyzed"
+        elif any(shard["batch_id"] for shard in state["shards"]):
+            stage = "submitted"
+        else:
+            stage = "prepared" if state["prepared"] else "not classified"
+        print(f"{session_dir.name}: {stage}, {len(state['shards'])} shards")
+        for shard in state["shards"]:
+            status = shard["status"]
+            if args.check and shard["batch_id"] and not state["analyzed"]:
+                if client is None:
+                    from analysis.client import get_client
+                    client = get_client()
+                batch = client.batches.retrieve(shard["batch_id"])
+                counts = batch.request_counts
+                status = f"{batch.status} {counts.completed + counts.failed}/{counts.total}" if counts else batch.status
+            print(f"  {shard['path']}: {shard['batch_id'] or 'not submitted'} {status or ''}".rstrip())
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Scrape, classify and analyze slang usage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="scrape into a new session, then classify it")
+    scrape.add_argument("--platform", nargs="+", choices=["twitter", "reddit"], help="defaults to both")
+    scrape.add_argument("--keyword", nargs="+", choices=list(KEYWORDS), help="defaults to every keyword in config")
+    scrape.add_argument("--amount", type=int, default=AMOUNT, help="items per keyword and platform")
+    scrape.add_argument("--no-classify", action="store_true", help="only scrape, classify the session later")
+    scrape.add_argument("--profile", action="store_true", default=PROFILE, help="cProfile the run into the session")
+    scrape.set_defaults(run=cmd_scrape)
+
+    classify = commands.add_parser("classify", help="classify scraped sessions with the Batch API")
+    classify.add_argument("sessions", nargs="+", type=Path)
+    classify.add_argument("--profile", action="store_true", default=PROFILE, help="cProfile the run into each session")
+    classify.set_defaults(run=cmd_classify)
+
+    analyze = commands.add_parser("analyze", help="write a session's classified files from finished batches")
+    analyze.add_argument("session", type=Path)
+    analyze.add_argument("batch_ids", nargs="*", help="defaults to the batches recorded in the session's pipeline state")
+    analyze.set_defaults(run=cmd_analyze)
+
+    resume = commands.add_parser("resume", help="continue every session whose classification did not finish")
+    resume.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    resume.set_defaults(run=cmd_resume)
+
+    status = commands.add_parser("status", help="show where each session's classification stands")
+    status.add_argument("sessions", nargs="*", type=Path, help="defaults to every session in the output directory")
+    status.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    status.add_argument("--check", action="store_true", help="ask the Batch API for the current status of unfinished batches")
+    status.set_defaults(run=cmd_status)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,14 +32,57 @@ KEYWORDS = {
         }
     }
 
+# parallel jobs per platform; twitter shares one persistent browser profile,
+# which Chromium will only open once at a time
+PLATFORM_CONCURRENCY = {
+    "twitter": 1,
+    "reddit": 3,
+}
+
 OUTPUT_DIR = Path("output")
 TWITTER_SESSION = Path("twitter_session")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-TWITTER_SESSION.mkdir(parents=True, exist_ok=True)
+STORAGE_FORMAT = "json" # or "parquet" (needs pyarrow) for raw and classified files, see storage.py
+# directories are created by whatever first writes into them, importing config has no side effects
 
 CHECKPOINT_DIR = OUTPUT_DIR / "checkpoints"
-CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
-CHECKPOINT_INTERVAL = 100
+CHECKPOINT_INTERVAL = 1 # items between journal appends
+CHECKPOINT_COMPACT_INTERVAL = 1000 # items between full snapshot rewrites
+
+LANG_CACHE_SIZE = 200_000 # memoised is_english answers
+
+SEEN_INDEX_PATH = OUTPUT_DIR / "seen_index.sqlite3" # ids collected by earlier sessions
+SKIP_KNOWN_ITEMS = True # set to False to collect items from earlier sessions again
+SQLITE_LOOKUP_CHUNK = 500 # ids per IN (...) query, stays under SQLite's bound parameter limit
+EVENT_LOG_INTERVAL = 30 # seconds between summaries of per-item log events (duplicates, rejects)
+METRICS_SAMPLES = 2048 # latencies kept per stage for percentiles, see metrics.py
+PROFILE = os.getenv("SCRAPER_PROFILE") == "1" # cProfile the run into the session directory
+
+TWITTER_SEARCH_URL = "https://x.com/search?q={keyword}&f={tab}"
+TWITTER_PAGES = 4 # search pages open at once in one browser, 1 scrapes keyword by keyword
+TWITTER_TABS = ("live",) # add "top" to also scroll the top results of each keyword
+TWITTER_PAGE_MAX_HEAP_MB = 512 # a page whose JS heap grows past this is reloaded
+TWITTER_HEADLESS = False
+
+# adaptive scrolling, see scrapers/scroll.py; False keeps the fixed random scroll and sleep
+ADAPTIVE_SCROLL = True
+SCROLL_MIN_DISTANCE = 3000 # px
+SCROLL_MAX_DISTANCE = 18000
+SCROLL_MAX_WAIT = 8 # seconds to wait for new content after a scroll, at most
+SCROLL_MIN_PAUSE = 0.3 # seconds, waits are padded to between this and twice this
+SCROLL_END_AFTER = 3 # empty scrolls at the bottom of a page that stopped growing before calling it the end
+SCROLL_END_RELOADS = 1 # page reloads at what looks like the end before believing it, X's "Retry" stalls look the same
+
+# lean browser: skip what the scraper never reads, see scrapers/browser.py
+LEAN_BROWSER = True
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+BLOCKED_HOSTS = (
+    "ads-twitter.com", "ads-api.twitter.com", "ads-api.x.com", "analytics.twitter.com",
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+)
+BLOCKED_URL_PARTS = ("/1.1/jot/", "/i/jot") # client event logging
+
+INCREMENTAL_EXTRACTION = True # only parse tweets added since the previous scroll
+TWEET_PARSER = "lxml" # backend for full-page parsing, see scrapers/tweet_parser.py
 
 REDDIT_CREDENTIALS = {
     "username": os.getenv("REDDIT_USERNAME"),
@@ -49,8 +92,63 @@ REDDIT_CREDENTIALS = {
     "client_secret": os.getenv("REDDIT_CLIENT_SECRET"),
 }
 
+# reddit allows 100 OAuth requests per minute, the limiter switches to the
+# budget from the rate-limit headers once requests start coming back
+REDDIT_RATE = 100 / 60
+REDDIT_BURST = 10
+REDDIT_RESERVE = 0 # requests kept back per window, on top of the ones other threads have in flight
+REDDIT_MAX_RETRIES = 5
+
+# reddit query planning, yields are accepted submissions per search request
+QUERY_STATS_DIR = OUTPUT_DIR / "query_stats"
+QUERY_PRIOR_YIELD = 10 # assumed yield of a query that has never run
+QUERY_MIN_RUNS = 2 # runs before a query can be pruned
+QUERY_MIN_YIELD = 1 # prune queries averaging less than this
+QUERY_YIELD_WINDOW = 10 # stop once this many queries in a row ...
+QUERY_STOP_YIELD = 3 # ... added fewer than this many items together
+QUERY_RETRY_SESSIONS = 5 # a pruned query runs again after being skipped in this many sessions ...
+QUERY_RETRY_DECAY = 0.5 # ... with its earlier totals weighted down by this much
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+CLASSIFICATION_MODEL = "gpt-4o-mini"
+CLASSIFICATION_CACHE_PATH = OUTPUT_DIR / "classification_cache.sqlite3"
+CLASSIFICATION_CACHE_MAX_ENTRIES = 2_000_000
+CLASSIFICATION_CACHE_MAX_AGE_DAYS = 365
+
+ANALYTICS_PATH = OUTPUT_DIR / "analytics.sqlite3" # per-session rollups, see analysis/analytics.py
+
+# near-duplicate collapsing before classification, 8 bands x 8 rows pairs
+# texts above roughly 0.77 estimated Jaccard similarity of word 3-grams
+NEAR_DUPLICATES = True
+MINHASH_BANDS = 8
+MINHASH_ROWS = 8
+
+# local pre-classification, see analysis/preclassify.py
+PRECLASSIFY = True
+PRECLASSIFIER_PATH = OUTPUT_DIR / "preclassifier.json"
+PRECLASSIFY_CONFIDENCE = 0.99 # posterior needed to skip the LLM
+PRECLASSIFY_MIN_AGREEMENT = 0.95 # held-out agreement with the LLM needed to enable a keyword
+PRECLASSIFY_MIN_EXAMPLES = 200
+PRECLASSIFY_HOLDOUT = 0.2
+
+# Batch API limits per input file, shards roll over before either is hit
+BATCH_MAX_REQUESTS = 50_000
+BATCH_MAX_BYTES = 190 * 1024 * 1024
+
+# classification while scraping, see analysis/stream.py
+STREAM_CLASSIFY = True
+STREAM_BATCH_SIZE = 500 # requests per micro-batch ...
+STREAM_BATCH_SECONDS = 120 # ... or sooner once the oldest waiting item is this old
+STREAM_QUEUE_SIZE = 200 # scraper hand-offs waiting for the batcher before scrapers block
+STREAM_MAX_IN_FLIGHT = 20 # micro-batches out at once
+STREAM_POLL_SECONDS = 30
+
+# batch status polling, in seconds
+BATCH_POLL_MIN = 5
+BATCH_POLL_START = 30 # before there is any progress to go by
+BATCH_POLL_MAX = 300
+
 PROMPT_TEMPLATE = """Classify usage of "{keyword}" in this text as:
 - 'old' for meaning: "{old}"
 - 'new' for meaning: "{new}"
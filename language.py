@@ -0,0 +1,106 @@
+"""English filter shared by both scrapers.
+
+Cheap checks settle the obvious texts (too short, no letters, mostly
+non-Latin script, plain ASCII full of English stopwords); only the rest go
+to langdetect, seeded so a text always gets the same answer. Answers are
+memoised by text hash, except when langdetect raised.
+
+langdetect loads its language profiles on the first detect() and publishes
+the factory before the profiles are in, so threads racing through that
+first call fail to detect anything. The profiles are loaded once under a
+lock before any detection instead.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from langdetect import DetectorFactory, detect, LangDetectException
+from langdetect.detector_factory import init_factory
+from config import LANG_CACHE_SIZE
+from metrics import timed
+
+DetectorFactory.seed = 0
+
+URL_MENTION_RE = re.compile(r'https?://\S+|www\.\S+|@\w+')
+WORD_RE = re.compile(r"[a-z']+")
+STOPWORDS = frozenset("""
+    a about all an and are as at be but by can do for from get have he her his i if in is it
+    just like me my no not of on or so that the their they this to was we what when with you your
+""".split())
+
+def prefilter(text: str):
+    """True/False when the answer is obvious, None when the detector has to decide"""
+    if len(text.strip()) < 3:
+        return False
+    letters = [c for c in URL_MENTION_RE.sub(' ', text) if c.isalpha()]
+    if not letters:
+        return False
+    ascii_letters = sum(1 for c in letters if c.isascii())
+    if ascii_letters / len(letters) < 0.3:
+        return False # mostly Cyrillic, CJK, Arabic, ...
+    if ascii_letters == len(letters):
+        words = WORD_RE.findall(URL_MENTION_RE.sub(' ', text.lower()))
+        hits = sum(1 for w in words if w in STOPWORDS)
+        if hits >= 3 and hits / len(words) >= 0.3:
+            return True
+    return None
+
+_factory_lock = threading.Lock()
+_factory_ready = False
+
+def _load_profiles():
+    global _factory_ready
+    if not _factory_ready:
+        with _factory_lock:
+            if not _factory_ready:
+                init_factory()
+                _factory_ready = True
+
+def _detect(text: str):
+    """Whether langdetect says English, None when it raised"""
+    _load_profiles()
+    try:
+        return detect(text) == 'en'
+    except LangDetectException:
+        return None
+
+def detect_english(text: str) -> bool:
+    """The original langdetect check, deterministic"""
+    # Require at least 3 characters for reliable detection
+    if len(text.strip()) < 3:
+        return False
+    return bool(_detect(text))
+
+def _classify(text: str):
+    decided = prefilter(text)
+    return _detect(text) if decided is None else decided
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+def _cached(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+def _remember(key, value):
+    with _cache_lock:
+        _cache[key] = value
+        if len(_cache) > LANG_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+@timed("filter.is_english", items=1)
+def is_english(text: str) -> bool:
+    key = _key(text)
+    value = _cached(key)
+    if value is None:
+        value = _classify(text)
+        if value is None:
+            return False # not remembered, the next call asks langdetect again
+        _remember(key, value)
+    return value
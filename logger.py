@@ -1,25 +1,112 @@
+"""Session-wide logging.
+
+Every logger set up for a session shares one queue, and a QueueListener
+writes session.log and the console on a background thread, so a log call in
+the scrape loops only puts a record on the queue. setup_logger can be called
+any number of times: a logger keeps a single queue handler however often it
+is set up. Frequent per-item events (duplicates, rejects) go through
+item_events, which logs one summary line per EVENT_LOG_INTERVAL instead of a
+line per item.
+"""
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import Counter
+from config import EVENT_LOG_INTERVAL
+
+_sessions = {} # log file -> (queue handler, listener)
+_event_counters = {}
+_lock = threading.Lock()
+
+def _session_handler(filename):
+    with _lock:
+        if filename not in _sessions:
+            # File handler
+            fh = logging.FileHandler(filename)
+            fh_formatter = logging.Formatter(
+                '%(asctime)s - %(levelname)s - %(message)s'
+            )
+            fh.setFormatter(fh_formatter)
+
+            # console handler
+            ch = logging.StreamHandler()
+            ch_formatter = logging.Formatter('%(message)s')
+            ch.setFormatter(ch_formatter)
+            ch.setLevel(logging.INFO)
+
+            records = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(records, fh, ch, respect_handler_level=True)
+            listener.start()
+            _sessions[filename] = (logging.handlers.QueueHandler(records), listener)
+        return _sessions[filename][0]
 
 def setup_logger(name, session_dir):
-    filename = session_dir / f"session.log"
-    
+    handler = _session_handler(session_dir / "session.log")
+
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
-    
-    # File handler
-    fh = logging.FileHandler(filename)
-    fh_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    )
-    fh.setFormatter(fh_formatter)
-    
-    # console handler
-    ch = logging.StreamHandler()
-    ch_formatter = logging.Formatter('%(message)s')
-    ch.setFormatter(ch_formatter)
-    ch.setLevel(logging.INFO)
-    
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-    
-    return logger
\ No newline at end of file
+    session_handlers = {h for h, _ in _sessions.values()}
+    for old in [h for h in logger.handlers if h in session_handlers and h is not handler]:
+        logger.removeHandler(old)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+
+    return logger
+
+class EventCounter:
+    """Counts of frequent events, logged as one line per interval"""
+    def __init__(self, logger, interval=EVENT_LOG_INTERVAL, level=logging.DEBUG):
+        self.logger = logger
+        self.interval = interval
+        self.level = level
+        self.counts = Counter()
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def count(self, event, n=1):
+        with self.lock:
+            self.counts[event] += n
+            if time.monotonic() - self.last < self.interval:
+                return
+            counts = self._take()
+        self._log(counts)
+
+    def flush(self):
+        with self.lock:
+            counts = self._take()
+        self._log(counts)
+
+    def _take(self):
+        counts, self.counts = self.counts, Counter()
+        self.last = time.monotonic()
+        return counts
+
+    def _log(self, counts):
+        if counts:
+            self.logger.log(self.level, "Items: " + ", ".join(f"{n} {event}" for event, n in counts.most_common()))
+
+def item_events(logger) -> EventCounter:
+    """The logger's shared EventCounter"""
+    with _lock:
+        if logger.name not in _event_counters:
+            _event_counters[logger.name] = EventCounter(logger)
+        return _event_counters[logger.name]
+
+@atexit.register
+def stop_logging():
+    """Log pending event counts and wait for the listeners to write out their queues"""
+    for counter in list(_event_counters.values()):
+        counter.flush()
+    with _lock:
+        sessions = list(_sessions.items())
+        _sessions.clear()
+    for _, (handler, listener) in sessions:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+        for logger in [logging.getLogger(name) for name in logging.root.manager.loggerDict]:
+            if isinstance(logger, logging.Logger) and handler in logger.handlers:
+                logger.removeHandler(handler)
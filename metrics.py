@@ -0,0 +1,227 @@
+"""Per-stage timers and counters for a run, written to the session directory.
+
+Stages are timed with `with stage("twitter.parse") as s: ...; s.items = n`,
+the @timed decorator, or observe() for a duration measured elsewhere. Each
+keeps its calls, seconds, items and a bounded sample of latencies for the
+p50/p95. count() adds to labelled counters such as rejections by reason.
+
+write_metrics(session_dir) writes metrics.json and metrics.prom, a
+Prometheus textfile. A later run on the same session, such as a resumed
+classification, replaces the stages and counters it touched and keeps the
+rest. profiled() runs cProfile around a block when PROFILE is on
+(SCRAPER_PROFILE=1) and saves profile.pstats and profile.txt next to them.
+Before Python 3.12 a profiler only sees the thread that enables it, so every
+thread started inside the block, such as the orchestrator's workers, gets
+its own profiler and their stats are merged into one dump.
+"""
+import cProfile
+import functools
+import io
+import json
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from config import PROFILE, METRICS_SAMPLES
+
+METRICS_FILE = "metrics.json"
+PROMETHEUS_FILE = "metrics.prom"
+PROMETHEUS_PREFIX = "scraper"
+
+class StageStats:
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.max = 0.0
+        self.samples = []
+        self.max_samples = samples
+
+    def add(self, seconds, items=0):
+        self.calls += 1
+        self.seconds += seconds
+        self.items += items
+        self.max = max(self.max, seconds)
+        # reservoir sampling keeps the percentiles honest without keeping every call
+        if len(self.samples) < self.max_samples:
+            self.samples.append(seconds)
+        else:
+            slot = int(random.random() * self.calls)
+            if slot < self.max_samples:
+                self.samples[slot] = seconds
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "items": self.items,
+            "items_per_second": round(self.items / self.seconds, 2) if self.seconds and self.items else None,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+class Metrics:
+    def __init__(self):
+        self.stages = defaultdict(StageStats)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(self, name, seconds, items=0):
+        with self.lock:
+            self.stages[name].add(seconds, items)
+
+    def count(self, name, n=1, **labels):
+        if n:
+            with self.lock:
+                self.counters[(name, tuple(sorted(labels.items())))] += n
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            stages = {name: stats.to_dict() for name, stats in sorted(self.stages.items())}
+            counters = defaultdict(list)
+            for (name, labels), n in sorted(self.counters.items()):
+                counters[name].append({"labels": dict(labels), "value": n})
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": dict(counters),
+        }
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+METRICS = Metrics()
+
+class _Stage:
+    def __init__(self, items):
+        self.items = items
+
+@contextmanager
+def stage(name, items=0):
+    """Time a block as one call of `name`; set .items on the yielded object to count what it handled"""
+    timer = _Stage(items)
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        METRICS.observe(name, time.perf_counter() - start, timer.items)
+
+def timed(name, items=0):
+    """Time every call of the function as one call of `name` handling `items` items"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                METRICS.observe(name, time.perf_counter() - start, items)
+        return wrapper
+    return decorator
+
+def observe(name, seconds, items=0):
+    METRICS.observe(name, seconds, items)
+
+def count(name, n=1, **labels):
+    METRICS.count(name, n, **labels)
+
+def _merge(previous: dict, current: dict) -> dict:
+    merged = dict(current)
+    merged["stages"] = {**previous.get("stages", {}), **current["stages"]}
+    merged["counters"] = {**previous.get("counters", {}), **current["counters"]}
+    merged["started_at"] = min(previous.get("started_at", current["started_at"]), current["started_at"])
+    return merged
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _prometheus_labels(labels: dict) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in labels.items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def prometheus_text(snapshot: dict, prefix: str = PROMETHEUS_PREFIX) -> str:
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{prefix}_{name}{_prometheus_labels(labels)} {value}")
+
+    stages = snapshot["stages"]
+    metric("stage_calls_total", "counter", "Calls per pipeline stage",
+           [({"stage": name}, s["calls"]) for name, s in stages.items()])
+    metric("stage_seconds_total", "counter", "Seconds spent per pipeline stage",
+           [({"stage": name}, s["seconds"]) for name, s in stages.items()])
+    metric("stage_items_total", "counter", "Items handled per pipeline stage",
+           [({"stage": name}, s["items"]) for name, s in stages.items()])
+    metric("stage_latency_seconds", "gauge", "Sampled stage latency quantiles",
+           [({"stage": name, "quantile": q}, s[key] / 1000)
+            for name, s in stages.items() for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"))])
+    for name, series in snapshot["counters"].items():
+        metric(f"{name}_total", "counter", name.replace("_", " ").capitalize(),
+               [(entry["labels"], entry["value"]) for entry in series])
+    metric("run_elapsed_seconds", "gauge", "Seconds since the run started", [({}, snapshot["elapsed_seconds"])])
+    return "\n".join(lines) + "\n"
+
+def write_metrics(session_dir: Path, metrics: Metrics = METRICS) -> dict:
+    """Write metrics.json and metrics.prom into the session directory, return the snapshot written"""
+    path = session_dir / METRICS_FILE
+    snapshot = metrics.snapshot()
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            snapshot = _merge(json.load(f), snapshot)
+    for name, text in ((METRICS_FILE, json.dumps(snapshot, indent=2)), (PROMETHEUS_FILE, prometheus_text(snapshot))):
+        tmp = session_dir / (name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        tmp.replace(session_dir / name) # a textfile collector never sees half a file
+    return snapshot
+
+@contextmanager
+def profiled(session_dir: Path, enabled: bool = PROFILE, top: int = 40):
+    """cProfile the block and the threads it starts when enabled, saving profile.pstats and the top functions in profile.txt"""
+    if not enabled:
+        yield
+        return
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(*args):
+        # the first profile event of a new thread; enable() replaces this hook with the thread's own profiler
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    previous = threading.getprofile()
+    if sys.version_info < (3, 12): # from 3.12 one profiler sees every thread
+        threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(previous)
+        out = io.StringIO()
+        with lock:
+            stats = pstats.Stats(*profilers, stream=out)
+        stats.dump_stats(session_dir / "profile.pstats")
+        stats.sort_stats("cumulative").print_stats(top)
+        with open(session_dir / "profile.txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import time
+from config import PLATFORM_CONCURRENCY
+from utils import save_data
+from metrics import observe
+from seen_index import SeenIndex
+
+def index_saved(seen_index, platform, keyword, results):
+    """Add saved items' ids to the seen index at path `seen_index`, if given
+
+    Only after save_data returns, so items whose save failed are not skipped
+    as known by the next session.
+    """
+    if seen_index is None:
+        return
+    index = SeenIndex(seen_index)
+    try:
+        index.add(platform, keyword, [item["id"] for item in results if item.get("id")])
+    finally:
+        index.close()
+
+def run_job(scraper, keyword, platform, amount, raw_dir, logger, on_items=None, seen_index=None):
+    """Scrape one (keyword, platform) pair and save it. Failures are reported, not raised
+
+    With `on_items`, the scraper passes accepted items on as it collects
+    them, as on_items(keyword, platform, items). With `seen_index`, the saved
+    items' ids go into that seen index.
+    """
+    start = time.perf_counter()
+    try:
+        logger.info(f"Scraping {platform} for keyword: {keyword}")
+        if on_items:
+            results = scraper(keyword, amount, on_items=lambda items: on_items(keyword, platform, items))
+        else:
+            results = scraper(keyword, amount)
+        save_data(keyword, results, platform, raw_dir)
+        index_saved(seen_index, platform, keyword, results)
+        status, error = "done", None
+        count = len(results)
+    except Exception as e:
+        # the scraper's checkpoint keeps whatever it collected, a rerun resumes it
+        logger.error(f"{platform} scrape for {keyword} failed: {str(e)}")
+        status, error = "failed", str(e)
+        count = 0
+    seconds = time.perf_counter() - start
+    observe(f"{platform}.job", seconds, count)
+    return {
+        "keyword": keyword,
+        "platform": platform,
+        "status": status,
+        "count": count,
+        "error": error,
+        "seconds": round(seconds, 2),
+    }
+
+def run_group_job(scraper, keywords, platform, amount, raw_dir, logger, on_items=None, seen_index=None):
+    """Scrape every keyword of a platform with one call and save each keyword's results
+
+    The scraper is `scraper(keywords, amount)` returning keyword -> results,
+    e.g. scrape_tweets_many, which shares one browser between keywords.
+    """
+    start = time.perf_counter()
+    try:
+        logger.info(f"Scraping {platform} for keywords: {', '.join(keywords)}")
+        if on_items:
+            results = scraper(keywords, amount, on_items=lambda keyword, items: on_items(keyword, platform, items))
+        else:
+            results = scraper(keywords, amount)
+        for keyword in keywords:
+            save_data(keyword, results.get(keyword, []), platform, raw_dir)
+            index_saved(seen_index, platform, keyword, results.get(keyword, []))
+        status, error = "done", None
+    except Exception as e:
+        logger.error(f"{platform} scrape failed: {str(e)}")
+        status, error, results = "failed", str(e), {}
+    seconds = time.perf_counter() - start
+    observe(f"{platform}.job", seconds, sum(len(items) for items in results.values()))
+    seconds = round(seconds, 2)
+    return [
+        {
+            "keyword": keyword,
+            "platform": platform,
+            "status": status,
+            "count": len(results.get(keyword, [])),
+            "error": error,
+            "seconds": seconds,
+        }
+        for keyword in keywords
+    ]
+
+def run_jobs(keywords, amount, raw_dir, scrapers, concurrency=PLATFORM_CONCURRENCY, logger=None, on_items=None,
+             grouped=(), seen_index=None):
+    """Run every (keyword, platform) job, platforms side by side, each capped by its own pool size
+
+    `scrapers` maps a platform name to a `scraper(keyword, amount)` callable,
+    or for the platforms in `grouped` to a `scraper(keywords, amount)` that
+    takes every keyword at once and runs as a single job. With `seen_index`,
+    every saved job's item ids go into the seen index at that path.
+    """
+    logger = logger or logging.getLogger("scraper")
+    pools = {
+        platform: ThreadPoolExecutor(max_workers=concurrency.get(platform, 1), thread_name_prefix=platform)
+        for platform in scrapers
+    }
+    try:
+        futures = [
+            pools[platform].submit(run_job, scraper, keyword, platform, amount, raw_dir, logger, on_items, seen_index)
+            for keyword in keywords
+            for platform, scraper in scrapers.items()
+            if platform not in grouped
+        ] + [
+            pools[platform].submit(run_group_job, scrapers[platform], list(keywords), platform, amount, raw_dir, logger, on_items, seen_index)
+            for platform in grouped
+        ]
+        jobs = []
+        for future in as_completed(futures):
+            result = future.result()
+            for job in result if isinstance(result, list) else [result]:
+                logger.info(f"Finished {job['platform']}/{job['keyword']}: {job['status']} ({job['count']} items, {job['seconds']}s)")
+                jobs.append(job)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    return jobs
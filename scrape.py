@@ -1,23 +1,68 @@
-from scrapers.twitter import scrape_tweets
-from scrapers.reddit import reddit_search
-from config import AMOUNT, KEYWORDS
-from utils import SESSION_DIR, save_data
-from analysis.classify import process_session
+from config import AMOUNT, KEYWORDS, SEEN_INDEX_PATH, STREAM_CLASSIFY, TWITTER_PAGES
+from utils import start_session
 from logger import setup_logger
+from metrics import profiled, write_metrics
 
-if __name__ == "__main__":
-    logger = setup_logger("scraper", SESSION_DIR)
-    raw = SESSION_DIR / "raw"
+PLATFORMS = ("twitter", "reddit")
+
+def get_scrapers(platforms):
+    """platform -> scraper, importing only the platforms asked for (twitter loads the browser driver)"""
+    scrapers = {}
+    if "twitter" in platforms:
+        from scrapers.twitter import scrape_tweets, scrape_tweets_many
+        scrapers["twitter"] = scrape_tweets_many if TWITTER_PAGES > 1 else scrape_tweets
+    if "reddit" in platforms:
+        from scrapers.reddit import reddit_search
+        scrapers["reddit"] = reddit_search
+    return scrapers
+
+def main(session_dir, keywords=KEYWORDS, amount=AMOUNT, platforms=PLATFORMS, classify=True):
+    from orchestrator import run_jobs
+    logger = setup_logger("scraper", session_dir)
+    raw = session_dir / "raw"
     raw.mkdir(parents=True, exist_ok=True)
 
-    print(f"Started session: {SESSION_DIR.name}")
-    for keyword in KEYWORDS.keys():
-        logger.info(f"Scraping Twitter for keyword: {keyword}")
-        tweets = scrape_tweets(keyword, AMOUNT)
-        save_data(keyword, tweets, "twitter", raw)
+    print(f"Started session: {session_dir.name}")
+    scrapers = get_scrapers(platforms)
+    # classify as items come in; process_session then finds them all in the cache
+    stream = None
+    if classify and STREAM_CLASSIFY:
+        from analysis.stream import StreamingClassifier
+        stream = StreamingClassifier(session_dir, keywords, logger=logger).start()
+    try:
+        jobs = run_jobs(
+            keywords.keys(),
+            amount,
+            raw,
+            scrapers,
+            logger=logger,
+            on_items=stream.put if stream else None,
+            grouped=("twitter",) if TWITTER_PAGES > 1 and "twitter" in scrapers else (),
+            seen_index=SEEN_INDEX_PATH,
+        )
+    except BaseException:
+        if stream:
+            stream.abort()
+        raise
+    finally:
+        write_metrics(session_dir) # scrape timings survive a classification that fails
+    if stream:
+        stats = stream.close()
+        logger.info(f"Streamed {stats['items']} items: {stats['requests']} requests in {stats['batches']} micro-batches, "
+                    f"{stats['cache']} cached, {stats['local']} labelled locally, {stats['duplicates']} duplicate texts, "
+                    f"{stats['near_duplicates']} near-duplicates")
+    failed = [job for job in jobs if job["status"] == "failed"]
+    if failed:
+        names = ', '.join(f"{job['platform']}/{job['keyword']}" for job in failed)
+        logger.warning(f"{len(failed)} scrape jobs failed, rerun to resume from checkpoints: {names}")
 
-        logger.info(f"Scraping Reddit for keyword: {keyword}")
-        submissions = reddit_search(keyword, AMOUNT)
-        save_data(keyword, submissions, "reddit", raw)
-    
-    process_session(SESSION_DIR, KEYWORDS)
\ No newline at end of file
+    if classify:
+        from analysis.classify import process_session
+        process_session(session_dir, keywords)
+
+if __name__ == "__main__":
+    # every keyword and platform in config; cli.py scrape picks them
+    # SCRAPER_PROFILE=1 python scrape.py also writes profile.pstats and profile.txt into the session
+    session_dir = start_session()
+    with profiled(session_dir):
+        main(session_dir)
@@ -0,0 +1,82 @@
+"""Browser setup for the Twitter scraper, with an optional lean mode.
+
+The scraper only reads article text, ids, timestamps and usernames, so in
+lean mode requests for images, media and fonts, and for known analytics and
+client-event logging endpoints, are aborted before they leave the browser.
+A ResourceCounter tallies requests, bytes (from Content-Length) and blocked
+requests per resource type for the logs.
+"""
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from config import (
+    COOKIES, CHROME_ARGS, TWITTER_SESSION, TWITTER_HEADLESS, LEAN_BROWSER, BLOCKED_RESOURCE_TYPES, BLOCKED_HOSTS,
+    BLOCKED_URL_PARTS,
+)
+
+def launch_browser(p, user_data_dir=TWITTER_SESSION, headless=TWITTER_HEADLESS):
+    browser = p.chromium.launch_persistent_context(
+        user_data_dir=user_data_dir,
+        headless=headless,
+        args=CHROME_ARGS,
+    )
+    browser.add_cookies(COOKIES)
+    return browser
+
+def is_blocked(resource_type: str, url: str, blocked_types=BLOCKED_RESOURCE_TYPES, blocked_hosts=BLOCKED_HOSTS,
+               blocked_url_parts=BLOCKED_URL_PARTS) -> bool:
+    if resource_type in blocked_types:
+        return True
+    host = urlparse(url).hostname or ""
+    if any(host == blocked or host.endswith("." + blocked) for blocked in blocked_hosts):
+        return True
+    return any(part in url for part in blocked_url_parts)
+
+class ResourceCounter:
+    """Requests, response bytes and blocked requests per resource type"""
+    def __init__(self):
+        self.requests = Counter()
+        self.bytes = Counter()
+        self.blocked = Counter()
+        self.lock = threading.Lock()
+
+    def on_response(self, response):
+        resource_type = response.request.resource_type
+        size = int(response.headers.get("content-length") or 0)
+        with self.lock:
+            self.requests[resource_type] += 1
+            self.bytes[resource_type] += size
+
+    def on_blocked(self, resource_type):
+        with self.lock:
+            self.blocked[resource_type] += 1
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+    def summary(self) -> str:
+        types = sorted(set(self.requests) | set(self.blocked), key=lambda t: -self.bytes[t])
+        parts = [
+            f"{t} {self.requests[t]} req {self.bytes[t] / 1024:.0f} KiB" + (f" ({self.blocked[t]} blocked)" if self.blocked[t] else "")
+            for t in types
+        ]
+        return f"{self.total_bytes / 1024:.0f} KiB transferred: " + ", ".join(parts)
+
+def watch_resources(browser, lean=LEAN_BROWSER, **blocking) -> ResourceCounter:
+    """Count the browser's traffic and, in lean mode, abort requests the scraper does not need
+
+    `blocking` overrides is_blocked's lists, e.g. blocked_url_parts.
+    """
+    counter = ResourceCounter()
+    browser.on("response", counter.on_response)
+    if lean:
+        def route(route):
+            request = route.request
+            if is_blocked(request.resource_type, request.url, **blocking):
+                counter.on_blocked(request.resource_type)
+                route.abort()
+            else:
+                route.continue_()
+        browser.route("**/*", route)
+    return counter
@@ -0,0 +1,101 @@
+"""Orders and prunes reddit_search queries by how many new submissions they yield.
+
+For every (query, sort, time_filter) the planner keeps per-keyword totals of
+runs, new ids and accepted submissions in QUERY_STATS_DIR, so later sessions
+start with the queries that paid off and skip the ones that only returned
+duplicates of earlier queries. A pruned query runs once more after it has
+been skipped in QUERY_RETRY_SESSIONS sessions, with its old totals decayed,
+so a query that only looked bad for a while is not dropped for good.
+Queries that failed (gave up after rate limiting) are not recorded at all.
+"""
+import json
+import os
+from collections import deque
+from config import (
+    QUERY_STATS_DIR, QUERY_PRIOR_YIELD, QUERY_MIN_RUNS, QUERY_MIN_YIELD,
+    QUERY_YIELD_WINDOW, QUERY_STOP_YIELD, QUERY_RETRY_SESSIONS, QUERY_RETRY_DECAY,
+)
+
+SEARCH_TERMS = ['{keyword}', 'body:"{keyword}"', 'title:"{keyword}"', 'comment:"{keyword}"']
+SORT_OPTIONS = ["relevance", "hot", "new", "top", "comments"]
+TIME_FILTERS = ["all", "year", "month", "week", "day", "hour"]
+
+def all_queries(keyword):
+    """The full search space, in the original fixed order"""
+    return [
+        (st.format(keyword=keyword), so, tf)
+        for st in SEARCH_TERMS
+        for so in SORT_OPTIONS
+        for tf in TIME_FILTERS
+    ]
+
+def _key(query):
+    return "|".join(query)
+
+class QueryPlanner:
+    def __init__(self, keyword, platform="reddit", stats_dir=QUERY_STATS_DIR):
+        self.keyword = keyword
+        self.file = stats_dir / f"{keyword}_{platform}.json"
+        self.stats = {}
+        if os.path.exists(self.file):
+            with open(self.file) as f:
+                self.stats = json.load(f)
+        self.recent = deque(maxlen=QUERY_YIELD_WINDOW)
+
+    def expected_yield(self, query):
+        """Average accepted submissions per run, QUERY_PRIOR_YIELD if never run"""
+        stats = self.stats.get(_key(query))
+        if not stats or not stats["runs"]:
+            return QUERY_PRIOR_YIELD
+        return stats["accepted"] / stats["runs"]
+
+    def is_pruned(self, query):
+        stats = self.stats.get(_key(query))
+        return (
+            stats is not None and
+            stats["runs"] >= QUERY_MIN_RUNS and
+            self.expected_yield(query) < QUERY_MIN_YIELD
+        )
+
+    def is_retry(self, query):
+        stats = self.stats.get(_key(query))
+        return stats is not None and stats.get("skipped", 0) >= QUERY_RETRY_SESSIONS
+
+    def plan(self):
+        """Queries worth running, highest expected yield first (ties keep the original order),
+        then the pruned queries due for a retry"""
+        queries = []
+        retries = []
+        for query in all_queries(self.keyword):
+            if not self.is_pruned(query):
+                queries.append(query)
+                continue
+            stats = self.stats[_key(query)]
+            stats["skipped"] = stats.get("skipped", 0) + 1
+            if stats["skipped"] >= QUERY_RETRY_SESSIONS:
+                retries.append(query)
+        return sorted(queries, key=self.expected_yield, reverse=True) + retries
+
+    def record(self, query, new, accepted):
+        stats = self.stats.setdefault(_key(query), {"runs": 0, "new": 0, "accepted": 0})
+        retry = stats.get("skipped", 0) >= QUERY_RETRY_SESSIONS
+        if retry:
+            for field in ("runs", "new", "accepted"):
+                stats[field] *= QUERY_RETRY_DECAY
+        stats["skipped"] = 0
+        stats["runs"] += 1
+        stats["new"] += new
+        stats["accepted"] += accepted
+        if not retry: # a retry is expected to yield little, it should not end the search
+            self.recent.append(accepted)
+
+    def should_stop(self):
+        """True once the last QUERY_YIELD_WINDOW queries together added fewer than QUERY_STOP_YIELD items"""
+        return len(self.recent) == self.recent.maxlen and sum(self.recent) < QUERY_STOP_YIELD
+
+    def save(self):
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.file.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.stats, f, indent=2)
+        os.replace(tmp, self.file)
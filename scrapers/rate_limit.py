@@ -0,0 +1,103 @@
+"""Token bucket shared by every Reddit search running in this process.
+
+Until Reddit has answered, the bucket refills at REDDIT_RATE. After that it
+holds exactly the budget prawcore reads off Reddit's rate-limit headers
+(remaining requests until the window resets), less the requests other
+threads have in flight, which the headers cannot count yet. Searches go back
+to back while there is budget and only wait for the reset once it is spent,
+so a window's whole budget is used whether one or many clients share it. A 429
+empties the bucket and blocks it for the server's retry-after, or an
+exponential penalty when there is none.
+"""
+import threading
+import time
+from config import REDDIT_RATE, REDDIT_BURST, REDDIT_RESERVE
+
+class RateLimiter:
+    def __init__(self, rate, capacity, reserve=0, clock=time.time, sleep=time.sleep, max_penalty=300):
+        self.rate = rate # tokens per second while no window is known
+        self.capacity = capacity
+        self.reserve = reserve # requests kept back on top of the ones in flight
+        self.in_flight = 0 # acquired and not released, i.e. not yet counted in Reddit's headers
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.max_penalty = max_penalty
+        self.penalty = 0
+        self.blocked_until = 0
+        self.reset_at = None
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                # new window, fall back to the default rate until Reddit reports again
+                self.reset_at = None
+                self.tokens = max(self.tokens, self.capacity)
+        elif now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _wait_time(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        if self.reset_at is not None:
+            return self.reset_at - now
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a request is allowed, then spend one token. Returns seconds waited"""
+        waited = 0
+        while True:
+            with self.lock:
+                wait = self._wait_time(self.clock())
+                if wait <= 0:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return waited
+            self.sleep(wait)
+            waited += wait
+
+    def release(self):
+        """The request acquired for has been answered (or failed)"""
+        with self.lock:
+            self.in_flight -= 1
+
+    def update(self, remaining, reset_timestamp):
+        """Take the budget left in the current window from the headers of a request not released yet"""
+        if remaining is None or reset_timestamp is None:
+            return
+        with self.lock:
+            now = self.clock()
+            if reset_timestamp <= now:
+                return
+            self.tokens = remaining - self.reserve - (self.in_flight - 1)
+            self.reset_at = reset_timestamp
+            self.updated = now
+            self.penalty = 0
+
+    def backoff(self, retry_after=None):
+        """Called on a 429, empties the bucket and blocks it for a while. Returns the block length"""
+        with self.lock:
+            now = self.clock()
+            self.penalty = min(self.max_penalty, self.penalty * 2 if self.penalty else 1)
+            delay = float(retry_after) if retry_after else self.penalty
+            self.tokens = 0
+            self.updated = now
+            self.blocked_until = max(self.blocked_until, now + delay)
+            return delay
+
+_reddit_limiter = None
+_reddit_limiter_lock = threading.Lock()
+
+def get_reddit_limiter():
+    """The process-wide limiter shared by all Reddit searches"""
+    global _reddit_limiter
+    with _reddit_limiter_lock:
+        if _reddit_limiter is None:
+            _reddit_limiter = RateLimiter(REDDIT_RATE, REDDIT_BURST, REDDIT_RESERVE)
+        return _reddit_limiter
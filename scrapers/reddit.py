@@ -1,11 +1,16 @@
 from praw import Reddit
 from praw.models import Submission
-from config import REDDIT_CREDENTIALS
+from prawcore.exceptions import TooManyRequests
+from collections import Counter
+from config import REDDIT_CREDENTIALS, REDDIT_MAX_RETRIES
 import uuid
-from utils import is_valid_text, is_english, save_checkpoint, load_checkpoint, remove_checkpoint, SESSION_DIR
-from config import CHECKPOINT_INTERVAL
-import time
-from logger import setup_logger
+from utils import is_valid_text, is_english, match_keywords, save_checkpoint, append_checkpoint, load_checkpoint, remove_checkpoint, current_session_dir
+from config import CHECKPOINT_INTERVAL, CHECKPOINT_COMPACT_INTERVAL, SKIP_KNOWN_ITEMS
+from logger import setup_logger, item_events
+from metrics import stage, observe, count
+from scrapers.rate_limit import get_reddit_limiter
+from scrapers.query_planner import QueryPlanner
+from seen_index import SeenIndex
 
 def is_too_long(text: str, max_length: int = 500) -> bool:
     return len(text) > max_length
@@ -18,18 +23,48 @@ def should_keep_submission(text: str):
     )
 
 def process_submission(submission: Submission):
+    text = f"{submission.title}\n{submission.selftext}".strip()
     return {
             "uuid": str(uuid.uuid4()),
             "id": submission.id,
-            "text": f"{submission.title}\n{submission.selftext}".strip(),
+            "text": text,
             "url": submission.url,
             "created_at": submission.created_utc,
             "username": submission.author.name if submission.author else "[deleted]",
             "subreddit": submission.subreddit.display_name,
+            "keywords": match_keywords(text),
         }
 
-def reddit_search(keyword, limit=100):
-    logger = setup_logger("reddit", SESSION_DIR)
+def search_submissions(reddit, limiter, search_term, sort_option, time_filter, logger):
+    """One rate-limited search request, retried with backoff on 429; None once it gives up"""
+    for attempt in range(REDDIT_MAX_RETRIES):
+        waited = limiter.acquire()
+        observe("reddit.rate_limit_wait", waited)
+        if waited:
+            logger.debug(f"Rate limiter held search for {waited:.2f}s")
+        try:
+            with stage("reddit.search") as timer:
+                submissions = list(reddit.subreddit('all').search(
+                    query=search_term,
+                    time_filter=time_filter,
+                    limit=100,
+                    sort=sort_option,
+                ))
+                timer.items = len(submissions)
+            limits = reddit.auth.limits
+            limiter.update(limits["remaining"], limits["reset_timestamp"])
+            return submissions
+        except TooManyRequests as e:
+            delay = limiter.backoff(e.retry_after)
+            logger.warning(f"Rate limited by Reddit, backing off {delay:.0f}s ({attempt + 1}/{REDDIT_MAX_RETRIES})")
+        finally:
+            limiter.release()
+    logger.error(f"Giving up on {search_term} ({sort_option}/{time_filter}) after {REDDIT_MAX_RETRIES} rate-limited attempts")
+    return None
+
+def reddit_search(keyword, limit=100, reddit=None, limiter=None, skip_known=SKIP_KNOWN_ITEMS, on_items=None):
+    """Collect up to `limit` submissions, passing each query's accepted ones to `on_items` as it finishes"""
+    logger = setup_logger("reddit", current_session_dir())
     logger.info(f"\n{'='*50}")
     logger.info(f"Starting Reddit search for: {keyword}")
     logger.info(f"Target count: {limit}")
@@ -38,68 +73,101 @@ def reddit_search(keyword, limit=100):
 
     # load existing progress if any
     results, seen_ids = load_checkpoint(keyword, "reddit")
+    if on_items and results:
+        on_items(results[:limit])
     if len(results) >= limit:
         logger.info(f"Loaded {len(results)} existing results from checkpoint")
         return results[:limit]
 
-    reddit = Reddit(
+    reddit = reddit or Reddit(
         client_id=REDDIT_CREDENTIALS["client_id"],
         client_secret=REDDIT_CREDENTIALS["client_secret"],
         user_agent=REDDIT_CREDENTIALS["user_agent"],
         username=REDDIT_CREDENTIALS["username"],
         password=REDDIT_CREDENTIALS["password"],
     )
+    limiter = limiter or get_reddit_limiter()
 
-    search_params = [
-        (st, so, tf)
-        for st in [keyword, f'body:"{keyword}"', f'title:"{keyword}"',f'comment:"{keyword}"']
-        for so in ["relevance", "hot", "new", "top", "comments"]
-        for tf in ["all", "year", "month", "week", "day", "hour"]
-    ]
+    planner = QueryPlanner(keyword)
+    search_params = planner.plan()
+    logger.info(f"Planned {len(search_params)} searches")
+
+    # ids and items seen since the last journal append
+    pending_seen = []
+    journaled = len(results)
+    index = SeenIndex()
+    events = item_events(logger)
 
     try:
         for search_term, sort_option, time_filter in search_params:
 
             logger.info(f"Searching: {search_term} ({sort_option}/{time_filter})")
-            submissions = reddit.subreddit('all').search(
-                query=search_term,
-                time_filter=time_filter,
-                limit=100,
-                sort=sort_option,
-            )
+            submissions = search_submissions(reddit, limiter, search_term, sort_option, time_filter, logger)
+            if submissions is None:
+                continue # not a real yield of zero, so the planner does not record it
+            new_count = 0
+            accepted_count = 0
+            known = index.known("reddit", keyword, [s.id for s in submissions]) if skip_known else set()
+            skipped = Counter()
 
             for submission in submissions:
                 if submission.id in seen_ids:
-                    logger.debug(f"Skipping duplicate: {submission.id}")
+                    skipped["duplicate"] += 1
+                    continue
+
+                if submission.id in known:
+                    skipped["earlier_session"] += 1
                     continue
                 
                 seen_ids.add(submission.id)
+                pending_seen.append(submission.id)
+                new_count += 1
                 result = process_submission(submission)
                 
                 if not should_keep_submission(result["text"]):
-                    logger.debug(f"Rejected submission {submission.id} - validation failed")
+                    skipped["invalid"] += 1
                     continue
                 
                 results.append(result)
-                logger.info(f"Collected {len(results)}/{limit}")
+                accepted_count += 1
 
-                if len(results) % CHECKPOINT_INTERVAL == 0:
+                if len(results) % CHECKPOINT_COMPACT_INTERVAL == 0:
                     save_checkpoint(keyword, "reddit", results, seen_ids)
-                    logger.info(f"Checkpoint saved at {len(results)} items")
+                    pending_seen = []
+                    journaled = len(results)
+                    logger.info(f"Checkpoint compacted at {len(results)} items")
+                elif len(results) % CHECKPOINT_INTERVAL == 0:
+                    append_checkpoint(keyword, "reddit", results[journaled:], pending_seen)
+                    pending_seen = []
+                    journaled = len(results)
 
                 if len(results) >= limit:
                     break
 
-            time.sleep(1)  # avoid hitting reddits rate limit
+            for reason, n in skipped.items():
+                events.count(f"submissions skipped ({reason})", n)
+                count("items_rejected", n, platform="reddit", reason=reason)
+            count("items_collected", accepted_count, platform="reddit")
+            logger.info(f"Collected {accepted_count} from this search ({len(results)}/{limit})")
+            if on_items and accepted_count:
+                on_items(results[-accepted_count:])
             if len(results) >= limit:
-                 break
+                 break # the last query was cut short, its yield would read low
+
+            planner.record((search_term, sort_option, time_filter), new_count, accepted_count)
+            if planner.should_stop():
+                logger.info("Stopping search - recent queries yield almost no new submissions")
+                break
 
     finally:
+        events.flush()
+        planner.save()
+        index.close()
         if len(results) >= limit:
             remove_checkpoint(keyword, "reddit")
             logger.info("Checkpoint removed - collection complete")
         else:
-            save_checkpoint(keyword, "reddit", results, seen_ids)
+            append_checkpoint(keyword, "reddit", results[journaled:], pending_seen)
             logger.info(f"Saved interim checkpoint with {len(results)} items")
 
     return results[:limit]
@@ -0,0 +1,133 @@
+"""Adaptive scrolling for the Twitter timeline.
+
+The old loop wheeled a random 8k-18k px and slept 1-2.5 s whether or not
+anything had loaded. ScrollController instead waits after each wheel for a
+concrete signal, new article nodes or the page growing, up to a cap of a few
+times the recent load latency, and only pads the wait to a short human-like
+pause. The distance grows while scrolls keep yielding tweets and shrinks
+after empty ones, which usually means it scrolled past cells that had not
+rendered. Sitting at the bottom of a page that stopped growing for
+`end_after` empty scrolls is taken as the end of the results, rather than
+the stall that refreshing the page is for, but only after `end_reloads`
+reloads came back to the same bottom: X's transient "Something went wrong"
+with a Retry button looks exactly like the end until the page is reloaded.
+
+Waits are measured from the wheel, so pages scrolled together in one round
+wait out their loads at the same time.
+"""
+import random
+import time
+from config import (
+    ADAPTIVE_SCROLL, SCROLL_MIN_DISTANCE, SCROLL_MAX_DISTANCE, SCROLL_MAX_WAIT, SCROLL_MIN_PAUSE, SCROLL_END_AFTER,
+    SCROLL_END_RELOADS,
+)
+
+HEIGHT_JS = "() => document.scrollingElement.scrollHeight"
+NEW_CONTENT_JS = """
+(height) => (window.__pendingArticles || []).length > 0
+    || document.scrollingElement.scrollHeight !== height
+"""
+AT_BOTTOM_JS = """
+() => {
+    const root = document.scrollingElement;
+    return root.scrollTop + window.innerHeight >= root.scrollHeight - 50;
+}
+"""
+
+class ScrollController:
+    def __init__(self, adaptive=ADAPTIVE_SCROLL, min_distance=SCROLL_MIN_DISTANCE, max_distance=SCROLL_MAX_DISTANCE,
+                 max_wait=SCROLL_MAX_WAIT, min_pause=SCROLL_MIN_PAUSE, end_after=SCROLL_END_AFTER,
+                 end_reloads=SCROLL_END_RELOADS):
+        self.adaptive = adaptive
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.max_wait = max_wait
+        self.min_pause = min_pause
+        self.end_after = end_after
+        self.end_reloads = end_reloads
+
+        self.distance = min(max_distance, max(min_distance, 8000))
+        self.latency = 1.0 # moving average of seconds from wheel to new content
+        self.height = None
+        self.scrolled_at = None
+        self.pause = 0.0
+        self.arrived = False
+        self.bottom_streak = 0
+        self.end_reloaded = 0 # reloads at the apparent end since tweets last came
+        self.began = time.monotonic()
+        self.stats = {"scrolls": 0, "empty": 0, "timeouts": 0, "reloads": 0, "tweets": 0, "wait_seconds": 0.0}
+
+    @property
+    def wait_cap(self):
+        return min(self.max_wait, max(1.5, 3 * self.latency))
+
+    def scroll(self, page) -> float:
+        if self.adaptive:
+            self.height = page.evaluate(HEIGHT_JS)
+            distance = self.distance * random.uniform(0.9, 1.1)
+            self.pause = random.uniform(self.min_pause, 2 * self.min_pause)
+        else:
+            distance = random.randint(8000, 18000) + random.gauss(500, 200)
+            self.pause = max(0, random.uniform(0.9, 1.7) + random.gauss(0.5, 0.2))
+        page.mouse.wheel(0, distance)
+        self.scrolled_at = time.monotonic()
+        self.stats["scrolls"] += 1
+        return distance
+
+    def wait(self, page) -> bool:
+        """Wait until the last scroll brought new content or the cap ran out, return whether it did"""
+        if self.adaptive:
+            from patchright.sync_api import TimeoutError as PlaywrightTimeoutError
+            remaining = self.scrolled_at + self.wait_cap - time.monotonic()
+            try:
+                # a zero timeout means no timeout to Playwright
+                page.wait_for_function(NEW_CONTENT_JS, arg=self.height, timeout=max(1, remaining * 1000))
+                self.arrived = True
+            except PlaywrightTimeoutError:
+                self.arrived = False
+                self.stats["timeouts"] += 1
+            self.latency = 0.7 * self.latency + 0.3 * (time.monotonic() - self.scrolled_at)
+        else:
+            self.arrived = True
+        time.sleep(max(0, self.scrolled_at + self.pause - time.monotonic()))
+        self.stats["wait_seconds"] += time.monotonic() - self.scrolled_at
+        return self.arrived
+
+    def record(self, page, new_tweets: int, reload=None) -> bool:
+        """Tune the distance from the last scroll's yield, return True once the results have run out
+
+        `reload` reloads the page at the apparent end, page.reload by default.
+        """
+        self.stats["tweets"] += new_tweets
+        if new_tweets:
+            self.bottom_streak = 0
+            self.end_reloaded = 0
+            self.distance = min(self.max_distance, self.distance * 1.2)
+            return False
+        self.stats["empty"] += 1
+        if not self.adaptive:
+            return False
+        if not self.arrived:
+            self.distance = max(self.min_distance, self.distance * 0.6)
+        at_end = not self.arrived and page.evaluate(AT_BOTTOM_JS)
+        self.bottom_streak = self.bottom_streak + 1 if at_end else 0
+        if self.bottom_streak < self.end_after:
+            return False
+        if self.end_reloaded < self.end_reloads:
+            self.end_reloaded += 1
+            self.stats["reloads"] += 1
+            self.bottom_streak = 0
+            (reload or page.reload)()
+            return False
+        return True
+
+    def summary(self) -> str:
+        stats = self.stats
+        scrolls = max(1, stats["scrolls"])
+        seconds = max(1e-9, time.monotonic() - self.began)
+        return (
+            f"{stats['scrolls']} scrolls ({stats['empty']} empty, {stats['timeouts']} timed out, "
+            f"{stats['reloads']} reloads at the end), "
+            f"{stats['tweets'] / scrolls:.1f} tweets/scroll, {stats['tweets'] / seconds:.2f} tweets/s, "
+            f"{stats['wait_seconds'] / scrolls:.2f}s avg wait"
+        )
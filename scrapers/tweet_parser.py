@@ -0,0 +1,124 @@
+"""Single-pass tweet extraction from timeline HTML.
+
+Every backend returns the same compact records as `drain_new_articles` in
+scrapers/twitter.py, so filtering and `tweet_from_record` work on either:
+
+    {"id", "url", "text", "span_text", "created_at", "username"}
+
+`text` follows extract_tweet_data (children of the tweetText div) and
+`span_text` follows should_keep_tweet (every span inside it).
+"""
+import re
+from urllib.parse import urljoin
+
+STATUS_RE = re.compile(r'/status/')
+
+def tweet_id_and_url_from_href(href):
+    tweet_id = href.split('/')[-1] if href else None
+    url = urljoin("https://x.com", href) if href else None
+    return tweet_id, url
+
+def make_record(href, created_at, text, span_text, username):
+    tweet_id, url = tweet_id_and_url_from_href(href)
+    return {
+        "id": tweet_id,
+        "url": url,
+        "text": text,
+        "span_text": span_text,
+        "created_at": created_at,
+        "username": username.strip('@') if username is not None else None,
+    }
+
+def _bs4_article_record(article):
+    link = time_tag = text_div = name_div = None
+    for el in article.find_all(True):
+        if link is None and el.name == "a" and STATUS_RE.search(el.get("href", "")):
+            link = el
+        elif time_tag is None and el.name == "time":
+            time_tag = el
+        elif el.name == "div":
+            testid = el.get("data-testid")
+            if text_div is None and testid == "tweetText":
+                text_div = el
+            elif name_div is None and testid == "User-Name":
+                name_div = el
+
+    text = span_text = username = None
+    if text_div is not None:
+        text = ' '.join(child.text for child in text_div)
+        span_text = ' '.join(span.text for span in text_div.find_all("span"))
+    if name_div is not None:
+        name_link = name_div.find("a", href=re.compile(r'^/'))
+        username = name_link.text if name_link else None
+
+    return make_record(
+        link["href"] if link else None,
+        time_tag.get("datetime") if time_tag else None,
+        text,
+        span_text,
+        username,
+    )
+
+def parse_bs4(html):
+    """Reference backend on the pure-Python html.parser"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return [_bs4_article_record(article) for article in soup.find_all('article')]
+
+def _lxml_children_text(div):
+    # same pieces, in the same order, as iterating a bs4 Tag's contents
+    parts = [div.text] if div.text else []
+    for child in div:
+        if isinstance(child.tag, str):
+            parts.append(child.text_content())
+        if child.tail:
+            parts.append(child.tail)
+    return ' '.join(parts)
+
+def _lxml_article_record(article):
+    link = time_tag = text_div = name_div = None
+    for el in article.iter("a", "time", "div"):
+        if el.tag == "a":
+            if link is None and '/status/' in el.get("href", ""):
+                link = el
+        elif el.tag == "time":
+            if time_tag is None:
+                time_tag = el
+        else:
+            testid = el.get("data-testid")
+            if text_div is None and testid == "tweetText":
+                text_div = el
+            elif name_div is None and testid == "User-Name":
+                name_div = el
+
+    text = span_text = username = None
+    if text_div is not None:
+        text = _lxml_children_text(text_div)
+        span_text = ' '.join(span.text_content() for span in text_div.iter("span"))
+    if name_div is not None:
+        name_link = next((a for a in name_div.iter("a") if a.get("href", "").startswith('/')), None)
+        username = name_link.text_content() if name_link is not None else None
+
+    return make_record(
+        link.get("href") if link is not None else None,
+        time_tag.get("datetime") if time_tag is not None else None,
+        text,
+        span_text,
+        username,
+    )
+
+def parse_lxml(html):
+    """C-backed libxml2 parser, several times faster than html.parser"""
+    import lxml.html
+    root = lxml.html.fromstring(html)
+    return [_lxml_article_record(article) for article in root.iter("article")]
+
+PARSERS = {
+    "bs4": parse_bs4,
+    "lxml": parse_lxml,
+}
+
+def get_parser(name):
+    if name not in PARSERS:
+        raise ValueError(f"Unknown tweet parser: {name} (available: {', '.join(PARSERS)})")
+    return PARSERS[name]
@@ -1,13 +1,25 @@
-from patchright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 import re
-import random
 import time
-from config import COOKIES, CHROME_ARGS, TWITTER_SESSION, CHECKPOINT_INTERVAL
-from urllib.parse import urljoin
+from collections import Counter
+from contextlib import contextmanager
+from config import TWITTER_SESSION, TWITTER_HEADLESS, LEAN_BROWSER, CHECKPOINT_INTERVAL, CHECKPOINT_COMPACT_INTERVAL, INCREMENTAL_EXTRACTION, TWEET_PARSER, SKIP_KNOWN_ITEMS
+from config import TWITTER_SEARCH_URL, TWITTER_TABS, TWITTER_PAGES, TWITTER_PAGE_MAX_HEAP_MB, ADAPTIVE_SCROLL
 import uuid
-from utils import is_valid_text, is_english, contains_keyword, save_checkpoint, load_checkpoint, remove_checkpoint, SESSION_DIR
-from logger import setup_logger
+from urllib.parse import quote
+from scrapers.tweet_parser import get_parser, make_record, tweet_id_and_url_from_href
+from scrapers.browser import launch_browser, watch_resources
+from scrapers.scroll import ScrollController
+from utils import is_valid_text, is_english, match_keywords, save_checkpoint, append_checkpoint, load_checkpoint, remove_checkpoint, current_session_dir
+from logger import setup_logger, item_events
+from metrics import stage, count
+from seen_index import SeenIndex
+
+def keep_text(text, keyword):
+    """Every keyword the text contains if it is kept for `keyword`, else None"""
+    keywords = match_keywords(text, keyword)
+    if keyword in keywords and is_valid_text(text) and is_english(text):
+        return keywords
+    return None
 
 def should_keep_tweet(tweet_element, keyword):
     text_div = tweet_element.find("div", {"data-testid": "tweetText"})
@@ -15,17 +27,11 @@ def should_keep_tweet(tweet_element, keyword):
         return False
         
     tweet_text = ' '.join([span.text for span in text_div.find_all("span")])
-    return (
-        contains_keyword(tweet_text, keyword) and
-        is_valid_text(tweet_text) and
-        is_english(tweet_text)
-    )
+    return keep_text(tweet_text, keyword) is not None
 
 def get_tweet_id_and_url(tweet_element):
     link = tweet_element.find("a", {"href": re.compile(r'/status/')})
-    tweet_id = link["href"].split('/')[-1] if link else None
-    url = urljoin("https://x.com", link["href"]) if link else None
-    return tweet_id, url
+    return tweet_id_and_url_from_href(link["href"] if link else None)
 
 def extract_tweet_data(article):
     tweet_id, url = get_tweet_id_and_url(article)
@@ -51,112 +57,423 @@ def extract_tweet_data(article):
         "username": username,
     }
 
-def scrape_tweets(keyword, target_count):
-    logger = setup_logger("twitter", SESSION_DIR)
+# Watches the timeline for <article> nodes added since the last drain, so each
+# scroll only pays for the tweets it actually loaded. Safe to run again after a
+# reload - the flag lives on the window, which a reload replaces.
+ARTICLE_OBSERVER_JS = """
+() => {
+    if (window.__articleObserver) return;
+    window.__seenArticles = new WeakSet();
+    window.__pendingArticles = [];
+    const push = (article) => {
+        if (window.__seenArticles.has(article)) return;
+        window.__seenArticles.add(article);
+        window.__pendingArticles.push(article);
+    };
+    document.querySelectorAll('article').forEach(push);
+    window.__articleObserver = new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                if (node.tagName === 'ARTICLE') push(node);
+                else node.querySelectorAll('article').forEach(push);
+            }
+        }
+    });
+    window.__articleObserver.observe(document.body, {childList: true, subtree: true});
+}
+"""
+
+# Mirrors extract_tweet_data/should_keep_tweet field by field. An article
+# without a status link is looked at again on the next UNLINKED_DRAINS drains,
+# in case it was still rendering, then dropped: ads, "who to follow" cells and
+# tombstones never get one. They wait apart from __pendingArticles, which the
+# scroll controller reads as "new content arrived".
+UNLINKED_DRAINS = 2
+DRAIN_ARTICLES_JS = """
+(retries) => {
+    const pending = (window.__unlinkedArticles || [])
+        .concat((window.__pendingArticles || []).map((article) => [article, 0]));
+    window.__pendingArticles = [];
+    window.__unlinkedArticles = [];
+    const records = [];
+    for (const [article, tries] of pending) {
+        const link = Array.from(article.querySelectorAll('a[href]'))
+            .find((a) => a.getAttribute('href').includes('/status/'));
+        if (!link) {
+            if (article.isConnected && tries < retries) window.__unlinkedArticles.push([article, tries + 1]);
+            continue;
+        }
+        const timeTag = article.querySelector('time');
+        const textDiv = article.querySelector('div[data-testid="tweetText"]');
+        const nameDiv = article.querySelector('div[data-testid="User-Name"]');
+        const nameLink = nameDiv && Array.from(nameDiv.querySelectorAll('a[href]'))
+            .find((a) => a.getAttribute('href').startsWith('/'));
+        records.push({
+            href: link.getAttribute('href'),
+            created_at: timeTag ? timeTag.getAttribute('datetime') : null,
+            text: textDiv ? Array.from(textDiv.childNodes)
+                .filter((n) => n.nodeType === Node.ELEMENT_NODE || n.nodeType === Node.TEXT_NODE)
+                .map((n) => n.textContent).join(' ') : null,
+            span_text: textDiv ? Array.from(textDiv.querySelectorAll('span'))
+                .map((span) => span.textContent).join(' ') : null,
+            username: nameLink ? nameLink.textContent : null,
+        });
+    }
+    return records;
+}
+"""
+
+PAGE_HEAP_JS = "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+
+def install_article_observer(page):
+    page.evaluate(ARTICLE_OBSERVER_JS)
+
+def drain_new_articles(page):
+    """Return compact records for articles added to the page since the last call"""
+    return [
+        make_record(raw["href"], raw["created_at"], raw["text"], raw["span_text"], raw["username"])
+        for raw in page.evaluate(DRAIN_ARTICLES_JS, UNLINKED_DRAINS)
+    ]
+
+def should_keep_record(record, keyword):
+    """keep_text for an already extracted record"""
+    if record["span_text"] is None:
+        return None
+    return keep_text(record["span_text"], keyword)
+
+def tweet_from_record(record):
+    """Same output as extract_tweet_data for an already extracted record"""
+    return {
+        "uuid": str(uuid.uuid4()),
+        "id": record["id"],
+        "text": record["text"] or "",
+        "url": record["url"],
+        "created_at": record["created_at"],
+        "username": record["username"],
+    }
+
+def collect_records(records, keyword, seen_ids, logger, index=None):
+    """Filter extracted records and return tweets not in seen_ids or, if given, the cross-session index"""
+    with stage("twitter.filter", len(records)):
+        known = index.known("twitter", keyword, [r["id"] for r in records if r["id"]]) if index else set()
+        skipped = Counter()
+        new_results = []
+        for record in records:
+            tweet_id = record["id"]
+            if not tweet_id:
+                skipped["missing_id"] += 1
+                continue
+
+            if tweet_id in seen_ids:
+                skipped["duplicate"] += 1
+                continue
+
+            if tweet_id in known:
+                skipped["earlier_session"] += 1
+                continue
+
+            keywords = should_keep_record(record, keyword)
+            if keywords is None:
+                skipped["invalid"] += 1
+                continue
+
+            seen_ids.add(tweet_id)
+            tweet = tweet_from_record(record)
+            tweet["keywords"] = keywords
+            new_results.append(tweet)
+
+    events = item_events(logger)
+    for reason, n in skipped.items():
+        events.count(f"tweets skipped ({reason})", n)
+        count("items_rejected", n, platform="twitter", reason=reason)
+    events.count("tweets collected", len(new_results))
+    count("items_collected", len(new_results), platform="twitter")
+    return new_results
+
+def collect_full(page, keyword, seen_ids, logger, index=None, parser=TWEET_PARSER):
+    """Re-parse the whole page and return tweets not in seen_ids"""
+    with stage("twitter.page_content"):
+        html = page.content()
+    with stage("twitter.parse") as timer:
+        records = get_parser(parser)(html)
+        timer.items = len(records)
+    logger.debug(f"Found {len(records)} articles in current view")
+    return collect_records(records, keyword, seen_ids, logger, index)
+
+def collect_incremental(page, keyword, seen_ids, logger, index=None):
+    """Look only at articles added since the previous call and return tweets not in seen_ids"""
+    with stage("twitter.drain") as timer:
+        records = drain_new_articles(page)
+        timer.items = len(records)
+    logger.debug(f"Found {len(records)} new articles since last scroll")
+    return collect_records(records, keyword, seen_ids, logger, index)
+
+class KeywordCollection:
+    """Tweets collected for one keyword, shared by every tab scraping it, with its checkpoint"""
+    def __init__(self, keyword, target_count, logger, index=None, on_items=None):
+        self.keyword = keyword
+        self.target_count = target_count
+        self.logger = logger
+        self.index = index
+        self.on_items = on_items
+        self.results, self.seen_ids = load_checkpoint(keyword, "twitter")
+        self.journaled = self.compacted = len(self.results)
+        if on_items and self.results:
+            on_items(self.results[:target_count])
+        if self.results:
+            logger.info(f"Loaded {len(self.results)} existing tweets for {keyword} from checkpoint")
+
+    @property
+    def complete(self):
+        return len(self.results) >= self.target_count
+
+    def add(self, new_results):
+        if self.on_items:
+            self.on_items(new_results[:max(0, self.target_count - len(self.results))])
+        self.results.extend(new_results)
+        self.logger.info(f"Added {len(new_results)} tweets for {self.keyword} (Total: {len(self.results)})")
+
+        if len(self.results) - self.journaled >= CHECKPOINT_INTERVAL:
+            new_items = self.results[self.journaled:]
+            append_checkpoint(self.keyword, "twitter", new_items, [t["id"] for t in new_items])
+            self.journaled = len(self.results)
+
+        if len(self.results) - self.compacted >= CHECKPOINT_COMPACT_INTERVAL:
+            save_checkpoint(self.keyword, "twitter", self.results, self.seen_ids)
+            self.journaled = self.compacted = len(self.results)
+            self.logger.info(f"Checkpoint compacted at {len(self.results)} tweets")
+
+    def finish(self):
+        """Remove the checkpoint when complete, otherwise journal what is left; return the results"""
+        if self.complete:
+            remove_checkpoint(self.keyword, "twitter")
+            self.logger.info(f"Checkpoint removed - collection complete for {self.keyword}")
+        else:
+            new_items = self.results[self.journaled:]
+            append_checkpoint(self.keyword, "twitter", new_items, [t["id"] for t in new_items])
+            self.journaled = len(self.results)
+        return self.results[:self.target_count]
+
+class TimelineJob:
+    """One search tab (live or top) of one keyword, scrolled on its own page"""
+    max_empty = 15
+    max_refreshes = 5
+
+    def __init__(self, page, collection, tab="live", incremental=INCREMENTAL_EXTRACTION, skip_known=SKIP_KNOWN_ITEMS,
+                 search_url=TWITTER_SEARCH_URL, adaptive=ADAPTIVE_SCROLL):
+        self.page = page
+        self.collection = collection
+        self.tab = tab
+        self.incremental = incremental
+        self.skip_known = skip_known
+        self.search_url = search_url
+        self.collect = collect_incremental if incremental else collect_full
+        self.consecutive_empty = 0
+        self.refresh_count = 0
+        self.gave_up = False
+        self.exhausted = False
+        self.scroller = ScrollController(adaptive)
+
+    @property
+    def done(self):
+        return self.gave_up or self.exhausted or self.collection.complete
+
+    def open(self):
+        self.page.goto(self.search_url.format(keyword=quote(self.collection.keyword), tab=self.tab))
+        if self.incremental:
+            install_article_observer(self.page)
+
+    def reload(self):
+        self.page.reload()
+        if self.incremental:
+            install_article_observer(self.page)
+
+    def scroll(self):
+        scroll_dist = self.scroller.scroll(self.page)
+        self.collection.logger.debug(f"Scrolled {self.collection.keyword}/{self.tab} {scroll_dist:.0f}px")
+
+    def wait(self):
+        with stage("twitter.scroll_wait"):
+            self.scroller.wait(self.page)
+
+    def collect_new(self):
+        """Collect what the last scroll loaded, refreshing the page after too many empty scrolls"""
+        collection = self.collection
+        logger = collection.logger
+        try:
+            index = collection.index if self.skip_known else None
+            new_results = self.collect(self.page, collection.keyword, collection.seen_ids, logger, index)
+
+            if new_results:
+                collection.add(new_results)
+                self.consecutive_empty = 0
+            else:
+                self.consecutive_empty += 1
+                logger.warning(f"Empty batch for {collection.keyword}/{self.tab} ({self.consecutive_empty}/{self.max_empty})")
+            if self.scroller.record(self.page, len(new_results), self.reload):
+                logger.info(f"Reached the end of the results for {collection.keyword}/{self.tab}")
+                self.exhausted = True
+                return
+
+        except Exception as e:
+            logger.error(f"Content processing failed: {str(e)}")
+
+        # handle page refreshing
+        if self.consecutive_empty >= self.max_empty:
+            if self.refresh_count < self.max_refreshes:
+                self.refresh_count += 1
+                logger.warning(f"Attempting refresh ({self.refresh_count}/{self.max_refreshes})")
+                self.reload()
+                time.sleep(3)
+                self.consecutive_empty = 0
+            else:
+                logger.error("Max refresh attempts reached")
+                self.gave_up = True
+
+def scrape_tweets(keyword, target_count, incremental=INCREMENTAL_EXTRACTION, skip_known=SKIP_KNOWN_ITEMS,
+                  on_items=None, search_url=TWITTER_SEARCH_URL, user_data_dir=TWITTER_SESSION, headless=TWITTER_HEADLESS,
+                  lean=LEAN_BROWSER, adaptive=ADAPTIVE_SCROLL):
+    """Collect up to `target_count` tweets, passing each batch of accepted ones to `on_items` as it comes
+
+    With `lean`, images, media, fonts and analytics requests are not loaded.
+    """
+    logger = setup_logger("twitter", current_session_dir())
     logger.info(f"\n{'='*50}")
     logger.info(f"Starting Twitter scrape for: {keyword}")
     logger.info(f"Target count: {target_count}")
     logger.info(f"{'='*50}\n")
 
     # load existing progress if any
-    results, seen_ids = load_checkpoint(keyword, "twitter")
-    if len(results) >= target_count:
-        logger.info(f"Loaded {len(results)} existing tweets from checkpoint")
-        return results[:target_count]
+    index = SeenIndex()
+    collection = KeywordCollection(keyword, target_count, logger, index, on_items)
+    if collection.complete:
+        index.close()
+        return collection.results[:target_count]
 
+    from patchright.sync_api import sync_playwright # only browser runs pay for loading it
     with sync_playwright() as p:
-        browser = p.chromium.launch_persistent_context(
-            user_data_dir=TWITTER_SESSION,
-            headless=False,
-            args=CHROME_ARGS,
-        )
-        browser.add_cookies(COOKIES)
-        page = browser.new_page()
-        page.goto(f"https://x.com/search?q={keyword}&f=live")
-        
+        browser = launch_browser(p, user_data_dir, headless)
+        resources = watch_resources(browser, lean)
+        job = TimelineJob(browser.new_page(), collection, "live", incremental, skip_known, search_url, adaptive)
         try:
-            consecutive_empty = 0
-            max_empty = 15
-            refresh_count = 0
-            max_refreshes = 5
-            
-            while len(results) < target_count and refresh_count <= max_refreshes:
-                scroll_dist = random.randint(8000, 18000) + random.gauss(500, 200)
-                page.mouse.wheel(0, scroll_dist)
-                sleep_time = random.uniform(0.9, 1.7) + random.gauss(0.5, 0.2)
-                logger.debug(f"Scrolled {scroll_dist}px, sleeping {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                
-                try:
-                    html = page.content()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    articles = soup.find_all('article')
-                    logger.debug(f"Found {len(articles)} articles in current view")
-
-                    new_results = []
-                    for article in articles:
-                        tweet_id, _ = get_tweet_id_and_url(article)
-                        if not tweet_id:
-                            logger.debug("Article missing tweet ID")
-                            continue
-                            
-                        if tweet_id in seen_ids:
-                            logger.debug(f"Skipping duplicate tweet: {tweet_id}")
-                            continue
-                        
-                        if not should_keep_tweet(article, keyword):
-                            logger.debug(f"Rejected tweet {tweet_id} - validation failed")
-                            continue
-                        
-                        tweet_data = extract_tweet_data(article)
-                        seen_ids.add(tweet_id)
-                        new_results.append(tweet_data)
-                        logger.debug(f"Collected tweet: {tweet_id}")
-
-                    if new_results:
-                        results.extend(new_results)
-                        consecutive_empty = 0
-                        logger.info(f"Added {len(new_results)} tweets (Total: {len(results)})")
-                        
-                        if len(results) % CHECKPOINT_INTERVAL == 0:
-                            save_checkpoint(keyword, "twitter", results, seen_ids)
-                            logger.info(f"Checkpoint saved at {len(results)} tweets")
-                    else:
-                        consecutive_empty += 1
-                        logger.warning(f"Empty batch ({consecutive_empty}/{max_empty})")
-
-                except Exception as e:
-                    logger.error(f"Content processing failed: {str(e)}")
-
-                # handle page refreshing
-                if consecutive_empty >= max_empty:
-                    if refresh_count < max_refreshes:
-                        refresh_count += 1
-                        logger.warning(f"Attempting refresh ({refresh_count}/{max_refreshes})")
-                        page.reload()
-                        time.sleep(3)
-                        consecutive_empty = 0
-                    else:
-                        logger.error("Max refresh attempts reached")
-                        break
-
-            if len(results) >= target_count:
-                logger.info(f"Successfully collected {len(results)} tweets")
+            job.open()
+            while not job.done:
+                job.scroll()
+                job.wait()
+                job.collect_new()
+
+            if collection.complete:
+                logger.info(f"Successfully collected {len(collection.results)} tweets")
             else:
-                logger.warning(f"Stopped early at {len(results)} tweets")
+                logger.warning(f"Stopped early at {len(collection.results)} tweets")
 
         except Exception as e:
             logger.error(f"Scraping failed: {str(e)}")
 
         finally:
-            save_checkpoint(keyword, "twitter", results, seen_ids)
+            results = collection.finish()
+            item_events(logger).flush()
+            logger.info(f"Scrolling for {keyword}: {job.scroller.summary()}")
+            logger.info(f"Browser traffic for {keyword}: {resources.summary()}")
+            index.close()
             browser.close()
 
-        if len(results) >= target_count:
-            remove_checkpoint(keyword, "twitter")
-            logger.info("Checkpoint removed - collection complete")
+        return results
+
+def page_heap_mb(page) -> float:
+    return page.evaluate(PAGE_HEAP_JS) / 2**20
+
+@contextmanager
+def job_errors(job):
+    """End only this job when its page fails (a crashed tab, a navigation timeout), not the whole scrape"""
+    try:
+        yield
+    except Exception as e:
+        job.collection.logger.error(f"Dropping {job.collection.keyword}/{job.tab} page: {str(e)}")
+        count("twitter_page_failures")
+        job.gave_up = True
+
+def scrape_tweets_many(keywords, target_count, tabs=TWITTER_TABS, pages=TWITTER_PAGES, incremental=INCREMENTAL_EXTRACTION,
+                       skip_known=SKIP_KNOWN_ITEMS, on_items=None, search_url=TWITTER_SEARCH_URL,
+                       user_data_dir=TWITTER_SESSION, headless=TWITTER_HEADLESS, lean=LEAN_BROWSER,
+                       adaptive=ADAPTIVE_SCROLL, max_heap_mb=TWITTER_PAGE_MAX_HEAP_MB):
+    """Scrape several keywords in one browser, up to `pages` search tabs open at a time
+
+    Every (keyword, tab) pair gets its own page; tabs of the same keyword add
+    to one collection and checkpoint. Each round scrolls every open page,
+    waits once, then collects from each, so the wait for content to load is
+    shared instead of paid per keyword. Playwright's sync API is bound to one
+    thread, so the pages are driven in turn rather than from a thread pool.
+    A page whose JS heap grows past `max_heap_mb` is reloaded.
+
+    `on_items(keyword, items)` gets accepted tweets as they come. Returns
+    keyword -> tweets.
+    """
+    logger = setup_logger("twitter", current_session_dir())
+    logger.info(f"Starting Twitter scrape for {len(keywords)} keywords on up to {pages} pages")
+    index = SeenIndex()
+    collections = {
+        keyword: KeywordCollection(
+            keyword, target_count, logger, index,
+            (lambda items, keyword=keyword: on_items(keyword, items)) if on_items else None,
+        )
+        for keyword in keywords
+    }
+    queued = [(collections[keyword], tab) for keyword in keywords for tab in tabs]
+
+    from patchright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        browser = launch_browser(p, user_data_dir, headless)
+        resources = watch_resources(browser, lean)
+        active = []
+        try:
+            while queued or active:
+                # fill free pages with the next (keyword, tab) that still needs tweets
+                while queued and len(active) < pages:
+                    collection, tab = queued.pop(0)
+                    if collection.complete:
+                        continue
+                    job = TimelineJob(browser.new_page(), collection, tab, incremental, skip_known, search_url, adaptive)
+                    active.append(job)
+                    with job_errors(job):
+                        job.open()
+                if not active:
+                    break
+
+                for job in active:
+                    if not job.done:
+                        with job_errors(job):
+                            job.scroll()
+                for job in active:
+                    if job.done:
+                        continue
+                    with job_errors(job):
+                        job.wait()
+                        job.collect_new()
+                        if not job.done and max_heap_mb and page_heap_mb(job.page) > max_heap_mb:
+                            logger.info(f"Reloading {job.collection.keyword}/{job.tab} page over {max_heap_mb} MB of heap")
+                            job.reload()
+
+                for job in [job for job in active if job.done]:
+                    logger.info(f"Scrolling for {job.collection.keyword}/{job.tab}: {job.scroller.summary()}")
+                    with job_errors(job):
+                        job.page.close()
+                    active.remove(job)
+
+        except Exception as e:
+            logger.error(f"Scraping failed: {str(e)}")
+
+        finally:
+            results = {keyword: collection.finish() for keyword, collection in collections.items()}
+            item_events(logger).flush()
+            for keyword, tweets in results.items():
+                logger.info(f"Finished {keyword}: {len(tweets)}/{target_count} tweets")
+            logger.info(f"Browser traffic: {resources.summary()}")
+            index.close()
+            browser.close()
 
-        return results[:target_count]
+        return results
 
 if __name__ == "__main__":
     keyword = "slay"
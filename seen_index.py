@@ -0,0 +1,63 @@
+"""Ids collected in any earlier session, per platform and keyword, in one SQLite file.
+
+Keyed by keyword as well so a post collected for one keyword is still
+collected for another keyword it mentions. Only the ids of saved items go
+in, added by the orchestrator once save_data has written them: a post
+rejected once is judged again when it comes back, and a job whose save
+failed collects its posts again.
+
+The ids live in a WITHOUT ROWID b-tree on disk, so lookups stay fast at tens
+of millions of ids while memory is capped by the page cache size:
+benchmarks/bench_seen_index.py measures under a millisecond per page of 100
+ids at 30 million ids.
+"""
+import sqlite3
+from pathlib import Path
+from config import SEEN_INDEX_PATH, SQLITE_LOOKUP_CHUNK
+
+CACHE_KB = 64 * 1024
+
+class SeenIndex:
+    def __init__(self, path=SEEN_INDEX_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL") # concurrent scrape jobs share the file
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " platform TEXT NOT NULL,"
+            " keyword TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " PRIMARY KEY (platform, keyword, id)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def known(self, platform, keyword, ids):
+        """The subset of `ids` already in the index"""
+        ids = list(ids)
+        found = set()
+        for i in range(0, len(ids), SQLITE_LOOKUP_CHUNK):
+            chunk = ids[i:i + SQLITE_LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT id FROM seen WHERE platform = ? AND keyword = ? AND id IN ({','.join('?' * len(chunk))})",
+                [platform, keyword, *chunk],
+            )
+            found.update(row[0] for row in rows)
+        return found
+
+    def add(self, platform, keyword, ids):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen (platform, keyword, id) VALUES (?, ?, ?)",
+                ((platform, keyword, item_id) for item_id in ids),
+            )
+
+    def count(self, platform, keyword):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM seen WHERE platform = ? AND keyword = ?", (platform, keyword)
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,184 @@
+"""Session records on disk, as JSON or as Parquet.
+
+STORAGE_FORMAT picks what new raw and classified files are written as;
+readers go by the file suffix, so sessions in either format can be read.
+Parquet is columnar and compressed: smaller, faster to write, and queries
+that need a few columns only read those. It needs pyarrow, which is not in
+requirements.txt and is imported the first time a Parquet file is touched.
+
+A Parquet file's schema is fixed by its first row group, with columns that
+are all null there (or lists of nothing but nulls) typed as strings. A later
+record with a key the schema lacks, or a value the column cannot hold,
+raises rather than being written without it.
+"""
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from config import STORAGE_FORMAT
+
+SUFFIXES = {"json": ".json", "parquet": ".parquet"}
+READ_CHUNK = 1 << 16
+ROW_GROUP_SIZE = 50_000
+SEPARATOR_RE = re.compile(r"[\s,]*")
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError('Parquet storage needs pyarrow: pip install pyarrow, or set STORAGE_FORMAT = "json"') from e
+    return pyarrow, pyarrow.parquet
+
+def _promote_nulls(pa, type_):
+    """`type_` with null, including the items of an all-empty list, replaced by string"""
+    if pa.types.is_null(type_):
+        return pa.string()
+    if pa.types.is_list(type_):
+        return pa.list_(_promote_nulls(pa, type_.value_type))
+    if pa.types.is_struct(type_):
+        return pa.struct([field.with_type(_promote_nulls(pa, field.type)) for field in type_])
+    return type_
+
+def iter_json_array(path: Path, chunk_size: int = READ_CHUNK):
+    """Yield the elements of a file holding one JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not hold a JSON array")
+        pos = 1
+        while True:
+            pos = SEPARATOR_RE.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the element runs past the buffer, read more and try again
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield element
+            pos = end
+
+def iter_records(path: Path, columns=None):
+    """Yield the records of a .json array, .jsonl or .parquet file
+
+    `columns` limits Parquet reads to those columns; JSON records are whole.
+    """
+    if path.suffix == ".parquet":
+        _, pq = _arrow()
+        parquet = pq.ParquetFile(path)
+        if parquet.metadata.num_rows == 0:
+            return
+        if columns is not None:
+            # a column that is not in this file (subreddit for twitter) is left out rather than an error
+            columns = [column for column in columns if column in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=ROW_GROUP_SIZE, columns=columns):
+            yield from batch.to_pylist()
+    elif path.suffix == ".jsonl":
+        with open(path, encoding="utf8") as f:
+            yield from map(json.loads, f)
+    else:
+        yield from iter_json_array(path)
+
+def write_records(path: Path, records, fmt: str = STORAGE_FORMAT) -> Path:
+    """Write `records` to `path` with the format's suffix and return the path written"""
+    with RecordWriter(path, fmt) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.path
+
+class RecordWriter:
+    """Appends records one at a time: a pretty-printed JSON array, JSON lines, or Parquet row groups"""
+    def __init__(self, path: Path, fmt: str = STORAGE_FORMAT, lines: bool = False):
+        if fmt not in SUFFIXES:
+            raise ValueError(f"Unknown storage format: {fmt}")
+        self.fmt = fmt
+        self.lines = lines
+        self.path = path.with_suffix(".jsonl" if fmt == "json" and lines else SUFFIXES[fmt])
+        self.count = 0
+        self._rows = []
+        self._schema = None
+        self._parquet = None
+        if fmt == "json":
+            self._file = open(self.path, "w", encoding="utf-8")
+            if not lines:
+                self._file.write("[")
+        else:
+            _arrow()
+
+    def write(self, record: dict):
+        if self.fmt == "parquet":
+            self._rows.append(record)
+            if len(self._rows) >= ROW_GROUP_SIZE:
+                self._flush()
+        elif self.lines:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            item = json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            self._file.write(("," if self.count else "") + "\n  " + item)
+        self.count += 1
+
+    def _flush(self):
+        pa, pq = _arrow()
+        rows, self._rows = self._rows, []
+        if self._schema is None:
+            inferred = pa.Table.from_pylist(rows).schema
+            self._schema = pa.schema([field.with_type(_promote_nulls(pa, field.type)) for field in inferred])
+            self._parquet = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+        else:
+            # from_pylist with a schema leaves out keys the schema lacks, so they are caught here
+            added = {key for row in rows for key in row} - set(self._schema.names)
+            if added:
+                raise ValueError(f"{self.path} records gained columns {sorted(added)} after its first row group")
+        try:
+            table = pa.Table.from_pylist(rows, schema=self._schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"{self.path} records no longer fit its schema: {e}") from e
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self.fmt == "parquet":
+            try:
+                if self._rows:
+                    self._flush()
+                elif self._parquet is None:
+                    pa, pq = _arrow()
+                    pq.write_table(pa.table({}), self.path)
+            finally:
+                if self._parquet is not None:
+                    self._parquet.close()
+        else:
+            if not self.lines:
+                self._file.write("\n]" if self.count else "]")
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def count_by(paths, columns) -> Counter:
+    """Count records per combination of `columns` over the files
+
+    Parquet files are grouped with Arrow, reading only those columns; JSON
+    files are counted record by record.
+    """
+    counts = Counter()
+    for path in paths:
+        if path.suffix == ".parquet":
+            _, pq = _arrow()
+            if pq.ParquetFile(path).metadata.num_rows == 0:
+                continue
+            table = pq.read_table(path, columns=list(columns))
+            grouped = table.group_by(list(columns)).aggregate([([], "count_all")])
+            for row in grouped.to_pylist():
+                counts[tuple(row[column] for column in columns)] += row["count_all"]
+        else:
+            counts.update(tuple(record.get(column) for column in columns) for record in iter_records(path))
+    return counts
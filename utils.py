@@ -1,55 +1,129 @@
 import re
-from langdetect import detect, LangDetectException
 import json
 import os
-from config import CHECKPOINT_DIR, OUTPUT_DIR, AMOUNT, KEYWORDS
+from config import CHECKPOINT_DIR, OUTPUT_DIR, AMOUNT, KEYWORDS, STORAGE_FORMAT
 from datetime import datetime
+from language import is_english
+from storage import write_records
+from metrics import timed, stage
 
+# URLs, or runs of ASCII letters that stop right before a URL
+TEXT_TOKEN_RE = re.compile(r'(?P<url>http\S+)|(?:(?!http\S)[a-z])+', re.IGNORECASE)
+WORD_CHAR_RE = re.compile(r'\w')
+
+@timed("filter.is_valid_text", items=1)
 def is_valid_text(text: str) -> bool:
-    cleaned_text = re.sub(r'http\S+|\n|[^\w\s]', ' ', text, flags=re.IGNORECASE) # Remove URLs
-    words = re.findall(r'\b[a-z]+\b', cleaned_text, flags=re.IGNORECASE)
-    return len(words) > 1
-
-def is_english(text: str) -> bool:
-    try:
-        # Require at least 3 characters for reliable detection
-        if len(text.strip()) < 3:
-            return False
-        return detect(text) == 'en'
-    except LangDetectException:
+    """At least two standalone English-alphabet words outside of URLs, in one scan"""
+    words = 0
+    for match in TEXT_TOKEN_RE.finditer(text):
+        if match.group("url"):
+            continue
+        start, end = match.span()
+        if start > 0 and WORD_CHAR_RE.match(text, start - 1):
+            continue
+        # an ASCII letter right after the run can only start a URL, which counts as a break
+        if end < len(text) and WORD_CHAR_RE.match(text, end) and not (text[end].isascii() and text[end].isalpha()):
+            continue
+        words += 1
+        if words > 1:
+            return True
+    return False
+
+def _keyword_pattern(keywords):
+    # longest first so a keyword that prefixes another cannot shadow it
+    alternation = '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+
+KEYWORD_RE = _keyword_pattern(KEYWORDS)
+_extra_patterns = {}
+
+def match_keywords(text: str, keyword: str = None) -> list:
+    """Every keyword from KEYWORDS the text contains, in KEYWORDS order
+
+    `keyword`, the one being scraped, is added after them when the text
+    contains it and it is not in KEYWORDS, so any keyword can be scraped.
+    """
+    found = {match.lower() for match in KEYWORD_RE.findall(text)}
+    keywords = [k for k in KEYWORDS if k in found]
+    if keyword is not None and keyword not in KEYWORDS:
+        pattern = _extra_patterns.get(keyword)
+        if pattern is None:
+            pattern = _extra_patterns[keyword] = _keyword_pattern([keyword])
+        if pattern.search(text):
+            keywords.append(keyword)
+    return keywords
+
+def _checkpoint_files(keyword, platform):
+    """Compacted snapshot and the append-only journal written since it"""
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    return CHECKPOINT_DIR / f"{keyword}_{platform}.json", CHECKPOINT_DIR / f"{keyword}_{platform}.jsonl"
+
+def _replay_journal(journal, results, seen_ids):
+    """Apply journal entries on top of a snapshot. Returns False if nothing was replayed"""
+    if not os.path.exists(journal):
         return False
-    
-def contains_keyword(text: str, keyword: str) -> bool:
-    """Check if text contains the keyword"""
-    return re.search(rf'\b{re.escape(keyword)}\b', text, re.IGNORECASE) is not None
+    known = {item["id"] for item in results}
+    with open(journal, encoding="utf8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break # torn write from a crash, everything before it is intact
+            seen_ids.update(entry["seen_ids"])
+            for item in entry["results"]:
+                # entries already folded into the snapshot by an interrupted compaction
+                if item["id"] not in known:
+                    known.add(item["id"])
+                    results.append(item)
+    return True
 
 def load_checkpoint(keyword, platform):
-    """Load existing progress from checkpoint file"""
-    file = CHECKPOINT_DIR / f"{keyword}_{platform}.json"
-    if os.path.exists(file):
-        with open(file, 'r') as f:
+    """Load existing progress from the checkpoint snapshot and journal"""
+    snapshot, journal = _checkpoint_files(keyword, platform)
+    results, seen_ids = [], set()
+    if os.path.exists(snapshot):
+        with open(snapshot, 'r') as f:
             data = json.load(f)
-            return data['results'], set(data['seen_ids'])
-    return [], set()
+            results, seen_ids = data['results'], set(data['seen_ids'])
+    if _replay_journal(journal, results, seen_ids):
+        # fold the journal in so the next resume is a single read
+        save_checkpoint(keyword, platform, results, seen_ids)
+    return results, seen_ids
+
+@timed("checkpoint.append")
+def append_checkpoint(keyword, platform, results=(), seen_ids=()):
+    """Append newly collected items and ids to the checkpoint journal, O(new items)"""
+    if not results and not seen_ids:
+        return
+    _, journal = _checkpoint_files(keyword, platform)
+    with open(journal, 'a', encoding="utf8") as f:
+        f.write(json.dumps({'results': list(results), 'seen_ids': list(seen_ids)}) + "\n")
 
+@timed("checkpoint.save")
 def save_checkpoint(keyword, platform, results, seen_ids):
-    """Save current progress to checkpoint file"""
-    file = CHECKPOINT_DIR / f"{keyword}_{platform}.json"
-    with open(file, 'w') as f:
+    """Compact the full progress into an atomically replaced snapshot and drop the journal"""
+    snapshot, journal = _checkpoint_files(keyword, platform)
+    tmp = snapshot.with_suffix(".json.tmp")
+    with open(tmp, 'w') as f:
         json.dump({'results': results, 'seen_ids': list(seen_ids)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot)
+    if os.path.exists(journal):
+        os.remove(journal)
 
 def remove_checkpoint(keyword, platform):
-    """Remove checkpoint file"""
-    file = CHECKPOINT_DIR / f"{keyword}_{platform}.json"
-    if os.path.exists(file):
-        os.remove(file)
+    """Remove checkpoint snapshot and journal"""
+    for file in _checkpoint_files(keyword, platform):
+        if os.path.exists(file):
+            os.remove(file)
 
-def save_data(keyword, results, scraper_name, directory):    
-    json_path = directory / f"{keyword}_{scraper_name}.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+def save_data(keyword, results, scraper_name, directory, fmt=STORAGE_FORMAT):
+    """Write a job's results as JSON or Parquet, see storage.py"""
+    with stage("storage.save_data", len(results)):
+        return write_records(directory / f"{keyword}_{scraper_name}.json", results, fmt)
 
-def create_session_dir():
+def create_session_dir(keywords=KEYWORDS, amount=AMOUNT):
     """Create a unique directory for this scraping session"""
     session_time = datetime.now().strftime("%Y%m%d-%H%M%S")
     session_dir =  OUTPUT_DIR / f"session_{session_time}"
@@ -57,12 +131,22 @@ def create_session_dir():
     
     metadata = {
         "start_time": session_time,
-        "keywords": KEYWORDS,
-        "target_amount": AMOUNT
+        "keywords": keywords,
+        "target_amount": amount
     }
     with (session_dir / "session_meta.json").open("w") as f:
         json.dump(metadata, f)
     
     return session_dir
 
-SESSION_DIR = create_session_dir() # created every time the script is run
\ No newline at end of file
+_session_dir = None
+
+def start_session(keywords=KEYWORDS, amount=AMOUNT):
+    """Create this run's session directory and make it the current one"""
+    global _session_dir
+    _session_dir = create_session_dir(keywords, amount)
+    return _session_dir
+
+def current_session_dir():
+    """This run's session directory, created on first use rather than on import"""
+    return _session_dir if _session_dir is not None else start_session()
\ No newline at end of file